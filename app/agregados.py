@@ -0,0 +1,216 @@
+import pandas as pd
+from sqlalchemy import select, delete, func, bindparam
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.persistencia import TAMANHO_LOTE
+from app import estoque, hierarquia, ranking, tendencias
+from app.models import (
+    Producao,
+    Comercializacao,
+    Processamento,
+    Importacao,
+    Exportacao,
+    AgregadoAnual,
+    AgregadoEntidade,
+    EstatisticaExportacao,
+    EstatisticaImportacao,
+    RankingAnual,
+    NoHierarquia
+)
+
+# Modelo, coluna descritiva, coluna de quantidade e coluna de valor (US$) de cada dataset
+FONTES = {
+    "producao": (Producao, "produto", "producao_toneladas", None),
+    "comercializacao": (Comercializacao, "produto", "volume_comercializado", None),
+    "processamento": (Processamento, "cultivar", "volume_processado_litros", None),
+    "importacao": (Importacao, "pais", "quantidade", "valor_usd"),
+    "exportacao": (Exportacao, "pais", "quantidade", "valor_usd")
+}
+
+
+def _contribuicoes(tipo: str, linhas: pd.DataFrame, sinal: int) -> pd.DataFrame:
+    """Contribuição de cada linha do dataset para os agregados (`sinal` -1 a remove)."""
+    _, coluna_item, coluna_quantidade, coluna_valor = FONTES[tipo]
+    if "control" in linhas:
+        categoria = linhas["control"].astype(str)
+    else:
+        categoria = pd.Series("", index=linhas.index)
+    contribuicoes = pd.DataFrame({
+        "ano": linhas["ano"].astype(int),
+        "categoria": categoria,
+        "entidade": linhas[coluna_item].astype(str).str.strip(),
+        # Linhas de categoria (control sem prefixo "xx_") já somam as subcategorias:
+        # só elas entram no total anual, para não contar o mesmo volume duas vezes
+        "total_ano": ~categoria.str.contains("_", regex=False),
+        "quantidade": linhas[coluna_quantidade].fillna(0).astype(float) * sinal,
+        "registros": sinal
+    })
+    if coluna_valor:
+        contribuicoes["valor_usd"] = linhas[coluna_valor].fillna(0).astype(float) * sinal
+    return contribuicoes
+
+
+def _somar(session: Session, tipo: str, contribuicoes: pd.DataFrame):
+    """Soma as contribuições às linhas dos agregados (INSERT ... ON CONFLICT DO UPDATE)."""
+    if contribuicoes.empty:
+        return
+    campos = ["quantidade", "registros"] + (["valor_usd"] if FONTES[tipo][3] else [])
+    contribuicoes = contribuicoes.assign(decada=contribuicoes["ano"] // 10 * 10)
+    destinos = (
+        (AgregadoAnual, ["ano"], contribuicoes[contribuicoes["total_ano"]]),
+        (AgregadoEntidade, ["categoria", "entidade", "decada"], contribuicoes)
+    )
+    for modelo, grupo, linhas in destinos:
+        somas = linhas.groupby(grupo, as_index=False)[campos].sum()
+        if somas.empty:
+            continue
+        tabela = modelo.__table__
+        stmt = insert(tabela)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tipo"] + grupo,
+            set_={c: tabela.c[c] + stmt.excluded[c] for c in campos}
+        )
+        registros = somas.assign(tipo=tipo).astype(object).to_dict(orient="records")
+        for inicio in range(0, len(registros), TAMANHO_LOTE):
+            session.execute(stmt, registros[inicio:inicio + TAMANHO_LOTE])
+
+        # Grupos que perderam linhas (ex: mudança de control) podem ter ficado vazios
+        reduzidos = [r for r in registros if r["registros"] < 0]
+        if reduzidos:
+            chaves = ["tipo"] + grupo
+            remocao = delete(tabela).where(
+                *[tabela.c[c] == bindparam(f"_{c}") for c in chaves],
+                tabela.c.registros <= 0
+            )
+            session.execute(remocao, [{f"_{c}": r[c] for c in chaves} for r in reduzidos])
+
+
+def aplicar_alteracoes(session: Session, tipo: str, alteracoes: pd.DataFrame):
+    """
+    Atualiza os agregados com as linhas gravadas por `upsert_em_lote`, na mesma transação.
+
+    Cada linha soma seu valor novo e, se já existia, subtrai o valor anterior
+    (`<coluna>_atual`), de modo que o custo é proporcional às linhas alteradas.
+    """
+    _, coluna_item, coluna_quantidade, coluna_valor = FONTES[tipo]
+    colunas = [c for c in ("control", coluna_item, "ano", coluna_quantidade, coluna_valor) if c in alteracoes]
+    existentes = alteracoes[alteracoes["_merge"] == "both"]
+    anteriores = pd.DataFrame({
+        c: existentes[f"{c}_atual"] if f"{c}_atual" in existentes else existentes[c]
+        for c in colunas
+    })
+    _somar(session, tipo, pd.concat([
+        _contribuicoes(tipo, alteracoes[colunas], 1),
+        _contribuicoes(tipo, anteriores, -1)
+    ]))
+
+
+def reconstruir(session: Session, tipo: str):
+    """Recalcula do zero os agregados de um dataset a partir da tabela completa."""
+    modelo, coluna_item, coluna_quantidade, coluna_valor = FONTES[tipo]
+    colunas = [c for c in ("control", coluna_item, "ano", coluna_quantidade, coluna_valor) if c and c in modelo.__table__.c]
+    linhas = pd.DataFrame(
+        session.execute(select(*[modelo.__table__.c[c] for c in colunas])).all(),
+        columns=colunas
+    )
+    session.execute(delete(AgregadoAnual).where(AgregadoAnual.tipo == tipo))
+    session.execute(delete(AgregadoEntidade).where(AgregadoEntidade.tipo == tipo))
+    _somar(session, tipo, _contribuicoes(tipo, linhas, 1))
+
+
+def preparar_agregados():
+    """
+    Monta os agregados (e as estatísticas de importação/exportação, o ranking anual
+    e a hierarquia de control) dos datasets que já têm dados mas ainda não foram agregados.
+    """
+    session = SessionLocal()
+    try:
+        for tipo, (modelo, *_) in FONTES.items():
+            agregado = session.execute(
+                select(AgregadoAnual.ano).where(AgregadoAnual.tipo == tipo).limit(1)
+            ).first()
+            if agregado is None and session.execute(select(modelo.id).limit(1)).first():
+                reconstruir(session, tipo)
+            if tipo in ranking.FONTES and (
+                session.execute(select(RankingAnual.ano).where(RankingAnual.dataset == tipo).limit(1)).first() is None
+                and session.execute(select(modelo.id).limit(1)).first()
+            ):
+                ranking.recalcular(session, tipo)
+            if tipo in estoque.PRODUTOS and (
+                session.execute(
+                    select(EstatisticaImportacao.pais)
+                    .where(EstatisticaImportacao.produto == estoque.PRODUTOS[tipo]).limit(1)
+                ).first() is None
+                and session.execute(select(modelo.id).limit(1)).first()
+            ):
+                estoque.reconstruir(session, tipo)
+            if tipo in hierarquia.FONTES and (
+                session.execute(select(NoHierarquia.id_original).where(NoHierarquia.tipo == tipo).limit(1)).first() is None
+                and session.execute(select(modelo.id).limit(1)).first()
+            ):
+                hierarquia.reconstruir(session, tipo)
+        if (
+            session.execute(select(EstatisticaExportacao.pais).limit(1)).first() is None
+            and session.execute(select(Exportacao.id).limit(1)).first()
+        ):
+            tendencias.recalcular(session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def resumo_anual(db: Session, tipo: str, ano_min: int = None, ano_max: int = None):
+    """Totais por ano, lidos diretamente de `agregado_anual`."""
+    consulta = select(AgregadoAnual).where(AgregadoAnual.tipo == tipo)
+    if ano_min is not None:
+        consulta = consulta.where(AgregadoAnual.ano >= ano_min)
+    if ano_max is not None:
+        consulta = consulta.where(AgregadoAnual.ano <= ano_max)
+    return db.execute(consulta.order_by(AgregadoAnual.ano)).scalars().all()
+
+
+def resumo_entidades(
+    db: Session,
+    tipo: str,
+    por_decada: bool = True,
+    decada: int = None,
+    entidade: str = None,
+    categoria: str = None,
+    limite: int = 100
+):
+    """
+    Totais por produto/cultivar/país, lidos de `agregado_entidade`.
+
+    - `por_decada=True`: uma linha por entidade e década; caso contrário, o total de todo o período.
+    - Ordenado pela quantidade, da maior para a menor.
+    """
+    a = AgregadoEntidade
+    condicoes = [a.tipo == tipo]
+    if decada is not None:
+        condicoes.append(a.decada == decada)
+    if entidade is not None:
+        condicoes.append(a.entidade == entidade)
+    if categoria is not None:
+        condicoes.append(a.categoria == categoria)
+
+    if por_decada:
+        colunas = [a.categoria, a.entidade, a.decada, a.quantidade, a.valor_usd, a.registros]
+        consulta = select(*colunas).where(*condicoes).order_by(a.quantidade.desc())
+    else:
+        quantidade = func.sum(a.quantidade).label("quantidade")
+        consulta = (
+            select(
+                a.categoria, a.entidade,
+                quantidade,
+                func.sum(a.valor_usd).label("valor_usd"),
+                func.sum(a.registros).label("registros")
+            )
+            .where(*condicoes)
+            .group_by(a.categoria, a.entidade)
+            .order_by(quantidade.desc())
+        )
+    return [dict(linha) for linha in db.execute(consulta.limit(limite)).mappings()]
@@ -1,82 +1,167 @@
-from fastapi import APIRouter, Query
+from typing import Optional, Literal
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
+from app.auth_token import get_current_user
+from app.database import get_db_leitura
+from app import estoque, tendencias
+from app.previsao import prever
+from app.ranking import ranking
+from app.schema import (
+    PrevisaoProducaoResponse,
+    TendenciasExportacaoResponse,
+    RankingResponse,
+    AlertaEstoqueResponse
+)
 
 router = APIRouter()
 
 @router.get(
     "/producao/previsao",
+    response_model=PrevisaoProducaoResponse,
     summary="Previsão futura da produção de uvas",
-    tags=["Funcionalidades planejadas"]
+    tags=["Análises"]
 )
-def prever_producao(anos: int = Query(5, ge=1, le=20)):
+def prever_producao(
+    anos: int = Query(5, ge=1, le=20),
+    produto: Optional[str] = Query(None, description="Produto exato (ex: `Tinto`)"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa (ex: `vm_Tinto`)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Estima a produção de uvas para os próximos anos com base em dados históricos.
 
-    - Utiliza modelos de séries temporais (ex: regressão, ARIMA, LSTM)
+    - Tendência linear por produto, ajustada nos últimos 15 anos observados
+      (todas as séries em uma única resolução de mínimos quadrados)
+    - Os parâmetros ajustados ficam em cache até a próxima ingestão de `producao`
+    - `erro_padrao`: desvio dos resíduos do ajuste, na unidade da série
     - Ideal para planejamento agrícola e dimensionamento de oferta
 
     **Parâmetro:**
     - `anos`: número de anos a prever (padrão: 5)
 
-    🔒 (futuramente protegido por autenticação)
+    🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    return {"em_desenvolvimento": True}
+    return prever(db, anos, produto, control)
 
 
 @router.get(
     "/exportacao/tendencias",
+    response_model=TendenciasExportacaoResponse,
     summary="Análise de tendências de exportação por país",
-    tags=["Funcionalidades planejadas"]
+    tags=["Análises"]
 )
-def analisar_tendencia_exportacao(pais: str = Query(..., min_length=2)):
+def analisar_tendencia_exportacao(
+    pais: Optional[str] = Query(None, min_length=2),
+    ordenar_por: Literal[tuple(tendencias.ESTATISTICAS)] = Query("valor_total", description="Estatística usada na ordenação"),
+    ordem: Literal["desc", "asc"] = Query("desc"),
+    limit: int = Query(50, ge=1, le=500, description="Quantidade máxima de países"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Analisa o comportamento das exportações para determinado país.
 
-    - Calcula crescimento médio, padrão de sazonalidade e tendência
+    - Calcula crescimento médio anual (CAGR), médias móveis, tendência (inclinação
+      em litros ou US$ por ano), volatilidade da variação anual e preço médio por litro
+    - As estatísticas de todos os países são recalculadas a cada ingestão de `exportacao`;
+      a consulta apenas lê a tabela `estatistica_exportacao`
+    - Sem `pais`, retorna todos os países ordenados por `ordenar_por`
     - Útil para direcionar políticas comerciais
 
     **Parâmetro:**
     - `pais`: nome ou parte do nome do país destino
 
-    🔒 (futuramente protegido por autenticação)
+    🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    return {"em_desenvolvimento": True}
+    return {
+        "janela_media_anos": tendencias.JANELA_MEDIA,
+        "janela_tendencia_anos": tendencias.JANELA_TENDENCIA,
+        "paises": tendencias.consultar(db, pais, ordenar_por, ordem == "desc", limit)
+    }
 
 
 @router.get(
     "/comercializacao/ranking-regioes",
-    summary="Ranking de regiões por comercialização",
-    tags=["Funcionalidades planejadas"]
+    response_model=RankingResponse,
+    summary="Ranking de produtos por comercialização",
+    tags=["Análises"]
 )
-def ranking_regioes(ano: int = Query(..., ge=1970, le=2100)):
+def ranking_regioes(
+    ano: int = Query(..., ge=1970, le=2100),
+    k: int = Query(10, ge=1, le=100, description="Quantidade de posições"),
+    metrica: Literal["volume", "variacao", "participacao"] = Query("volume", description="Critério de ordenação"),
+    nivel: Literal["produto", "categoria"] = Query("produto", description="Ranqueia produtos ou categorias"),
+    categoria: Optional[str] = Query(None, description="Categoria pai (ex: `VINHO DE MESA`)"),
+    dataset: Literal["comercializacao", "producao"] = Query("comercializacao"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
-    Lista as regiões com maior volume comercializado em um ano específico.
+    Lista os itens com maior volume comercializado em um ano específico.
 
-    - Permite análise geográfica da distribuição de mercado
-    - Suporta dashboards regionais
+    - Os arquivos da Embrapa não trazem regiões: o ranking é por produto (ex: `Tinto`)
+      ou por categoria (ex: `VINHO DE MESA`)
+    - `metrica`: `volume`, `variacao` (diferença para o ano anterior) ou `participacao`
+      (fração do total da categoria no ano)
+    - Métricas calculadas com funções de janela do SQLite a cada ingestão e gravadas em
+      `ranking_anual`; a consulta lê o índice `(ano, métrica)` e para nas `k` primeiras linhas
+    - `dataset=producao` aplica o mesmo ranking à produção
+    - Suporta dashboards de mercado
 
     **Parâmetro:**
     - `ano`: ano de referência para análise
 
-    🔒 (futuramente protegido por autenticação)
+    🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    return {"em_desenvolvimento": True}
+    return {
+        "dataset": dataset,
+        "ano": ano,
+        "metrica": metrica,
+        "nivel": nivel,
+        "itens": ranking(db, dataset, ano, k, metrica, nivel, categoria)
+    }
 
 
 @router.get(
     "/importacao/alerta-estoque",
+    response_model=AlertaEstoqueResponse,
     summary="Recomendação de estoque para vinícolas",
-    tags=["Funcionalidades planejadas"]
+    tags=["Análises"]
 )
-def alerta_estoque(produto: str = Query(..., min_length=3)):
+def alerta_estoque(
+    produto: str = Query(..., min_length=3),
+    pais: Optional[str] = Query(None, min_length=2, description="Nome ou parte do nome do país de origem"),
+    limite_z: float = Query(2.0, gt=0, le=10, description="Desvios padrão a partir dos quais há alerta"),
+    somente_alertas: bool = Query(True, description="Omite os países dentro do padrão"),
+    limit: int = Query(50, ge=1, le=500, description="Quantidade máxima de países"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Gera recomendações de ajuste de estoque com base nas tendências de importação.
 
-    - Monitora volume de importações e projeções de mercado
+    - Compara o volume importado no último ano de cada país com a média e o desvio
+      dos 5 anos anteriores (escore z); acima de `limite_z` o alerta é de alta, abaixo
+      de `-limite_z`, de queda
+    - As estatísticas são atualizadas de forma incremental a cada ingestão de `importacao`
+      (só os países alterados); a consulta apenas lê `estatistica_importacao`
     - Ajuda vinícolas a otimizarem sua produção e armazenagem
 
     **Parâmetro:**
-    - `produto`: tipo de vinho ou item a monitorar
+    - `produto`: tipo de vinho ou item a monitorar (hoje: `vinhos`)
 
-    🔒 (futuramente protegido por autenticação)
+    🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    return {"em_desenvolvimento": True}
+    monitorado = estoque.localizar_produto(produto)
+    if monitorado is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Produto não monitorado. Disponíveis: {', '.join(estoque.PRODUTOS.values())}."
+        )
+    return {
+        "produto": monitorado,
+        "janela_anos": estoque.JANELA_ANOS,
+        "limite_z": limite_z,
+        "itens": estoque.consultar(db, monitorado, pais, limite_z, somente_alertas, limit)
+    }
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Body
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm
-from app.database import SessionLocal
-from app.models_usuario import Usuario
+from app.database import get_db
+from app.models_usuario import Usuario, StatusUsuario
 from app.utils import create_access_token, verify_token
 from app.config import settings, ADMIN_USERNAME, ADMIN_PASSWORD
 from typing import List
-import bcrypt
+from app.senhas import pool_senhas, FilaSaturada
 from app.schema import (
     SolicitarAcessoRequest,
     MessageResponse,
@@ -19,20 +21,62 @@ from app.schema import (
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
+
+async def _operacao_senha(coro):
+    """Executa uma operação do pool de senhas, respondendo 503 se ele estiver saturado."""
+    try:
+        return await coro
+    except FilaSaturada as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
+        )
+
+
+# As rotas assíncronas (que aguardam o pool de senhas) não usam a Session no event loop:
+# cada acesso ao banco roda no threadpool e devolve a conexão ao pool antes do bcrypt
+
+def _buscar_usuario(db: Session, username: str):
+    """Usuário (desanexado da sessão, atributos já carregados) ou None; libera a conexão."""
     try:
-        yield db
+        return db.query(Usuario).filter_by(username=username).first()
+    finally:
+        db.close()
+
+
+def _registrar_solicitacao(db: Session, username: str, hashed: str) -> bool:
+    """Grava a solicitação; False se o usuário já existir (solicitação simultânea)."""
+    try:
+        db.add(Usuario(username=username, senha=hashed, status="pendente"))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def _renovar_token(db: Session, usuario_id: int) -> str:
+    try:
+        usuario = db.get(Usuario, usuario_id)
+        token = create_access_token(data={"sub": usuario.username})
+        usuario.ultimo_token = token
+        usuario.data_token = datetime.now(timezone.utc)
+        db.commit()
+        return token
     finally:
         db.close()
 
+
 @router.post(
     "/solicitar-acesso",
     response_model=MessageResponse,
     summary="Permite que um novo usuário solicite acesso ao sistema",
     tags=["Acesso"]
 )
-def solicitar_acesso(
+async def solicitar_acesso(
     data: SolicitarAcessoRequest = Body(
         ...,
         example={"username": "joao", "password": "1234"}
@@ -46,18 +90,14 @@ def solicitar_acesso(
     - Cada usuário pode realizar apenas uma solicitação.
     - A autenticação final só será possível após aprovação.
     """
-    existing = db.query(Usuario).filter_by(username=data.username).first()
+    existing = await run_in_threadpool(_buscar_usuario, db, data.username)
     if existing:
         raise HTTPException(status_code=400, detail="Usuário já solicitou acesso.")
-    
-    salt   = bcrypt.gensalt(rounds=12, prefix=b"2a")
-    hashed = bcrypt.hashpw(data.password.encode('utf-8'), salt)
-    
-    novo = Usuario(username=data.username,
-                   senha=hashed.decode('utf-8'),
-                   status="pendente")
-    db.add(novo)
-    db.commit()
+
+    hashed = await _operacao_senha(pool_senhas.gerar_hash(data.password))
+
+    if not await run_in_threadpool(_registrar_solicitacao, db, data.username, hashed):
+        raise HTTPException(status_code=400, detail="Usuário já solicitou acesso.")
     return {"mensagem": "Solicitação de acesso registrada. Aguarde avaliação."}
 
 
@@ -109,7 +149,7 @@ def avaliar_acesso(
     summary="Permite ao solicitante verificar status da solicitação de acesso",
     tags=["Acesso"]
 )
-def status_acesso(
+async def status_acesso(
     form: OAuth2PasswordRequestForm = Depends(), 
     db: Session = Depends(get_db)
 ):
@@ -124,36 +164,35 @@ def status_acesso(
     - `username`: nome de usuário usado na solicitação  
     - `password`: senha informada na solicitação
     """
-    usuario = db.query(Usuario).filter_by(username=form.username).first()
-    
-    if not usuario or not bcrypt.checkpw(
-        form.password.encode('utf-8'),
-        usuario.senha.encode('utf-8')
+    usuario = await run_in_threadpool(_buscar_usuario, db, form.username)
+
+    if not usuario or not await _operacao_senha(
+        pool_senhas.verificar(form.password, usuario.senha)
     ):
         raise HTTPException(status_code=401, detail="Credenciais inválidas.")
 
-    if usuario.status == "pendente":
+    if usuario.status == StatusUsuario.pendente:
         return {"status": "pendente", "mensagem": "Sua solicitação ainda não foi avaliada."}
 
-    if usuario.status == "rejeitado":
+    if usuario.status == StatusUsuario.rejeitado:
         return {"status": "rejeitado", "mensagem": "Sua solicitação foi recusada."}
 
     # aprovado
     # Converte data_token para UTC-aware se for naive
-    if usuario.data_token and usuario.data_token.tzinfo is None:
-        usuario.data_token = usuario.data_token.replace(tzinfo=timezone.utc)
+    data_token = usuario.data_token
+    if data_token and data_token.tzinfo is None:
+        data_token = data_token.replace(tzinfo=timezone.utc)
     # valida se precisa renovar token
-    expires = usuario.data_token + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    if not usuario.ultimo_token or expires < datetime.now(timezone.utc):
-        token = create_access_token(data={"sub": usuario.username})
-        usuario.ultimo_token = token
-        usuario.data_token = datetime.now(timezone.utc)
-        db.commit()
+    token = usuario.ultimo_token
+    if not token or not data_token or (
+        data_token + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES) < datetime.now(timezone.utc)
+    ):
+        token = await run_in_threadpool(_renovar_token, db, usuario.id)
 
     return {
         "status": "aprovado",
         "user_id": usuario.id,
-        "access_token": usuario.ultimo_token,
+        "access_token": token,
         "token_type": "bearer"
     }
 
@@ -1,11 +1,11 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.utils import verify_token
+from app.utils import verify_token_cached
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/status-acesso")
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
-    payload = verify_token(token)
+    payload = verify_token_cached(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+from app import http_client
+from app.config import settings
+
+
+def _caminhos(url: str):
+    chave = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    base = os.path.join(settings.CACHE_DOWNLOAD_DIR, chave)
+    return f"{base}.json", f"{base}.bin"
+
+
+def _gravar_atomico(caminho: str, conteudo: bytes):
+    # Temporário por processo e por thread: duas coletas simultâneas da mesma URL
+    # não escrevem no mesmo arquivo antes do `os.replace`
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def baixar(url: str, forcar: bool = False):
+    """
+    Baixa `url` usando o cache em disco com requisição condicional.
+
+    - Envia `If-None-Match`/`If-Modified-Since` quando há uma cópia salva.
+    - Em 304, devolve a cópia salva sem transferir o conteúdo novamente. Se o corpo
+      salvo não confere com o sha256 dos metadados (gravações concorrentes da mesma
+      URL intercaladas), baixa o conteúdo de novo.
+    - `forcar=True` ignora os validadores e sempre baixa o conteúdo.
+
+    Retorna `(conteudo, sha256)`; o hash permite ao chamador descartar
+    conteúdo idêntico ao já processado.
+    """
+    caminho_meta, caminho_corpo = _caminhos(url)
+    meta = {}
+    if not forcar and os.path.exists(caminho_meta) and os.path.exists(caminho_corpo):
+        with open(caminho_meta, encoding="utf-8") as f:
+            meta = json.load(f)
+
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = http_client.get(url, headers=headers)
+    if response.status_code == 304 and meta:
+        with open(caminho_corpo, "rb") as f:
+            conteudo = f.read()
+        if hashlib.sha256(conteudo).hexdigest() == meta["sha256"]:
+            return conteudo, meta["sha256"]
+        return baixar(url, forcar=True)
+    response.raise_for_status()
+
+    conteudo = response.content
+    sha256 = hashlib.sha256(conteudo).hexdigest()
+
+    os.makedirs(settings.CACHE_DOWNLOAD_DIR, exist_ok=True)
+    # Corpo antes dos metadados: os validadores só passam a valer com o corpo já gravado
+    _gravar_atomico(caminho_corpo, conteudo)
+    _gravar_atomico(caminho_meta, json.dumps({
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha256": sha256
+    }).encode("utf-8"))
+
+    return conteudo, sha256
@@ -0,0 +1,130 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.config import settings
+
+
+class CacheRespostas:
+    """
+    Cache em memória das respostas serializadas dos endpoints de dados.
+
+    - Limitado por número de entradas e por bytes, com descarte LRU.
+    - Cada entrada expira após `ttl` segundos.
+    - `invalidar(tipo)` remove as respostas de um dataset após uma ingestão.
+    - Com `diretorio`, as respostas também são gravadas em disco e compartilhadas entre
+      os processos (workers do gunicorn): a falta na memória de um worker é atendida
+      pelo arquivo gravado por outro, sem nova consulta ao banco. As chaves incluem o
+      ETag (versão do dataset), então arquivos de versões anteriores nunca são servidos.
+    """
+
+    def __init__(self, max_entradas: int, max_bytes: int, ttl: float, diretorio: str = None):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.diretorio = diretorio or None
+        self._entradas = OrderedDict()  # chave -> (tipo, expira_em, conteudo)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._contadores = {
+            "hits": 0, "misses": 0, "expiradas": 0, "descartadas": 0, "invalidadas": 0,
+            "hits_compartilhado": 0
+        }
+
+    def _arquivo(self, chave, tipo: str) -> str:
+        assinatura = hashlib.sha256(repr(chave).encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio, f"{tipo}-{assinatura}.json")
+
+    def _ler_compartilhado(self, chave):
+        """Resposta gravada por qualquer processo (None se ausente ou expirada)."""
+        caminho = self._arquivo(chave, chave[0])
+        try:
+            idade = time.time() - os.path.getmtime(caminho)
+            if idade > self.ttl:
+                os.remove(caminho)
+                return None
+            with open(caminho, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _gravar_compartilhado(self, chave, tipo: str, conteudo: bytes):
+        caminho = self._arquivo(chave, tipo)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.diretorio, exist_ok=True)
+            with open(temporario, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        except OSError:
+            pass
+
+    def _remover(self, chave):
+        _, _, conteudo = self._entradas.pop(chave)
+        self._bytes -= len(conteudo)
+
+    def obter(self, chave):
+        """`chave` deve começar pelo tipo do dataset, ex: `(tipo, etag, parametros)`."""
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[1] <= time.monotonic():
+                self._remover(chave)
+                self._contadores["expiradas"] += 1
+                entrada = None
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                self._contadores["hits"] += 1
+                return entrada[2]
+
+        conteudo = self._ler_compartilhado(chave) if self.diretorio else None
+        with self._lock:
+            if conteudo is None:
+                self._contadores["misses"] += 1
+                return None
+            self._contadores["hits_compartilhado"] += 1
+        self._guardar_memoria(chave, chave[0], conteudo)
+        return conteudo
+
+    def guardar(self, chave, tipo: str, conteudo: bytes):
+        if len(conteudo) > self.max_bytes:
+            return
+        if self.diretorio:
+            self._gravar_compartilhado(chave, tipo, conteudo)
+        self._guardar_memoria(chave, tipo, conteudo)
+
+    def _guardar_memoria(self, chave, tipo: str, conteudo: bytes):
+        with self._lock:
+            if chave in self._entradas:
+                self._remover(chave)
+            self._entradas[chave] = (tipo, time.monotonic() + self.ttl, conteudo)
+            self._bytes += len(conteudo)
+            while len(self._entradas) > self.max_entradas or self._bytes > self.max_bytes:
+                self._remover(next(iter(self._entradas)))
+                self._contadores["descartadas"] += 1
+
+    def invalidar(self, tipo: str = None):
+        with self._lock:
+            chaves = [c for c, (t, _, _) in self._entradas.items() if tipo is None or t == tipo]
+            for chave in chaves:
+                self._remover(chave)
+            self._contadores["invalidadas"] += len(chaves)
+        if self.diretorio:
+            for caminho in glob.glob(os.path.join(self.diretorio, f"{tipo or '*'}-*.json")):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"entradas": len(self._entradas), "bytes": self._bytes, **self._contadores}
+
+
+cache_respostas = CacheRespostas(
+    max_entradas=settings.CACHE_RESPOSTAS_MAX_ENTRADAS,
+    max_bytes=settings.CACHE_RESPOSTAS_MAX_BYTES,
+    ttl=settings.CACHE_RESPOSTAS_TTL,
+    diretorio=settings.CACHE_RESPOSTAS_DIR
+)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+
+class _Execucao:
+    """Uma execução em andamento: quem chega depois aguarda `concluida` e lê o resultado."""
+
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.seguidores = 0
+
+
+class Coalescedor:
+    """
+    Execução única por chave (single-flight).
+
+    - A primeira chamada com uma chave executa a função; chamadas simultâneas com a
+      mesma chave aguardam e recebem o mesmo resultado (ou a mesma exceção).
+    - Vale entre threads (rotas síncronas) e corrotinas (`executar_async`), que
+      compartilham o mesmo registro de execuções em andamento.
+    - Terminada a execução, a próxima chamada executa de novo: não é um cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self._contadores = {"execucoes": 0, "coalescidas": 0, "falhas": 0}
+
+    def _entrar(self, chave):
+        """Retorna a execução da chave e se esta chamada é a responsável por executá-la."""
+        with self._lock:
+            execucao = self._em_andamento.get(chave)
+            if execucao is not None:
+                execucao.seguidores += 1
+                self._contadores["coalescidas"] += 1
+                return execucao, False
+            execucao = self._em_andamento[chave] = _Execucao()
+            return execucao, True
+
+    def _concluir(self, chave, execucao: _Execucao, resultado=None, erro: BaseException = None):
+        execucao.resultado, execucao.erro = resultado, erro
+        with self._lock:
+            del self._em_andamento[chave]
+            self._contadores["execucoes"] += 1
+            if erro is not None:
+                self._contadores["falhas"] += 1
+        execucao.concluida.set()
+
+    @staticmethod
+    def _resultado(execucao: _Execucao):
+        if execucao.erro is not None:
+            raise execucao.erro
+        return execucao.resultado
+
+    def executar(self, chave, funcao, *args, **kwargs):
+        execucao, responsavel = self._entrar(chave)
+        if not responsavel:
+            execucao.concluida.wait()
+            return self._resultado(execucao)
+        try:
+            resultado = funcao(*args, **kwargs)
+        except BaseException as e:
+            self._concluir(chave, execucao, erro=e)
+            raise
+        self._concluir(chave, execucao, resultado)
+        return resultado
+
+    async def executar_async(self, chave, fabrica_corrotina):
+        """Como `executar`, para corrotinas: `fabrica_corrotina()` só é chamada por quem executa."""
+        execucao, responsavel = self._entrar(chave)
+        if not responsavel:
+            # Aguarda em uma thread para não bloquear o event loop
+            await asyncio.to_thread(execucao.concluida.wait)
+            return self._resultado(execucao)
+        try:
+            resultado = await fabrica_corrotina()
+        except BaseException as e:
+            self._concluir(chave, execucao, erro=e)
+            raise
+        self._concluir(chave, execucao, resultado)
+        return resultado
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                **self._contadores,
+                "em_andamento": len(self._em_andamento),
+                "aguardando": sum(e.seguidores for e in self._em_andamento.values())
+            }
+
+
+# Coletas na Embrapa: uma por dataset (e modo `forcar`) de cada vez neste processo
+coletas = Coalescedor()
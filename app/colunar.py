@@ -0,0 +1,189 @@
+import glob
+import hashlib
+import os
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Integer, Float
+from app.config import settings
+from app.consultas import DATASETS, ler_lote, codificar_cursor
+from app.database import SessionLeitura
+from app.models import MetadadosDataset
+from app.versoes import marca_carga
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+EXTENSOES = {"arrow": "arrows", "parquet": "parquet"}
+
+# Blocos lidos de um arquivo já gerado a cada envio
+TAMANHO_BLOCO = 1024 * 1024
+
+_descarte_lock = threading.Lock()
+
+
+def _schema_arrow(tabela):
+    campos = []
+    for coluna in tabela.c:
+        if isinstance(coluna.type, Integer):
+            tipo = pa.int64()
+        elif isinstance(coluna.type, Float):
+            tipo = pa.float64()
+        else:
+            tipo = pa.string()
+        campos.append(pa.field(coluna.name, tipo))
+    return pa.schema(campos)
+
+
+def _revisao(tipo: str) -> str:
+    """Versão e marca da carga lidas do banco (a chave do arquivo sobrevive a reinícios)."""
+    session = SessionLeitura()
+    try:
+        meta = session.get(MetadadosDataset, tipo)
+        return f"{meta.versao if meta else 0}.{marca_carga(meta)}"
+    finally:
+        session.close()
+
+
+def _caminho(tipo: str, formato: str, filtros: dict) -> str:
+    chave = (_revisao(tipo), formato, tuple(sorted(filtros.items())))
+    assinatura = hashlib.sha256(repr(chave).encode("utf-8")).hexdigest()
+    return os.path.join(settings.CACHE_COLUNAR_DIR, f"{tipo}-{assinatura}.{EXTENSOES[formato]}")
+
+
+def _descartar_excedente():
+    """Remove os arquivos usados há mais tempo até o diretório caber em `CACHE_COLUNAR_MAX_BYTES`."""
+    with _descarte_lock:
+        arquivos = []
+        for caminho in glob.glob(os.path.join(settings.CACHE_COLUNAR_DIR, "*")):
+            if caminho.endswith(".tmp"):
+                continue
+            try:
+                estado = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, caminho))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= settings.CACHE_COLUNAR_MAX_BYTES:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+            total -= tamanho
+
+
+def _lotes(tipo: str, schema, tamanho_lote: int, filtros: dict, primeiro: list):
+    """RecordBatches do dataset, lidos por keyset `(ano, id)` a partir do lote `primeiro`."""
+    lote = primeiro
+    while lote:
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(valores, type=campo.type) for valores, campo in zip(zip(*lote), schema)],
+            schema=schema
+        )
+        if len(lote) < tamanho_lote:
+            return
+        ultima = lote[-1]._mapping
+        lote = ler_lote(tipo, codificar_cursor(ultima["ano"], ultima["id"]), tamanho_lote, filtros)
+
+
+def _enviar_arquivo(arquivo):
+    with arquivo:
+        while bloco := arquivo.read(TAMANHO_BLOCO):
+            yield bloco
+
+
+class _Saida:
+    """Destino do escritor IPC: grava no arquivo do cache e guarda os bytes a enviar."""
+
+    closed = False
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.pendente = []
+
+    def write(self, dados):
+        dados = bytes(dados)
+        self.arquivo.write(dados)
+        self.pendente.append(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        dados, self.pendente = b"".join(self.pendente), []
+        return dados
+
+
+def _transmitir_arrow(caminho: str, temporario: str, schema, lotes):
+    concluido = False
+    try:
+        with open(temporario, "wb") as arquivo:
+            saida = _Saida(arquivo)
+            escritor = pa.ipc.new_stream(pa.PythonFile(saida, mode="w"), schema)
+            for lote in lotes:
+                escritor.write_batch(lote)
+                yield saida.drenar()
+            escritor.close()
+            yield saida.drenar()
+        os.replace(temporario, caminho)
+        concluido = True
+        _descartar_excedente()
+    finally:
+        if not concluido:
+            # Cliente desconectado no meio: o arquivo incompleto não entra no cache
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+
+
+def exportar_colunar(tipo: str, formato: str, tamanho_lote: int = 10000, **filtros):
+    """
+    Gera o dataset (com os mesmos filtros da API) em Arrow IPC stream ou Parquet.
+
+    - As colunas são montadas diretamente dos lotes lidos do SQLite, sem passar por JSON,
+      cada lote em uma conexão devolvida ao pool logo após a leitura.
+    - O arquivo gerado fica em `CACHE_COLUNAR_DIR`, por revisão do dataset e filtros; uma
+      nova carga muda a revisão. O diretório é limitado a `CACHE_COLUNAR_MAX_BYTES`,
+      descartando os arquivos usados há mais tempo.
+    - Arrow é enviado lote a lote enquanto o arquivo é gravado; Parquet (metadados no fim
+      do arquivo) é gravado em disco e então enviado. A memória usada independe do
+      tamanho da tabela.
+
+    Retorna um iterador de blocos de bytes. O primeiro lote é lido antes do início da
+    resposta, para que o pool de leitura esgotado ainda possa virar 503.
+    """
+    caminho = _caminho(tipo, formato, filtros)
+    try:
+        arquivo = open(caminho, "rb")
+        os.utime(caminho)
+        return _enviar_arquivo(arquivo)
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(settings.CACHE_COLUNAR_DIR, exist_ok=True)
+    schema = _schema_arrow(DATASETS[tipo][0].__table__)
+    lotes = _lotes(tipo, schema, tamanho_lote, filtros, ler_lote(tipo, None, tamanho_lote, filtros))
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if formato != "parquet":
+        return _transmitir_arrow(caminho, temporario, schema, lotes)
+
+    try:
+        with pq.ParquetWriter(temporario, schema) as escritor:
+            for lote in lotes:
+                escritor.write_batch(lote)
+        # Aberto antes do descarte: o envio continua mesmo se o arquivo sair do cache
+        arquivo = open(temporario, "rb")
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    _descartar_excedente()
+    return _enviar_arquivo(arquivo)
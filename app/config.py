@@ -4,6 +4,58 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "segredo-super-seguro")
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 30
+    # Máximo de tokens JWT já verificados mantidos em memória
+    CACHE_TOKENS_MAX = int(os.getenv("CACHE_TOKENS_MAX", "10000"))
+    # Pool de processos do bcrypt: workers e operações que podem aguardar na fila
+    SENHAS_WORKERS = int(os.getenv("SENHAS_WORKERS", "2"))
+    SENHAS_FILA_MAX = int(os.getenv("SENHAS_FILA_MAX", "16"))
+    # SQLite: conexões do pool de leitura e PRAGMAs aplicados em cada conexão
+    SQLITE_POOL_LEITURA = int(os.getenv("SQLITE_POOL_LEITURA", "8"))
+    # Pool das rotas de usuários (gravações curtas, separadas do escritor da ingestão)
+    SQLITE_POOL_USUARIOS = int(os.getenv("SQLITE_POOL_USUARIOS", "4"))
+    # Reservas de coleta entre processos (`reserva_coleta`): gravações curtas, fora do escritor
+    SQLITE_POOL_RESERVAS = int(os.getenv("SQLITE_POOL_RESERVAS", "2"))
+    # Espera máxima (s) por uma conexão livre em qualquer pool (inclusive o do escritor);
+    # ao expirar, HTTP 503
+    SQLITE_POOL_TIMEOUT_S = float(os.getenv("SQLITE_POOL_TIMEOUT_S", "5"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))
+    # "banco": endpoints leem as tabelas locais (ingestão fora da requisição)
+    # "scraper": cada requisição atualiza o dataset na Embrapa antes de responder
+    # "revalidar": responde das tabelas locais e atualiza em segundo plano os datasets
+    # verificados na Embrapa há mais de REVALIDAR_APOS_S segundos
+    MODO_DADOS = os.getenv("MODO_DADOS", "banco")
+    REVALIDAR_APOS_S = float(os.getenv("REVALIDAR_APOS_S", "3600"))
+    # Diretório do cache de downloads (páginas e CSVs da Embrapa)
+    CACHE_DOWNLOAD_DIR = os.getenv("CACHE_DOWNLOAD_DIR", ".cache_embrapa")
+    # Cliente HTTP dos scrapers (timeouts em segundos)
+    HTTP_TIMEOUT_CONEXAO = float(os.getenv("HTTP_TIMEOUT_CONEXAO", "5"))
+    HTTP_TIMEOUT_LEITURA = float(os.getenv("HTTP_TIMEOUT_LEITURA", "30"))
+    HTTP_TENTATIVAS = int(os.getenv("HTTP_TENTATIVAS", "3"))
+    HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+    HTTP_MAX_POR_HOST = int(os.getenv("HTTP_MAX_POR_HOST", "4"))
+    # Conexões mantidas no pool; deve cobrir o número de workers que fazem coleta
+    HTTP_POOL_MAX = int(os.getenv("HTTP_POOL_MAX", "8"))
+    # Disjuntor por host: falhas consecutivas que abrem o circuito e tempo (s) até a próxima sondagem
+    DISJUNTOR_FALHAS = int(os.getenv("DISJUNTOR_FALHAS", "3"))
+    DISJUNTOR_ESPERA_S = float(os.getenv("DISJUNTOR_ESPERA_S", "30"))
+    # Reserva entre processos de uma coleta: duração máxima (s) e intervalo de consulta de quem aguarda
+    COLETA_RESERVA_S = float(os.getenv("COLETA_RESERVA_S", "300"))
+    COLETA_ESPERA_S = float(os.getenv("COLETA_ESPERA_S", "0.25"))
+    # Processos usados no parsing dos CSVs durante a atualização completa
+    INGESTAO_WORKERS = int(os.getenv("INGESTAO_WORKERS", "2"))
+    # Cache em memória das respostas dos endpoints de dados
+    CACHE_RESPOSTAS_TTL = float(os.getenv("CACHE_RESPOSTAS_TTL", "300"))
+    CACHE_RESPOSTAS_MAX_ENTRADAS = int(os.getenv("CACHE_RESPOSTAS_MAX_ENTRADAS", "256"))
+    CACHE_RESPOSTAS_MAX_BYTES = int(os.getenv("CACHE_RESPOSTAS_MAX_BYTES", str(64 * 1024 * 1024)))
+    # Diretório compartilhado entre os workers para as mesmas respostas (vazio desativa)
+    CACHE_RESPOSTAS_DIR = os.getenv("CACHE_RESPOSTAS_DIR", ".cache_respostas")
+    # Exportações Arrow/Parquet geradas: arquivos em disco, descartados (LRU) acima do limite
+    CACHE_COLUNAR_DIR = os.getenv("CACHE_COLUNAR_DIR", ".cache_colunar")
+    CACHE_COLUNAR_MAX_BYTES = int(os.getenv("CACHE_COLUNAR_MAX_BYTES", str(512 * 1024 * 1024)))
+    # Intervalo máximo (s) para enxergar versões de datasets gravadas por outros processos
+    VERSOES_TTL = float(os.getenv("VERSOES_TTL", "5"))
 settings = Settings()
 
 ADMIN_USERNAME = "admin"
@@ -0,0 +1,169 @@
+import base64
+import binascii
+import csv
+import io
+import json
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from app.database import engine_leitura
+from app.models import (
+    Producao,
+    Comercializacao,
+    Processamento,
+    Importacao,
+    Exportacao,
+    MetadadosDataset
+)
+
+DOWNLOAD_BASE = "http://vitibrasil.cnpuv.embrapa.br/"
+
+# Modelo e arquivo publicado pela Embrapa para cada dataset
+DATASETS = {
+    "producao": (Producao, "Producao.csv"),
+    "comercializacao": (Comercializacao, "Comercio.csv"),
+    "processamento": (Processamento, "ProcessaViniferas.csv"),
+    "importacao": (Importacao, "ImpVinhos.csv"),
+    "exportacao": (Exportacao, "ExpVinho.csv")
+}
+
+# Coluna descritiva filtrável de cada dataset
+COLUNA_ITEM = {
+    "producao": "produto",
+    "comercializacao": "produto",
+    "processamento": "cultivar",
+    "importacao": "pais",
+    "exportacao": "pais"
+}
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(ano: int, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ano}:{id}".encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ano, id = texto.split(":")
+        return int(ano), int(id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorInvalido(f"Cursor inválido: {cursor}")
+
+
+def filtros_dataset(
+    tipo: str,
+    ano_min: int = None,
+    ano_max: int = None,
+    item: str = None,
+    control: str = None
+):
+    """Condições SQL dos filtros aceitos pelos endpoints de dados."""
+    tabela = DATASETS[tipo][0].__table__
+    condicoes = []
+    if ano_min is not None:
+        condicoes.append(tabela.c.ano >= ano_min)
+    if ano_max is not None:
+        condicoes.append(tabela.c.ano <= ano_max)
+    if item is not None:
+        condicoes.append(tabela.c[COLUNA_ITEM[tipo]] == item)
+    if control is not None and "control" in tabela.c:
+        condicoes.append(tabela.c.control == control)
+    return condicoes
+
+
+def montar_consulta(tipo: str, cursor: str = None, limite: int = None, **filtros):
+    """SELECT de uma página do dataset: filtros, keyset `(ano, id)` a partir de `cursor` e `limite`."""
+    tabela = DATASETS[tipo][0].__table__
+    consulta = select(tabela).where(*filtros_dataset(tipo, **filtros))
+    if cursor:
+        consulta = consulta.where(tuple_(tabela.c.ano, tabela.c.id) > tuple_(*decodificar_cursor(cursor)))
+    consulta = consulta.order_by(tabela.c.ano, tabela.c.id)
+    if limite is not None:
+        consulta = consulta.limit(limite)
+    return consulta
+
+
+def consultar_dataset(
+    db: Session,
+    tipo: str,
+    limite: int = 100,
+    cursor: str = None,
+    **filtros
+):
+    """
+    Monta a resposta de um dataset a partir das tabelas locais, sem acessar a Embrapa.
+
+    - Paginação por keyset sobre `(ano, id)`: `cursor` é o `proximo_cursor` da página anterior,
+      então o custo de cada página independe da posição no dataset.
+    - `filtros` aceita `ano_min`, `ano_max`, `item` (produto/cultivar/país) e `control`.
+    - `arquivo` e `url_download` vêm da última ingestão registrada em `metadados_dataset`;
+      na ausência dela, usa o arquivo padrão publicado pela Embrapa.
+    """
+    arquivo_padrao = DATASETS[tipo][1]
+
+    meta = db.get(MetadadosDataset, tipo)
+    arquivo = meta.arquivo if meta and meta.arquivo else arquivo_padrao
+    url_download = (
+        meta.url_download if meta and meta.url_download
+        else f"{DOWNLOAD_BASE}download/{arquivo_padrao}"
+    )
+
+    linhas = db.execute(montar_consulta(tipo, cursor, limite + 1, **filtros)).mappings().all()
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = codificar_cursor(linhas[-1]["ano"], linhas[-1]["id"])
+
+    return {
+        "arquivo": arquivo,
+        "url_download": url_download,
+        "registros": [dict(linha) for linha in linhas],
+        "proximo_cursor": proximo_cursor
+    }
+
+
+def ler_lote(tipo: str, cursor: str, tamanho_lote: int, filtros: dict):
+    """Um lote do keyset `(ano, id)`, em uma conexão devolvida ao pool logo após a leitura."""
+    with engine_leitura.connect() as conn:
+        return conn.execute(montar_consulta(tipo, cursor, tamanho_lote, **filtros)).all()
+
+
+def exportar_dataset(tipo: str, formato: str = "ndjson", tamanho_lote: int = 1000, **filtros):
+    """
+    Gera o dataset completo (com os mesmos filtros da API) em NDJSON ou CSV.
+
+    - Lê as linhas em lotes de `tamanho_lote` pelo keyset `(ano, id)`: a memória usada por
+      requisição é constante, independente do tamanho da tabela.
+    - Cada lote usa uma conexão própria do pool de leitura, devolvida antes de o lote ser
+      enviado: um cliente lento não prende conexões durante a transmissão.
+    - O primeiro lote é lido aqui, antes do início da resposta, para que o pool esgotado
+      ainda possa virar 503.
+    """
+    colunas = list(DATASETS[tipo][0].__table__.c.keys())
+    lote = ler_lote(tipo, None, tamanho_lote, filtros)
+    return _transmitir(tipo, formato, tamanho_lote, filtros, colunas, lote)
+
+
+def _transmitir(tipo: str, formato: str, tamanho_lote: int, filtros: dict, colunas: list, lote: list):
+    if formato == "csv":
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        escritor.writerow(colunas)
+    while True:
+        if formato == "csv":
+            escritor.writerows(lote)
+            if buffer.tell():
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        elif lote:
+            yield "".join(
+                json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + "\n" for linha in lote
+            ).encode("utf-8")
+        if len(lote) < tamanho_lote:
+            return
+        ultima = lote[-1]._mapping
+        lote = ler_lote(tipo, codificar_cursor(ultima["ano"], ultima["id"]), tamanho_lote, filtros)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects.sqlite import insert
+from app.config import settings
+from app.database import SessionReservas, SessionLeitura
+from app.models import ReservaColeta
+
+_lock = threading.Lock()
+_contadores = {"reservas": 0, "compartilhadas": 0, "assumidas": 0}
+
+
+def _contar(nome: str):
+    with _lock:
+        _contadores[nome] += 1
+
+
+def _reservar(tipo: str):
+    """
+    Tenta reservar a coleta do dataset (linha livre ou com reserva expirada).
+
+    Retorna `(dono, geracao)`; `dono` é None se outro processo detém a reserva.
+    """
+    dono = uuid.uuid4().hex
+    agora = time.time()
+    r = ReservaColeta
+    stmt = insert(r.__table__).values(tipo=tipo, dono=dono, expira_em=agora + settings.COLETA_RESERVA_S, geracao=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tipo"],
+        set_={
+            "dono": dono,
+            "expira_em": stmt.excluded.expira_em,
+            "geracao": r.__table__.c.geracao + 1,
+            "resultado": None
+        },
+        where=or_(r.__table__.c.dono.is_(None), r.__table__.c.expira_em < agora)
+    )
+    leitura = SessionLeitura()
+    try:
+        anterior = leitura.execute(select(r.dono, r.expira_em).where(r.tipo == tipo)).first()
+    finally:
+        leitura.close()
+
+    # A transação começa pela escrita: com WAL, ler antes e escrever depois pode falhar
+    # (SQLITE_BUSY_SNAPSHOT) se outro processo gravar entre as duas operações
+    session = SessionReservas()
+    try:
+        session.execute(stmt)
+        atual = session.execute(select(r.dono, r.geracao).where(r.tipo == tipo)).one()
+        session.commit()
+    finally:
+        session.close()
+    if atual.dono != dono:
+        return None, atual.geracao
+    _contar("reservas")
+    if anterior is not None and anterior.dono is not None and anterior.expira_em < agora:
+        # O dono anterior não liberou a reserva a tempo (processo encerrado no meio da coleta)
+        _contar("assumidas")
+    return dono, atual.geracao
+
+
+def _liberar(tipo: str, dono: str, resultado):
+    agora = time.time()
+    valores = {
+        "dono": None,
+        "expira_em": None,
+        "concluida_em": agora,
+        "resultado": None if resultado is None else json.dumps(resultado, default=str)
+    }
+    if isinstance(resultado, dict) and "erro" not in resultado:
+        valores["sucesso_em"] = agora
+    session = SessionReservas()
+    try:
+        session.execute(
+            update(ReservaColeta)
+            .where(ReservaColeta.tipo == tipo, ReservaColeta.dono == dono)
+            .values(**valores)
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def _situacao(tipo: str, geracao: int):
+    """
+    Estado da coleta que outro processo está fazendo.
+
+    Retorna `("aguardar", None)`, `("concluida", resultado)` ou `("livre", None)`
+    (reserva expirada ou coleta sem resultado: cabe a quem aguardava tentar de novo).
+    """
+    r = ReservaColeta
+    session = SessionLeitura()
+    try:
+        linha = session.execute(
+            select(r.dono, r.expira_em, r.geracao, r.resultado).where(r.tipo == tipo)
+        ).first()
+    finally:
+        session.close()
+    if linha is None:
+        return "livre", None
+    if linha.dono is not None and linha.expira_em >= time.time():
+        return "aguardar", None
+    if linha.dono is None and linha.geracao >= geracao and linha.resultado is not None:
+        return "concluida", json.loads(linha.resultado)
+    return "livre", None
+
+
+def _compartilhar(resultado: dict) -> dict:
+    _contar("compartilhadas")
+    return {**resultado, "compartilhado": True}
+
+
+def coordenar(tipo: str, forcar: bool, funcao):
+    """
+    Executa `funcao()` (coleta do dataset) em no máximo um processo por vez.
+
+    - Quem obtém a reserva em `reserva_coleta` coleta e grava o resultado na linha.
+    - Os demais processos aguardam e devolvem esse resultado (`compartilhado: True`),
+      sem acessar a Embrapa; com `forcar=True` coletam em seguida, um de cada vez.
+    - Reserva não liberada em `COLETA_RESERVA_S` (processo encerrado) pode ser assumida.
+    """
+    while True:
+        dono, geracao = _reservar(tipo)
+        if dono is not None:
+            resultado = None
+            try:
+                resultado = funcao()
+                return resultado
+            finally:
+                _liberar(tipo, dono, resultado)
+
+        situacao, resultado = "aguardar", None
+        while situacao == "aguardar":
+            time.sleep(settings.COLETA_ESPERA_S)
+            situacao, resultado = _situacao(tipo, geracao)
+        if situacao == "concluida" and not forcar:
+            return _compartilhar(resultado)
+
+
+async def coordenar_async(tipo: str, forcar: bool, fabrica_corrotina):
+    """Como `coordenar`, para a atualização concorrente (corrotinas)."""
+    while True:
+        dono, geracao = await asyncio.to_thread(_reservar, tipo)
+        if dono is not None:
+            resultado = None
+            try:
+                resultado = await fabrica_corrotina()
+                return resultado
+            finally:
+                await asyncio.to_thread(_liberar, tipo, dono, resultado)
+
+        situacao, resultado = "aguardar", None
+        while situacao == "aguardar":
+            await asyncio.sleep(settings.COLETA_ESPERA_S)
+            situacao, resultado = await asyncio.to_thread(_situacao, tipo, geracao)
+        if situacao == "concluida" and not forcar:
+            return _compartilhar(resultado)
+
+
+def verificado_em(tipo: str):
+    """Epoch da última coleta do dataset concluída sem erro, em qualquer processo (ou None)."""
+    session = SessionLeitura()
+    try:
+        return session.execute(
+            select(ReservaColeta.sucesso_em).where(ReservaColeta.tipo == tipo)
+        ).scalar_one_or_none()
+    finally:
+        session.close()
+
+
+def metricas() -> dict:
+    with _lock:
+        return dict(_contadores)
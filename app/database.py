@@ -1,9 +1,132 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from app.config import settings
 
-DATABASE_URL = "sqlite:///./dados_embrapa.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dados_embrapa.db")
+
+
+def _pragmas(somente_leitura: bool):
+    """PRAGMAs aplicados em cada nova conexão do SQLite."""
+    def aplicar(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not somente_leitura:
+            # WAL: leitores não bloqueiam o escritor e vice-versa (persistente no arquivo)
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_BYTES}")
+        # Valor negativo: tamanho do cache de páginas em KiB
+        cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return aplicar
+
+
+# Escritor único: uma conexão no pool serializa as gravações da ingestão e dos metadados.
+# Sem o timeout padrão de 30s: uma coleta feita na requisição desiste logo se outra
+# ingestão ocupa o escritor (e a rota responde com os dados locais)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.SQLITE_POOL_TIMEOUT_S
+)
+event.listen(engine, "connect", _pragmas(somente_leitura=False))
+
+# Leitura: pool próprio para os endpoints de consulta, que seguem lendo durante uma ingestão
+engine_leitura = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=settings.SQLITE_POOL_LEITURA,
+    max_overflow=0,
+    pool_timeout=settings.SQLITE_POOL_TIMEOUT_S
+)
+event.listen(engine_leitura, "connect", _pragmas(somente_leitura=True))
+
+# Usuários: cadastro e tokens não disputam a conexão da ingestão; transações curtas,
+# serializadas pelo próprio SQLite (busy_timeout) com as gravações do escritor
+engine_usuarios = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=settings.SQLITE_POOL_USUARIOS,
+    max_overflow=0,
+    pool_timeout=settings.SQLITE_POOL_TIMEOUT_S
+)
+event.listen(engine_usuarios, "connect", _pragmas(somente_leitura=False))
+
+# Reservas de coleta: transações de uma linha que não esperam na fila do escritor
+# (uma ingestão em andamento só as atrasa pelo lock do SQLite, até o busy_timeout)
+engine_reservas = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=settings.SQLITE_POOL_RESERVAS,
+    max_overflow=0,
+    pool_timeout=settings.SQLITE_POOL_TIMEOUT_S
+)
+event.listen(engine_reservas, "connect", _pragmas(somente_leitura=False))
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura)
+SessionUsuarios = sessionmaker(autocommit=False, autoflush=False, bind=engine_usuarios)
+SessionReservas = sessionmaker(autocommit=False, autoflush=False, bind=engine_reservas)
 
 Base = declarative_base()
+
+# Índices de versões anteriores do esquema, substituídos por outros nos modelos. Só estes
+# são removidos na inicialização: índices criados à mão ou por migrações ficam intactos
+INDICES_SUBSTITUIDOS = (
+    "ix_importacao_pais_ano_valores",  # -> ix_importacao_pais_ano_id_valores
+    "ix_exportacao_pais_ano_valores",  # -> ix_exportacao_pais_ano_id_valores
+    "ix_estatistica_importacao_escore"  # -> ix_estatistica_importacao_abs_escore
+)
+
+def criar_esquema(bind=engine):
+    """
+    Cria as tabelas ausentes e os índices que ainda não existem nas tabelas já criadas
+    (o `create_all` sozinho não adiciona índices novos a tabelas existentes).
+
+    Os índices de `INDICES_SUBSTITUIDOS` ainda presentes são removidos, para não
+    disputarem o planejador com os que os substituíram.
+    """
+    Base.metadata.create_all(bind=bind)
+    # Lidos do sqlite_master: a reflexão do SQLAlchemy ignora índices de expressão
+    tabelas = {tabela.name for tabela in Base.metadata.sorted_tables}
+    with bind.connect() as conn:
+        existentes = {
+            nome for nome, tabela in conn.execute(
+                text("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index'")
+            ) if tabela in tabelas
+        }
+    obsoletos = [nome for nome in INDICES_SUBSTITUIDOS if nome in existentes]
+    novos = [
+        indice for tabela in Base.metadata.sorted_tables
+        for indice in tabela.indexes if indice.name not in existentes
+    ]
+    if obsoletos:
+        with bind.begin() as conn:
+            for nome in obsoletos:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{nome}"'))
+    for indice in novos:
+        indice.create(bind=bind)
+    if novos or obsoletos:
+        # Atualiza as estatísticas usadas pelo planejador de consultas
+        with bind.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+def get_db():
+    db = SessionUsuarios()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_db_leitura():
+    db = SessionLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+class CircuitoAberto(Exception):
+    """Chamada recusada sem acessar a origem: o disjuntor está aberto."""
+
+
+class Disjuntor:
+    """
+    Disjuntor (circuit breaker) de uma origem externa.
+
+    - `fechado`: chamadas liberadas; `falhas` consecutivas abrem o circuito.
+    - `aberto`: chamadas recusadas na hora (`CircuitoAberto`) por `espera` segundos.
+    - `meio_aberto`: passado esse tempo, uma única chamada de sondagem é liberada;
+      sucesso fecha o circuito, falha o reabre por mais `espera` segundos.
+    """
+
+    def __init__(self, falhas: int, espera: float):
+        self.limite_falhas = falhas
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._estado = "fechado"
+        self._falhas_consecutivas = 0
+        self._aberto_em = None
+        self._sondando = False
+        self._contadores = {"aberturas": 0, "rejeitadas": 0, "sondagens": 0}
+
+    def liberar(self):
+        """Autoriza uma chamada ou levanta `CircuitoAberto`."""
+        with self._lock:
+            if self._estado == "fechado":
+                return
+            if self._estado == "aberto" and time.monotonic() - self._aberto_em >= self.espera:
+                self._estado = "meio_aberto"
+            if self._estado == "meio_aberto" and not self._sondando:
+                self._sondando = True
+                self._contadores["sondagens"] += 1
+                return
+            self._contadores["rejeitadas"] += 1
+            restante = max(0.0, self.espera - (time.monotonic() - self._aberto_em))
+        raise CircuitoAberto(f"Origem indisponível; nova tentativa em {restante:.0f}s")
+
+    def recusando(self) -> bool:
+        """
+        Se uma chamada agora seria recusada, sem alterar o estado nem os contadores.
+
+        Permite desistir antes de qualquer trabalho prévio à chamada (ex: reservas no banco).
+        """
+        with self._lock:
+            if self._estado == "aberto":
+                return time.monotonic() - self._aberto_em < self.espera
+            return self._estado == "meio_aberto" and self._sondando
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self._estado = "fechado"
+            self._falhas_consecutivas = 0
+            self._sondando = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self._falhas_consecutivas += 1
+            if self._estado == "meio_aberto" or self._falhas_consecutivas >= self.limite_falhas:
+                if self._estado != "aberto":
+                    self._contadores["aberturas"] += 1
+                self._estado = "aberto"
+                self._aberto_em = time.monotonic()
+            self._sondando = False
+
+    def cancelar_sondagem(self):
+        """Chamada interrompida sem resposta da origem: não conta como sucesso nem falha."""
+        with self._lock:
+            self._sondando = False
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "falhas_consecutivas": self._falhas_consecutivas,
+                **self._contadores
+            }
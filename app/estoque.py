@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from unidecode import unidecode
+from app.models import Importacao, EstatisticaImportacao
+
+# Produto monitorado em cada dataset de importação (ImpVinhos.csv traz apenas vinhos)
+PRODUTOS = {"importacao": "vinhos"}
+MODELOS = {"importacao": Importacao}
+
+# Anos anteriores ao último usados como referência do alerta
+JANELA_ANOS = 5
+
+
+def _resumir(valores: pd.DataFrame) -> pd.DataFrame:
+    """Contagem, média e soma dos quadrados dos desvios (M2) da quantidade de cada país."""
+    grupos = valores.groupby("pais")["quantidade"]
+    resumo = pd.DataFrame({"n": grupos.count(), "media": grupos.mean()})
+    resumo["m2"] = grupos.var(ddof=0).fillna(0.0) * resumo["n"]
+    return resumo
+
+
+def _combinar(a: pd.DataFrame, b: pd.DataFrame, sinal: int) -> pd.DataFrame:
+    """
+    Junta (`sinal=1`) ou retira (`sinal=-1`) o resumo `b` do resumo `a`.
+
+    Fórmula de Chan para médias e variâncias parciais: evita a perda de precisão
+    de manter somas de quadrados de volumes na casa dos milhões de litros.
+    """
+    b = b.reindex(a.index.union(b.index)).fillna(0.0)
+    a = a.reindex(b.index).fillna(0.0)
+    if sinal > 0:
+        n = a["n"] + b["n"]
+        delta = b["media"] - a["media"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = a["media"] + delta * np.where(n > 0, b["n"] / n, 0)
+            m2 = a["m2"] + b["m2"] + delta ** 2 * np.where(n > 0, a["n"] * b["n"] / n, 0)
+    else:
+        n = a["n"] - b["n"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            media = np.where(n > 0, (a["n"] * a["media"] - b["n"] * b["media"]) / n, 0.0)
+            delta = b["media"] - media
+            m2 = np.where(n > 0, a["m2"] - b["m2"] - delta ** 2 * n * b["n"] / a["n"], 0.0)
+    return pd.DataFrame({"n": n, "media": media, "m2": np.maximum(m2, 0.0)}, index=b.index)
+
+
+def _desvio(n, m2):
+    """Desvio padrão amostral a partir de contagem e M2 (NaN com menos de dois anos)."""
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(n > 1, np.sqrt(np.asarray(m2, dtype=float) / (n - 1)), np.nan)
+
+
+def _janela(session: Session, tipo: str, paises: list) -> pd.DataFrame:
+    """Último ano e estatísticas dos `JANELA_ANOS` anteriores, lendo só as linhas recentes de cada país."""
+    modelo = MODELOS[tipo]
+    recentes = select(
+        modelo.pais, modelo.ano, modelo.quantidade,
+        func.row_number().over(partition_by=modelo.pais, order_by=modelo.ano.desc()).label("ordem")
+    ).where(modelo.pais.in_(paises)).subquery()
+    linhas = pd.DataFrame(
+        session.execute(select(recentes).where(recentes.c.ordem <= JANELA_ANOS + 1)).all(),
+        columns=["pais", "ano", "quantidade", "ordem"]
+    )
+    linhas["quantidade"] = linhas["quantidade"].fillna(0.0).astype(float)
+
+    ultimo = linhas[linhas["ordem"] == 1].set_index("pais")
+    referencia = _resumir(linhas[linhas["ordem"] > 1]).reindex(ultimo.index)
+    desvio = _desvio(referencia["n"].fillna(0), referencia["m2"].fillna(0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        escore = np.where(desvio > 0, (ultimo["quantidade"] - referencia["media"]) / desvio, np.nan)
+    return pd.DataFrame({
+        "ultimo_ano": ultimo["ano"].astype(int),
+        "quantidade_ultimo_ano": ultimo["quantidade"],
+        "anos_janela": referencia["n"].fillna(0).astype(int),
+        "media_janela": referencia["media"],
+        "m2_janela": referencia["m2"],
+        "escore_z": escore
+    }, index=ultimo.index)
+
+
+def aplicar_alteracoes(session: Session, tipo: str, alteracoes: pd.DataFrame):
+    """
+    Atualiza `estatistica_importacao` com as linhas gravadas por `upsert_em_lote`.
+
+    - Estatísticas de todo o histórico: o estado salvo de cada país afetado recebe os
+      valores novos e perde os anteriores (`quantidade_atual`), sem reler o histórico.
+    - Referência do alerta: relê apenas as `JANELA_ANOS + 1` linhas mais recentes dos
+      países afetados (a janela avança quando chega um ano novo).
+    """
+    if alteracoes.empty:
+        return
+    produto = PRODUTOS[tipo]
+    e = EstatisticaImportacao
+    novos = pd.DataFrame({
+        "pais": alteracoes["pais"],
+        "quantidade": alteracoes["quantidade"].fillna(0.0).astype(float)
+    })
+    existentes = alteracoes[alteracoes["_merge"] == "both"]
+    anteriores = pd.DataFrame({
+        "pais": existentes["pais"],
+        "quantidade": existentes["quantidade_atual"].fillna(0.0).astype(float)
+    })
+    paises = sorted(novos["pais"].unique())
+
+    salvos = pd.DataFrame(
+        session.execute(
+            select(e.pais, e.anos, e.media, e.m2).where(e.produto == produto, e.pais.in_(paises))
+        ).all(),
+        columns=["pais", "n", "media", "m2"]
+    ).set_index("pais").astype(float)
+    historico = _combinar(_combinar(salvos, _resumir(anteriores), -1), _resumir(novos), 1)
+    estatisticas = historico.join(_janela(session, tipo, paises), how="inner")
+
+    registros = pd.DataFrame({
+        "produto": produto,
+        "pais": estatisticas.index,
+        "anos": estatisticas["n"].astype(int).to_numpy(),
+        "media": estatisticas["media"].to_numpy(),
+        "m2": estatisticas["m2"].to_numpy(),
+        **{c: estatisticas[c].to_numpy() for c in (
+            "ultimo_ano", "quantidade_ultimo_ano", "anos_janela", "media_janela", "m2_janela", "escore_z"
+        )}
+    })
+    registros = registros.astype(object).where(registros.notna(), None).to_dict(orient="records")
+    stmt = insert(e.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["produto", "pais"],
+        set_={c.name: stmt.excluded[c.name] for c in e.__table__.c if not c.primary_key}
+    )
+    session.execute(stmt, registros)
+
+
+def reconstruir(session: Session, tipo: str):
+    """Recalcula do zero as estatísticas do produto a partir da tabela de importação."""
+    modelo = MODELOS[tipo]
+    session.execute(delete(EstatisticaImportacao).where(EstatisticaImportacao.produto == PRODUTOS[tipo]))
+    linhas = pd.DataFrame(
+        session.execute(select(modelo.pais, modelo.quantidade)).all(),
+        columns=["pais", "quantidade"]
+    )
+    aplicar_alteracoes(session, tipo, linhas.assign(quantidade_atual=np.nan, _merge="left_only"))
+
+
+def localizar_produto(produto: str):
+    """Produto monitorado correspondente ao texto informado (ex: `vinho` -> `vinhos`) ou None."""
+    termo = unidecode(produto).strip().lower()
+    for nome in PRODUTOS.values():
+        if nome.startswith(termo) or termo.startswith(nome):
+            return nome
+    return None
+
+
+def _classificar(escore, limite_z: float):
+    if escore is None:
+        return "sem_historico", "Histórico recente insuficiente ou constante para avaliar"
+    if escore >= limite_z:
+        return "alta", "Importações acima do padrão recente: reduzir estoque e rever o volume produzido"
+    if escore <= -limite_z:
+        return "queda", "Importações abaixo do padrão recente: espaço para ampliar estoque e oferta nacional"
+    return "normal", "Importações dentro do padrão recente: manter o planejamento de estoque"
+
+
+def consulta_alertas(
+    produto: str,
+    pais: str = None,
+    limite_z: float = 2.0,
+    somente_alertas: bool = True,
+    limite: int = 50
+):
+    """
+    SELECT dos alertas, do maior desvio para o menor (sem escore por último).
+
+    O índice `(produto, abs(escore_z) DESC, pais)` atende o filtro de `somente_alertas`
+    e a ordenação: a leitura para na `limite`-ésima linha, sem ordenar os alertas.
+    """
+    e = EstatisticaImportacao
+    desvio = func.abs(e.escore_z)
+    consulta = select(e).where(e.produto == produto)
+    if pais:
+        consulta = consulta.where(func.lower(e.pais).contains(pais.lower()))
+    if somente_alertas:
+        consulta = consulta.where(desvio >= limite_z)
+    # Em ordem decrescente o SQLite já coloca NULL por último
+    return consulta.order_by(desvio.desc(), e.pais).limit(limite)
+
+
+def consultar(
+    db: Session,
+    produto: str,
+    pais: str = None,
+    limite_z: float = 2.0,
+    somente_alertas: bool = True,
+    limite: int = 50
+):
+    """
+    Alertas de estoque a partir de `estatistica_importacao`.
+
+    Cada país custa uma leitura de linha: o escore z do último ano contra a janela
+    anterior já está gravado (ver `consulta_alertas`).
+    """
+    consulta = consulta_alertas(produto, pais, limite_z, somente_alertas, limite)
+    itens = []
+    for estatistica in db.execute(consulta).scalars():
+        alerta, recomendacao = _classificar(estatistica.escore_z, limite_z)
+        media_janela = estatistica.media_janela
+        variacao = None
+        if media_janela:
+            variacao = estatistica.quantidade_ultimo_ano / media_janela - 1
+        desvio_janela = _desvio(estatistica.anos_janela, estatistica.m2_janela or 0.0)
+        desvio_historico = _desvio(estatistica.anos, estatistica.m2)
+        itens.append({
+            "pais": estatistica.pais,
+            "ultimo_ano": estatistica.ultimo_ano,
+            "quantidade_ultimo_ano": estatistica.quantidade_ultimo_ano,
+            "media_janela": media_janela,
+            "desvio_janela": None if np.isnan(desvio_janela) else float(desvio_janela),
+            "variacao": variacao,
+            "escore_z": estatistica.escore_z,
+            "alerta": alerta,
+            "recomendacao": recomendacao,
+            "anos_historico": estatistica.anos,
+            "media_historica": estatistica.media,
+            "desvio_historico": None if np.isnan(desvio_historico) else float(desvio_historico)
+        })
+    return itens
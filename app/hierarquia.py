@@ -0,0 +1,165 @@
+import pandas as pd
+from sqlalchemy import select, delete, insert, func, and_
+from sqlalchemy.orm import Session, aliased
+from app.models import Producao, Comercializacao, Processamento, NoHierarquia, FechoHierarquia
+
+# Modelo, coluna descritiva e coluna de valor de cada dataset com `control`
+FONTES = {
+    "producao": (Producao, "produto", "producao_toneladas"),
+    "comercializacao": (Comercializacao, "produto", "volume_comercializado"),
+    "processamento": (Processamento, "cultivar", "volume_processado_litros")
+}
+
+
+def montar_arvore(linhas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Nós da árvore a partir das linhas do dataset (`id_original`, `ano`, `control`, `nome`).
+
+    - Linhas com control sem prefixo (ex: `VINHO DE MESA`) são categorias; as demais
+      (ex: `vm_Tinto`) pertencem à última categoria que as precede no arquivo.
+    - Vale o control/nome do ano mais recente de cada `id_original`.
+    """
+    nos = (
+        linhas.sort_values(["id_original", "ano"])
+        .drop_duplicates("id_original", keep="last")
+        .reset_index(drop=True)
+    )
+    nos["control"] = nos["control"].astype(str)
+    nos["nome"] = nos["nome"].astype(str).str.strip()
+    categoria = ~nos["control"].str.contains("_", regex=False)
+    nos["id_pai"] = nos["id_original"].where(categoria).ffill().where(~categoria)
+    nos["folha"] = ~nos["id_original"].isin(nos["id_pai"].dropna())
+    return nos
+
+
+def montar_fecho(nos: pd.DataFrame) -> list:
+    """Pares (ancestral, descendente) de todos os caminhos da árvore, incluindo o próprio nó."""
+    pais = {int(n): int(p) for n, p in zip(nos["id_original"], nos["id_pai"]) if pd.notna(p)}
+    folhas = dict(zip(nos["id_original"].astype(int), nos["folha"].astype(bool)))
+    fecho = []
+    for no in folhas:
+        ancestral, profundidade = no, 0
+        while ancestral is not None:
+            fecho.append({
+                "ancestral": ancestral,
+                "descendente": no,
+                "profundidade": profundidade,
+                "folha": folhas[no]
+            })
+            ancestral, profundidade = pais.get(ancestral), profundidade + 1
+    return fecho
+
+
+def reconstruir(session: Session, tipo: str):
+    """Regrava `no_hierarquia` e `fecho_hierarquia` do dataset, na transação de `session`."""
+    modelo, coluna_item, _ = FONTES[tipo]
+    t = modelo.__table__
+    linhas = pd.DataFrame(
+        session.execute(select(t.c.id_original, t.c.ano, t.c.control, t.c[coluna_item])).all(),
+        columns=["id_original", "ano", "control", "nome"]
+    )
+    session.execute(delete(FechoHierarquia).where(FechoHierarquia.tipo == tipo))
+    session.execute(delete(NoHierarquia).where(NoHierarquia.tipo == tipo))
+    if linhas.empty:
+        return
+
+    nos = montar_arvore(linhas)
+    fecho = montar_fecho(nos)
+    profundidades = {f["descendente"]: f["profundidade"] for f in fecho}
+    session.execute(insert(NoHierarquia), [
+        {
+            "tipo": tipo,
+            "id_original": int(no.id_original),
+            "control": no.control,
+            "nome": no.nome,
+            "id_pai": None if pd.isna(no.id_pai) else int(no.id_pai),
+            "nivel": profundidades[int(no.id_original)],
+            "folha": bool(no.folha)
+        }
+        for no in nos.itertuples(index=False)
+    ])
+    session.execute(insert(FechoHierarquia), [{"tipo": tipo, **f} for f in fecho])
+
+
+def listar(db: Session, tipo: str):
+    """Todos os nós do dataset, na ordem do arquivo."""
+    consulta = select(NoHierarquia).where(NoHierarquia.tipo == tipo).order_by(NoHierarquia.id_original)
+    return db.execute(consulta).scalars().all()
+
+
+def rollup(db: Session, tipo: str, id_original: int, ano_min: int = None, ano_max: int = None):
+    """
+    Totais por ano do nó e de cada filho direto, somando apenas as folhas da subárvore.
+
+    - Os descendentes vêm de `fecho_hierarquia` (sem comparar strings de `control`),
+      e somar só as folhas evita contar a linha de categoria junto com as subcategorias.
+    - `informado`: valor da própria linha do nó no arquivo (para categorias, o total
+      publicado pela Embrapa).
+
+    Retorna None se o nó não existir.
+    """
+    no = db.get(NoHierarquia, (tipo, id_original))
+    if no is None:
+        return None
+    modelo, _, coluna_valor = FONTES[tipo]
+    t = modelo.__table__
+    f = FechoHierarquia
+    alvo, folhas = aliased(f), aliased(f)
+
+    nos = db.execute(
+        select(NoHierarquia)
+        .join(alvo, and_(alvo.tipo == NoHierarquia.tipo, alvo.descendente == NoHierarquia.id_original))
+        .where(alvo.tipo == tipo, alvo.ancestral == id_original, alvo.profundidade <= 1)
+        .order_by(NoHierarquia.id_original)
+    ).scalars().all()
+    ids = [n.id_original for n in nos]
+
+    filtros_ano = []
+    if ano_min is not None:
+        filtros_ano.append(t.c.ano >= ano_min)
+    if ano_max is not None:
+        filtros_ano.append(t.c.ano <= ano_max)
+
+    totais = db.execute(
+        select(
+            folhas.ancestral, t.c.ano,
+            func.sum(t.c[coluna_valor]).label("total"),
+            func.count().label("folhas")
+        )
+        .join(t, t.c.id_original == folhas.descendente)
+        .where(folhas.tipo == tipo, folhas.ancestral.in_(ids), folhas.folha, *filtros_ano)
+        .group_by(folhas.ancestral, t.c.ano)
+    ).all()
+    informados = {
+        (linha.id_original, linha.ano): linha.valor
+        for linha in db.execute(
+            select(t.c.id_original, t.c.ano, t.c[coluna_valor].label("valor"))
+            .where(t.c.id_original.in_(ids), *filtros_ano)
+        )
+    }
+
+    anos = {i: [] for i in ids}
+    for linha in sorted(totais, key=lambda l: (l.ancestral, l.ano)):
+        anos[linha.ancestral].append({
+            "ano": linha.ano,
+            "total": linha.total,
+            "informado": informados.get((linha.ancestral, linha.ano)),
+            "folhas": linha.folhas
+        })
+
+    def montar(n):
+        return {
+            "id_original": n.id_original,
+            "control": n.control,
+            "nome": n.nome,
+            "id_pai": n.id_pai,
+            "nivel": n.nivel,
+            "folha": n.folha,
+            "anos": anos[n.id_original]
+        }
+
+    return {
+        "tipo": tipo,
+        "no": montar(no),
+        "filhos": [montar(n) for n in nos if n.id_original != id_original]
+    }
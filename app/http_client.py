@@ -0,0 +1,97 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.config import settings
+from app.disjuntor import Disjuntor
+
+_session = None
+_session_lock = threading.Lock()
+_semaforos = {}
+_disjuntores = {}
+
+
+def _criar_sessao():
+    retry = Retry(
+        total=settings.HTTP_TENTATIVAS,
+        backoff_factor=settings.HTTP_BACKOFF,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_MAX,
+        pool_maxsize=settings.HTTP_POOL_MAX,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Sessão HTTP compartilhada (keep-alive e pool de conexões)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _criar_sessao()
+    return _session
+
+
+def _semaforo(host: str):
+    with _session_lock:
+        if host not in _semaforos:
+            _semaforos[host] = threading.BoundedSemaphore(settings.HTTP_MAX_POR_HOST)
+        return _semaforos[host]
+
+
+def disjuntor(host: str) -> Disjuntor:
+    with _session_lock:
+        if host not in _disjuntores:
+            _disjuntores[host] = Disjuntor(settings.DISJUNTOR_FALHAS, settings.DISJUNTOR_ESPERA_S)
+        return _disjuntores[host]
+
+
+def circuito_aberto(url: str) -> bool:
+    """Se o disjuntor do host de `url` recusaria uma chamada agora."""
+    return disjuntor(urlsplit(url).netloc).recusando()
+
+
+def get(url: str, **kwargs):
+    """
+    GET pela sessão compartilhada, com timeouts de conexão/leitura, retentativas
+    com backoff exponencial e limite de requisições simultâneas por host.
+
+    Erros de conexão/timeout e respostas 5xx (após as retentativas) contam como falha
+    no disjuntor do host; com o circuito aberto levanta `CircuitoAberto` sem acessar a rede.
+    Interrupções (`KeyboardInterrupt`, cancelamento) não dizem nada sobre a origem: só
+    liberam a sondagem em andamento.
+    """
+    kwargs.setdefault("timeout", (settings.HTTP_TIMEOUT_CONEXAO, settings.HTTP_TIMEOUT_LEITURA))
+    host = urlsplit(url).netloc
+    circuito = disjuntor(host)
+    circuito.liberar()
+    try:
+        with _semaforo(host):
+            response = get_session().get(url, **kwargs)
+    except requests.RequestException:
+        circuito.registrar_falha()
+        raise
+    except BaseException:
+        circuito.cancelar_sondagem()
+        raise
+    if response.status_code >= 500:
+        circuito.registrar_falha()
+    else:
+        circuito.registrar_sucesso()
+    return response
+
+
+def metricas() -> dict:
+    """Estado do disjuntor de cada host já acessado."""
+    with _session_lock:
+        circuitos = dict(_disjuntores)
+    return {host: c.metricas() for host, c in circuitos.items()}
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy.exc import SQLAlchemyError
+from app import scraper, scraper_import_export
+from app.cache_download import baixar
+from app.coalescencia import coletas
+from app.coordenacao import coordenar, coordenar_async
+from app.config import settings
+from app.agregados import preparar_agregados
+from app.database import criar_esquema
+from app.persistencia import hash_ingerido, marcas_ingeridas
+from app.scraper import fetch_dados_embrapa, salvar_generico, ABAS
+from app.scraper_import_export import fetch_dados_import_export, salvar_import_export, ABAS_ESPECIAIS
+
+TIPOS = list(ABAS) + list(ABAS_ESPECIAIS)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def atualizar_dataset(tipo: str, forcar: bool = False):
+    """
+    Coleta um dataset na Embrapa e grava nas tabelas locais.
+
+    Com `forcar=True` o CSV é reprocessado mesmo que não tenha mudado.
+    Chamadas simultâneas para o mesmo dataset compartilham uma única coleta, neste
+    processo (`coletas`) e entre processos (reserva em `reserva_coleta`).
+    Banco ocupado além de `SQLITE_POOL_TIMEOUT_S` (ex: reserva durante outra ingestão)
+    vira `{"erro": ...}`, como uma falha na Embrapa: a rota responde com os dados locais.
+    """
+    coletar = fetch_dados_import_export if tipo in ABAS_ESPECIAIS else fetch_dados_embrapa
+    try:
+        return coletas.executar((tipo, forcar), coordenar, tipo, forcar, lambda: coletar(tipo, forcar))
+    except SQLAlchemyError as e:
+        return {"erro": f"Banco de dados ocupado: {e}"}
+
+
+def _pool_transformacao():
+    """Pool de processos (reutilizado entre atualizações) para o parsing dos CSVs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.INGESTAO_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _descartar_pool(pool: ProcessPoolExecutor):
+    """Descarta um pool quebrado (processo filho morto) para que o próximo seja recriado."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _atualizar_async(tipo: str, forcar: bool, escrita: asyncio.Lock):
+    # Mesma chave de `atualizar_dataset`: coleta já em andamento é aproveitada
+    return await coletas.executar_async(
+        (tipo, forcar),
+        lambda: coordenar_async(tipo, forcar, lambda: _coletar_async(tipo, forcar, escrita))
+    )
+
+
+async def _coletar_async(tipo: str, forcar: bool, escrita: asyncio.Lock):
+    modulo, salvar = (
+        (scraper_import_export, salvar_import_export) if tipo in ABAS_ESPECIAIS
+        else (scraper, salvar_generico)
+    )
+    try:
+        arquivo, url_download = await asyncio.to_thread(modulo.localizar_csv, tipo, forcar)
+        conteudo, sha256 = await asyncio.to_thread(baixar, url_download, forcar)
+        if not forcar and sha256 == await asyncio.to_thread(hash_ingerido, tipo):
+            return {"inalterado": True}
+
+        # Checksums por ano da última carga: só os anos alterados são transformados
+        marcas = None if forcar else await asyncio.to_thread(marcas_ingeridas, tipo)
+        loop = asyncio.get_running_loop()
+        pool = _pool_transformacao()
+        try:
+            df, marcas = await loop.run_in_executor(pool, modulo.transformar_csv, conteudo, tipo, marcas)
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+            raise
+
+        # O SQLite aceita um escritor por vez: grava cada dataset assim que fica pronto
+        origem = {"arquivo": arquivo, "url_download": url_download, "sha256": sha256}
+        async with escrita:
+            return await asyncio.to_thread(salvar, df, tipo, origem=origem, marcas=marcas)
+    except Exception as e:
+        return {"erro": str(e)}
+
+
+async def atualizar_concorrente(tipos: list = None, forcar: bool = False):
+    """
+    Atualiza os datasets em paralelo: downloads simultâneos, parsing em um pool
+    de processos e gravação de cada dataset à medida que conclui.
+
+    O tempo total tende ao do dataset mais lento, e não à soma de todos.
+    """
+    tipos = tipos or TIPOS
+    escrita = asyncio.Lock()
+    resultados = await asyncio.gather(*[_atualizar_async(tipo, forcar, escrita) for tipo in tipos])
+    return dict(zip(tipos, resultados))
+
+
+def atualizar_todos(tipos: list = None, forcar: bool = False):
+    """Atualiza os datasets informados (ou todos) e devolve o resumo de cada um."""
+    return asyncio.run(atualizar_concorrente(tipos, forcar))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza as tabelas locais com os dados da Embrapa.")
+    parser.add_argument("tipos", nargs="*", help=f"datasets a atualizar (padrão: todos): {', '.join(TIPOS)}")
+    parser.add_argument("--forcar", action="store_true", help="reprocessa mesmo CSVs sem alteração")
+    args = parser.parse_args()
+    invalidos = [t for t in args.tipos if t not in TIPOS]
+    if invalidos:
+        parser.error(f"tipos inválidos: {', '.join(invalidos)}")
+
+    criar_esquema()
+    preparar_agregados()
+    print(json.dumps(atualizar_todos(args.tipos, args.forcar), ensure_ascii=False, indent=2))
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, UniqueConstraint, Index, func
 from datetime import datetime
 from app.database import Base
 
 class Producao(Base):
     __tablename__ = "producao"
-    __table_args__ = (UniqueConstraint('id_original', 'ano', name='_producao_uc'),)
+    __table_args__ = (
+        UniqueConstraint('id_original', 'ano', name='_producao_uc'),
+        Index('ix_producao_produto_ano', 'produto', 'ano'),
+        Index('ix_producao_control_ano', 'control', 'ano'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_original = Column(Integer)
@@ -15,7 +19,11 @@ class Producao(Base):
 
 class Comercializacao(Base):
     __tablename__ = "comercializacao"
-    __table_args__ = (UniqueConstraint('id_original', 'ano', name='_comercializacao_uc'),)
+    __table_args__ = (
+        UniqueConstraint('id_original', 'ano', name='_comercializacao_uc'),
+        Index('ix_comercializacao_produto_ano', 'produto', 'ano'),
+        Index('ix_comercializacao_control_ano', 'control', 'ano'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_original = Column(Integer)
@@ -26,7 +34,11 @@ class Comercializacao(Base):
 
 class Processamento(Base):
     __tablename__ = "processamento"
-    __table_args__ = (UniqueConstraint('id_original', 'ano', name='_processamento_uc'),)
+    __table_args__ = (
+        UniqueConstraint('id_original', 'ano', name='_processamento_uc'),
+        Index('ix_processamento_cultivar_ano', 'cultivar', 'ano'),
+        Index('ix_processamento_control_ano', 'control', 'ano'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_original = Column(Integer)
@@ -37,7 +49,12 @@ class Processamento(Base):
 
 class Importacao(Base):
     __tablename__ = "importacao"
-    __table_args__ = (UniqueConstraint('pais', 'ano', name='_importacao_uc'),)
+    __table_args__ = (
+        UniqueConstraint('pais', 'ano', name='_importacao_uc'),
+        # Cobre filtros por país (na ordem `ano, id` da paginação) e agregações de
+        # quantidade/valor sem ler a tabela
+        Index('ix_importacao_pais_ano_id_valores', 'pais', 'ano', 'id', 'quantidade', 'valor_usd'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     pais = Column(String)
@@ -47,10 +64,161 @@ class Importacao(Base):
 
 class Exportacao(Base):
     __tablename__ = "exportacao"
-    __table_args__ = (UniqueConstraint('pais', 'ano', name='_exportacao_uc'),)
+    __table_args__ = (
+        UniqueConstraint('pais', 'ano', name='_exportacao_uc'),
+        # Cobre filtros por país (na ordem `ano, id` da paginação) e agregações de
+        # quantidade/valor sem ler a tabela
+        Index('ix_exportacao_pais_ano_id_valores', 'pais', 'ano', 'id', 'quantidade', 'valor_usd'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     pais = Column(String)
     ano = Column(Integer, index=True)
     quantidade = Column(Float)
     valor_usd = Column(Float)
+
+class MetadadosDataset(Base):
+    __tablename__ = "metadados_dataset"
+
+    tipo = Column(String, primary_key=True)
+    arquivo = Column(String)
+    url_download = Column(String)
+    sha256 = Column(String)  # Hash do último CSV gravado com sucesso
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime)
+
+class MarcaDagua(Base):
+    # Checksum dos valores de cada ano do último CSV gravado: na próxima carga só os
+    # anos com checksum diferente são transformados e gravados
+    __tablename__ = "marca_dagua"
+
+    tipo = Column(String, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    checksum = Column(String, nullable=False)
+    atualizado_em = Column(DateTime)
+
+class ReservaColeta(Base):
+    # Coordena os processos (workers do gunicorn, CLI): só o dono da reserva coleta o dataset
+    __tablename__ = "reserva_coleta"
+
+    tipo = Column(String, primary_key=True)
+    dono = Column(String)  # None quando livre
+    expira_em = Column(Float)  # Epoch; após esse instante outro processo pode assumir
+    geracao = Column(Integer, nullable=False, default=0)  # Incrementada a cada reserva
+    resultado = Column(Text)  # JSON do resultado da última coleta, lido por quem aguardou
+    concluida_em = Column(Float)
+    sucesso_em = Column(Float)  # Última coleta sem erro: dados locais conferidos com a Embrapa
+
+class AgregadoAnual(Base):
+    """Total por ano de cada dataset, mantido incrementalmente na ingestão."""
+    __tablename__ = "agregado_anual"
+
+    tipo = Column(String, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    quantidade = Column(Float, nullable=False, default=0)
+    valor_usd = Column(Float)  # Somente importação/exportação
+    registros = Column(Integer, nullable=False, default=0)
+
+class AgregadoEntidade(Base):
+    """Total por produto/cultivar/país e década, mantido incrementalmente na ingestão."""
+    __tablename__ = "agregado_entidade"
+
+    tipo = Column(String, primary_key=True)
+    categoria = Column(String, primary_key=True)  # `control` da Embrapa; vazio em importação/exportação
+    entidade = Column(String, primary_key=True)
+    decada = Column(Integer, primary_key=True)
+    quantidade = Column(Float, nullable=False, default=0)
+    valor_usd = Column(Float)
+    registros = Column(Integer, nullable=False, default=0)
+
+class EstatisticaExportacao(Base):
+    """Estatísticas de exportação por país, recalculadas a cada ingestão de `exportacao`."""
+    __tablename__ = "estatistica_exportacao"
+
+    pais = Column(String, primary_key=True)
+    ano_inicial = Column(Integer)  # Primeiro e último ano com exportação
+    ano_final = Column(Integer)
+    quantidade_total = Column(Float)
+    valor_total = Column(Float)
+    cagr_quantidade = Column(Float)
+    cagr_valor = Column(Float)
+    media_movel_quantidade = Column(Float)
+    media_movel_valor = Column(Float)
+    tendencia_quantidade = Column(Float)
+    tendencia_valor = Column(Float)
+    volatilidade_quantidade = Column(Float)
+    volatilidade_valor = Column(Float)
+    preco_medio_litro = Column(Float)
+    preco_litro_ultimo_ano = Column(Float)
+
+class EstatisticaImportacao(Base):
+    __tablename__ = "estatistica_importacao"
+
+    produto = Column(String, primary_key=True)
+    pais = Column(String, primary_key=True)
+    # Histórico completo, mantido de forma incremental: anos, média e soma dos quadrados dos desvios
+    anos = Column(Integer, nullable=False)
+    media = Column(Float, nullable=False)
+    m2 = Column(Float, nullable=False)
+    ultimo_ano = Column(Integer)
+    quantidade_ultimo_ano = Column(Float)
+    # Janela de referência: anos imediatamente anteriores ao último
+    anos_janela = Column(Integer)
+    media_janela = Column(Float)
+    m2_janela = Column(Float)
+    escore_z = Column(Float)  # (último ano - média da janela) / desvio da janela
+
+
+# Alertas por |escore z|: o mesmo índice filtra (`abs(escore_z) >= limite`) e entrega a ordem
+# do maior desvio para o menor, sem ordenar o conjunto de alertas a cada consulta
+Index(
+    'ix_estatistica_importacao_abs_escore',
+    EstatisticaImportacao.produto,
+    func.abs(EstatisticaImportacao.escore_z).desc(),
+    EstatisticaImportacao.pais
+)
+
+class RankingAnual(Base):
+    """Métricas de ranking por ano de produção/comercialização, recalculadas na ingestão."""
+    __tablename__ = "ranking_anual"
+    __table_args__ = (
+        # Um índice por métrica: o top-k de um ano é uma leitura ordenada do índice
+        Index('ix_ranking_anual_volume', 'dataset', 'nivel', 'ano', 'volume'),
+        Index('ix_ranking_anual_variacao', 'dataset', 'nivel', 'ano', 'variacao'),
+        Index('ix_ranking_anual_participacao', 'dataset', 'nivel', 'ano', 'participacao'),
+    )
+
+    dataset = Column(String, primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    id_original = Column(Integer, primary_key=True)
+    nivel = Column(String, nullable=False)  # "produto" ou "categoria"
+    control = Column(String)
+    produto = Column(String)
+    categoria = Column(String)
+    volume = Column(Float)
+    variacao = Column(Float)  # Diferença para o ano anterior
+    participacao = Column(Float)  # Fração do total da categoria (ou do ano, no nível categoria)
+
+class NoHierarquia(Base):
+    __tablename__ = "no_hierarquia"
+
+    tipo = Column(String, primary_key=True)
+    id_original = Column(Integer, primary_key=True)
+    control = Column(String)
+    nome = Column(String)  # Produto ou cultivar
+    id_pai = Column(Integer)  # Categoria que contém o item (None nas categorias)
+    nivel = Column(Integer, nullable=False)  # 0 nas categorias
+    folha = Column(Boolean, nullable=False)
+
+class FechoHierarquia(Base):
+    # Tabela de fecho transitivo: um par (ancestral, descendente) para cada caminho da árvore
+    __tablename__ = "fecho_hierarquia"
+    __table_args__ = (
+        Index('ix_fecho_hierarquia_descendente', 'tipo', 'descendente'),
+    )
+
+    tipo = Column(String, primary_key=True)
+    ancestral = Column(Integer, primary_key=True)
+    descendente = Column(Integer, primary_key=True)
+    profundidade = Column(Integer, nullable=False)  # 0 no próprio nó
+    folha = Column(Boolean, nullable=False)  # Descendente sem filhos (entra nas somas)
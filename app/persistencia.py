@@ -0,0 +1,175 @@
+import hashlib
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.cache_respostas import cache_respostas
+from app.database import SessionLeitura
+from app.models import MetadadosDataset, MarcaDagua
+from app.versoes import versoes
+
+# Quantidade de linhas enviadas por comando INSERT (executemany)
+TAMANHO_LOTE = 500
+
+
+def upsert_em_lote(
+    session: Session,
+    modelo,
+    registros: pd.DataFrame,
+    chaves: list,
+    atualizar: bool = True,
+    tamanho_lote: int = TAMANHO_LOTE,
+    ao_gravar=None
+) -> dict:
+    """
+    Grava um DataFrame inteiro em `modelo` usando INSERT ... ON CONFLICT.
+
+    - O estado atual da tabela é lido em uma única consulta e comparado em memória,
+      de modo que apenas linhas novas ou alteradas são enviadas ao banco.
+    - `chaves` deve corresponder a uma UniqueConstraint do modelo.
+    - Com `atualizar=False` o conflito é resolvido com DO NOTHING (mantém o valor antigo).
+    - `ao_gravar(session, alteracoes)`, se informado, recebe as linhas gravadas com os
+      valores anteriores (`<coluna>_atual`) e `_merge` ("left_only" para linhas novas).
+    - Se `ano` faz parte das chaves, só os anos presentes em `registros` são lidos.
+
+    Retorna a contagem de linhas `inseridos`, `atualizados` e `ignorados`.
+    O commit fica a cargo de quem chama.
+    """
+    colunas = list(registros.columns)
+    valores = [c for c in colunas if c not in chaves]
+
+    # Linhas repetidas no próprio arquivo contam como ignoradas (vale a última)
+    total = len(registros)
+    registros = registros.drop_duplicates(subset=chaves, keep="last")
+    ignorados = total - len(registros)
+
+    consulta = select(*[getattr(modelo, c) for c in colunas])
+    if "ano" in chaves:
+        consulta = consulta.where(modelo.ano.in_(sorted(registros["ano"].unique().tolist())))
+    atuais = pd.DataFrame(session.execute(consulta).all(), columns=colunas)
+    comparacao = registros.merge(
+        atuais, on=chaves, how="left", suffixes=("", "_atual"), indicator=True
+    )
+    novos = comparacao["_merge"] == "left_only"
+    iguais = pd.Series(True, index=comparacao.index)
+    for coluna in valores:
+        iguais &= comparacao[coluna].eq(comparacao[f"{coluna}_atual"])
+    alterados = ~novos & ~iguais
+
+    inseridos = int(novos.sum())
+    atualizados = int(alterados.sum()) if atualizar else 0
+    ignorados += len(comparacao) - inseridos - atualizados
+
+    gravadas = comparacao.loc[novos | alterados if atualizar else novos]
+    pendentes = gravadas[colunas]
+    if not pendentes.empty:
+        stmt = insert(modelo.__table__)
+        if atualizar and valores:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=chaves,
+                set_={c: stmt.excluded[c] for c in valores}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=chaves)
+
+        linhas = pendentes.astype(object).to_dict(orient="records")
+        for inicio in range(0, len(linhas), tamanho_lote):
+            session.execute(stmt, linhas[inicio:inicio + tamanho_lote])
+        if ao_gravar:
+            ao_gravar(session, gravadas)
+
+    return {"inseridos": inseridos, "atualizados": atualizados, "ignorados": ignorados}
+
+
+def registrar_ingestao(session: Session, tipo: str, resumo: dict, origem: dict = None):
+    """
+    Atualiza os metadados do dataset na mesma transação da gravação.
+
+    - `origem` pode trazer `arquivo`, `url_download` e `sha256` do CSV processado.
+    - A `versao` só é incrementada quando a carga inseriu ou alterou linhas.
+    """
+    meta = session.get(MetadadosDataset, tipo) or MetadadosDataset(tipo=tipo, versao=0)
+    for campo in ("arquivo", "url_download", "sha256"):
+        if (origem or {}).get(campo):
+            setattr(meta, campo, origem[campo])
+    if resumo["inseridos"] or resumo["atualizados"]:
+        meta.versao = (meta.versao or 0) + 1
+    meta.atualizado_em = datetime.now(timezone.utc)
+    session.add(meta)
+    return meta
+
+
+def notificar_ingestao(tipo: str, resumo: dict, versao: int, marca: str):
+    """
+    Ações após o commit de uma ingestão: publica a nova versão do dataset (e a marca
+    da carga, ver `versoes.marca_carga`) e descarta as respostas em cache se houve mudança.
+    """
+    versoes.registrar(tipo, versao, marca)
+    if resumo["inseridos"] or resumo["atualizados"]:
+        cache_respostas.invalidar(tipo)
+
+
+def hash_ingerido(tipo: str):
+    """Hash do último CSV gravado com sucesso para o dataset (ou None)."""
+    session = SessionLeitura()
+    try:
+        meta = session.get(MetadadosDataset, tipo)
+        return meta.sha256 if meta else None
+    finally:
+        session.close()
+
+
+def matriz_numerica(df: pd.DataFrame) -> np.ndarray:
+    """Valores de `df` como float (texto inválido vira NaN), convertendo só as colunas não numéricas."""
+    texto = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+    if texto:
+        df = df.assign(**{c: pd.to_numeric(df[c], errors="coerce") for c in texto})
+    return df.to_numpy(dtype=float)
+
+
+def checksums_por_ano(chaves: pd.DataFrame, valores: dict) -> dict:
+    """
+    Checksum de cada ano do CSV, na ordem das linhas.
+
+    `valores` mapeia o ano para a matriz numérica de suas colunas; `chaves` (id,
+    control, nome...) entra em todos os anos, mas é hasheado uma única vez.
+    """
+    base = pd.util.hash_pandas_object(chaves, index=False).to_numpy().tobytes()
+    return {
+        ano: hashlib.sha256(base + np.ascontiguousarray(matriz, dtype=float).tobytes()).hexdigest()
+        for ano, matriz in valores.items()
+    }
+
+
+def anos_alterados(checksums: dict, marcas: dict = None) -> list:
+    """Anos cujo checksum difere do gravado (todos, se `marcas` for None)."""
+    return [ano for ano, checksum in checksums.items() if marcas is None or marcas.get(ano) != checksum]
+
+
+def marcas_ingeridas(tipo: str) -> dict:
+    """Checksum por ano do último CSV gravado para o dataset (`{ano: checksum}`)."""
+    session = SessionLeitura()
+    try:
+        return dict(session.execute(
+            select(MarcaDagua.ano, MarcaDagua.checksum).where(MarcaDagua.tipo == tipo)
+        ).all())
+    finally:
+        session.close()
+
+
+def registrar_marcas(session: Session, tipo: str, marcas: dict):
+    """Grava o checksum dos anos processados, na mesma transação dos dados."""
+    if not marcas:
+        return
+    agora = datetime.now(timezone.utc)
+    stmt = insert(MarcaDagua.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["tipo", "ano"],
+        set_={"checksum": stmt.excluded.checksum, "atualizado_em": stmt.excluded.atualizado_em}
+    )
+    session.execute(stmt, [
+        {"tipo": tipo, "ano": int(ano), "checksum": checksum, "atualizado_em": agora}
+        for ano, checksum in marcas.items()
+    ])
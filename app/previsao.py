@@ -0,0 +1,113 @@
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Producao
+from app.versoes import versoes
+
+# Últimos anos usados no ajuste da tendência de cada série
+JANELA_ANOS = 15
+
+_modelos = {}  # versão do dataset -> parâmetros ajustados
+_modelos_lock = threading.Lock()
+
+
+def ajustar(db: Session, janela: int = JANELA_ANOS) -> dict:
+    """
+    Ajusta uma tendência linear para cada série (produto) de `producao` de uma só vez.
+
+    - Monta a matriz ano × série e resolve todos os mínimos quadrados em uma única
+      chamada a `np.linalg.lstsq` (a matriz de projeto é a mesma para todas as séries).
+    - Retorna intercepto, inclinação e erro padrão dos resíduos de cada série.
+    """
+    linhas = pd.DataFrame(
+        db.execute(select(
+            Producao.id_original, Producao.control, Producao.produto,
+            Producao.ano, Producao.producao_toneladas
+        )).all(),
+        columns=["id_original", "control", "produto", "ano", "valor"]
+    )
+    if linhas.empty:
+        return {"ultimo_ano": None, "series": linhas[["id_original", "control", "produto"]]}
+
+    matriz = linhas.pivot_table(index="ano", columns="id_original", values="valor", aggfunc="sum")
+    matriz = matriz.loc[matriz.index >= matriz.index.max() - janela + 1].fillna(0.0)
+    anos = matriz.index.to_numpy(dtype=float)
+    y = matriz.to_numpy(dtype=float)
+
+    # Centraliza o ano para um sistema bem condicionado
+    centro = anos.mean()
+    x = np.column_stack([np.ones_like(anos), anos - centro])
+    coeficientes, _, _, _ = np.linalg.lstsq(x, y, rcond=None)
+    residuos = y - x @ coeficientes
+    graus = max(len(anos) - 2, 1)
+
+    series = (
+        linhas.drop_duplicates("id_original", keep="last")
+        .set_index("id_original")
+        .loc[matriz.columns, ["control", "produto"]]
+        .reset_index()
+    )
+    series["produto"] = series["produto"].str.strip()
+    return {
+        "ultimo_ano": int(anos.max()),
+        "centro": centro,
+        "intercepto": coeficientes[0],
+        "inclinacao": coeficientes[1],
+        "erro_padrao": np.sqrt((residuos ** 2).sum(axis=0) / graus),
+        "series": series
+    }
+
+
+def modelo_atual(db: Session) -> dict:
+    """Parâmetros ajustados para a versão atual de `producao` (reajusta só após nova ingestão)."""
+    versao = versoes.obter("producao")
+    with _modelos_lock:
+        if versao in _modelos:
+            return _modelos[versao]
+    modelo = ajustar(db)
+    with _modelos_lock:
+        _modelos.clear()
+        _modelos[versao] = modelo
+    return modelo
+
+
+def prever(db: Session, anos: int, produto: str = None, control: str = None) -> dict:
+    """Previsão dos próximos `anos` para todas as séries (ou as filtradas), a partir do cache."""
+    modelo = modelo_atual(db)
+    series = modelo["series"]
+    if modelo["ultimo_ano"] is None:
+        return {"ultimo_ano_observado": None, "janela_anos": JANELA_ANOS, "series": []}
+
+    selecao = np.ones(len(series), dtype=bool)
+    if produto is not None:
+        selecao &= (series["produto"] == produto).to_numpy()
+    if control is not None:
+        selecao &= (series["control"] == control).to_numpy()
+
+    futuros = np.arange(modelo["ultimo_ano"] + 1, modelo["ultimo_ano"] + anos + 1)
+    # anos × séries, sem valores negativos
+    valores = np.maximum(
+        modelo["intercepto"][selecao] + np.outer(futuros - modelo["centro"], modelo["inclinacao"][selecao]),
+        0.0
+    )
+    erro = modelo["erro_padrao"][selecao]
+
+    resultado = []
+    for j, serie in enumerate(series[selecao].itertuples(index=False)):
+        resultado.append({
+            "id_original": int(serie.id_original),
+            "control": serie.control,
+            "produto": serie.produto,
+            "erro_padrao": float(erro[j]),
+            "previsoes": [
+                {"ano": int(ano), "producao_toneladas": float(valor)}
+                for ano, valor in zip(futuros, valores[:, j])
+            ]
+        })
+    return {
+        "ultimo_ano_observado": modelo["ultimo_ano"],
+        "janela_anos": JANELA_ANOS,
+        "series": resultado
+    }
@@ -0,0 +1,99 @@
+from sqlalchemy import select, delete, insert, func, case, and_, literal
+from sqlalchemy.orm import Session, aliased
+from app.models import Producao, Comercializacao, RankingAnual
+
+# Modelo, coluna descritiva e coluna de volume de cada dataset ranqueável
+FONTES = {
+    "comercializacao": (Comercializacao, "produto", "volume_comercializado"),
+    "producao": (Producao, "produto", "producao_toneladas")
+}
+
+
+def _metricas(dataset: str):
+    """
+    Consulta com as métricas de ranking de todas as linhas do dataset (funções de janela).
+
+    - Linhas de categoria (control sem prefixo, ex: `VINHO DE MESA`) formam o nível
+      `categoria`; as demais (ex: `vm_Tinto`), o nível `produto`.
+    - A categoria de cada produto é a última linha de categoria que o precede no arquivo
+      (mesma ordem de `id_original`).
+    """
+    modelo, coluna_item, coluna_volume = FONTES[dataset]
+    t = modelo.__table__
+    eh_categoria = func.instr(t.c.control, "_") == 0
+
+    linhas = select(
+        t.c.id_original,
+        t.c.ano,
+        t.c.control,
+        func.trim(t.c[coluna_item]).label("produto"),
+        t.c[coluna_volume].label("volume"),
+        case((eh_categoria, "categoria"), else_="produto").label("nivel"),
+        func.max(case((eh_categoria, t.c.id_original))).over(
+            partition_by=t.c.ano, order_by=t.c.id_original
+        ).label("id_categoria")
+    ).subquery()
+
+    pai = aliased(t)
+    com_categoria = (
+        select(linhas, func.trim(pai.c[coluna_item]).label("categoria"))
+        .join(pai, and_(pai.c.ano == linhas.c.ano, pai.c.id_original == linhas.c.id_categoria), isouter=True)
+        .subquery()
+    )
+
+    c = com_categoria.c
+    grupo = case((c.nivel == "categoria", 0), else_=c.id_categoria)
+    return select(
+        literal(dataset).label("dataset"),
+        c.ano,
+        c.id_original,
+        c.nivel,
+        c.control,
+        c.produto,
+        c.categoria,
+        c.volume,
+        (c.volume - func.lag(c.volume).over(partition_by=c.id_original, order_by=c.ano)).label("variacao"),
+        (c.volume / func.nullif(func.sum(c.volume).over(partition_by=[c.ano, c.nivel, grupo]), 0)).label("participacao")
+    )
+
+
+def recalcular(session: Session, dataset: str):
+    """Regrava as linhas de `ranking_anual` do dataset, na transação de `session`."""
+    session.execute(delete(RankingAnual).where(RankingAnual.dataset == dataset))
+    consulta = _metricas(dataset)
+    session.execute(
+        insert(RankingAnual).from_select([c.name for c in consulta.selected_columns], consulta)
+    )
+
+
+def ranking(
+    db: Session,
+    dataset: str,
+    ano: int,
+    k: int = 10,
+    metrica: str = "volume",
+    nivel: str = "produto",
+    categoria: str = None
+):
+    """
+    Top-k de um ano a partir de `ranking_anual`.
+
+    - A ordenação percorre o índice `(dataset, nivel, ano, <métrica>)`, sem ordenar em memória.
+    - `variacao`: diferença para o ano anterior; `participacao`: fração do total do ano
+      dentro da categoria (ou de todas as categorias, no nível categoria).
+    - Empates recebem a mesma `posicao` (como `RANK()`).
+    """
+    r = RankingAnual
+    coluna = getattr(r, metrica)
+    consulta = select(
+        r.id_original, r.control, r.produto, r.categoria, r.volume, r.variacao, r.participacao
+    ).where(r.dataset == dataset, r.nivel == nivel, r.ano == ano)
+    if categoria is not None:
+        consulta = consulta.where(r.categoria == categoria)
+    linhas = db.execute(consulta.order_by(coluna.desc().nulls_last()).limit(k)).mappings().all()
+
+    itens = []
+    for i, linha in enumerate(linhas):
+        empate = i and linha[metrica] == linhas[i - 1][metrica]
+        itens.append({"posicao": itens[-1]["posicao"] if empate else i + 1, **linha})
+    return itens
@@ -0,0 +1,128 @@
+import threading
+import time
+from datetime import timezone
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app import http_client
+from app.config import settings
+from app.consultas import DATASETS, DOWNLOAD_BASE
+from app.coordenacao import verificado_em
+from app.database import SessionLeitura
+from app.models import MetadadosDataset
+
+_lock = threading.Lock()
+_em_segundo_plano = set()
+_falhou_em = {}
+_contadores = {"revalidacoes": 0, "falhas": 0, "respostas_obsoletas": 0}
+
+
+def _contar(nome: str):
+    with _lock:
+        _contadores[nome] += 1
+
+
+def idade(tipo: str):
+    """
+    Segundos desde que os dados locais do dataset foram conferidos com a Embrapa.
+
+    Usa a última coleta sem erro (`reserva_coleta`, de qualquer processo) ou, na falta
+    dela, a última ingestão gravada (`metadados_dataset`). None se nunca houve carga.
+    """
+    instante = verificado_em(tipo)
+    if instante is None:
+        session = SessionLeitura()
+        try:
+            meta = session.get(MetadadosDataset, tipo)
+        finally:
+            session.close()
+        if meta is None or meta.atualizado_em is None:
+            return None
+        atualizado_em = meta.atualizado_em
+        if atualizado_em.tzinfo is None:
+            atualizado_em = atualizado_em.replace(tzinfo=timezone.utc)
+        instante = atualizado_em.timestamp()
+    return max(0, int(time.time() - instante))
+
+
+def tem_dados(db: Session, tipo: str) -> bool:
+    """Se a tabela do dataset já tem linhas (ex: base distribuída sem metadados de ingestão)."""
+    modelo = DATASETS[tipo][0]
+    return db.execute(select(modelo.id).limit(1)).first() is not None
+
+
+def obsoleto(idade_s) -> bool:
+    """Dados nunca conferidos (`idade_s` None) ou conferidos há mais de `REVALIDAR_APOS_S`."""
+    return idade_s is None or idade_s > settings.REVALIDAR_APOS_S
+
+
+def _em_espera(tipo: str) -> bool:
+    falhou_em = _falhou_em.get(tipo)
+    return falhou_em is not None and time.monotonic() - falhou_em < settings.DISJUNTOR_ESPERA_S
+
+
+def pode_coletar(tipo: str) -> bool:
+    """
+    Se vale a pena tentar uma coleta do dataset agora.
+
+    Falso com o disjuntor da Embrapa aberto ou durante a espera após uma coleta com
+    falha: a requisição responde com os dados locais sem reservar a coleta nem ocupar
+    a conexão de escrita.
+    """
+    with _lock:
+        if _em_espera(tipo):
+            return False
+    return not http_client.circuito_aberto(DOWNLOAD_BASE)
+
+
+def registrar_coleta(tipo: str, falhou: bool):
+    """Inicia (falha) ou encerra (sucesso) a espera antes da próxima coleta do dataset."""
+    with _lock:
+        if falhou:
+            _falhou_em[tipo] = time.monotonic()
+        else:
+            _falhou_em.pop(tipo, None)
+
+
+def servir_obsoleto():
+    """Registra uma resposta com dados locais servida após falha na Embrapa."""
+    _contar("respostas_obsoletas")
+
+
+def revalidar(tipo: str, atualizar):
+    """
+    Executa `atualizar(tipo)` em uma thread, sem bloquear a requisição.
+
+    - No máximo uma revalidação por dataset neste processo; entre processos, a coleta
+      já é única (`coordenacao`).
+    - Após uma falha, ou com o disjuntor da Embrapa aberto, não inicia a coleta (ver
+      `pode_coletar`): nada de uma reserva no banco a cada requisição durante a queda.
+
+    Retorna False se a revalidação não foi iniciada.
+    """
+    if http_client.circuito_aberto(DOWNLOAD_BASE):
+        return False
+    with _lock:
+        if tipo in _em_segundo_plano or _em_espera(tipo):
+            return False
+        _em_segundo_plano.add(tipo)
+        _contadores["revalidacoes"] += 1
+
+    def executar():
+        falhou = True
+        try:
+            resultado = atualizar(tipo)
+            falhou = isinstance(resultado, dict) and "erro" in resultado
+        finally:
+            with _lock:
+                _em_segundo_plano.discard(tipo)
+                if falhou:
+                    _contadores["falhas"] += 1
+            registrar_coleta(tipo, falhou)
+
+    threading.Thread(target=executar, name=f"revalidar-{tipo}", daemon=True).start()
+    return True
+
+
+def metricas() -> dict:
+    with _lock:
+        return {**_contadores, "em_andamento": len(_em_segundo_plano)}
@@ -1,26 +1,167 @@
 import datetime
-from typing import List
-from fastapi import APIRouter, Depends, Request, HTTPException, status
-from fastapi.responses import HTMLResponse
-from app.scraper import fetch_dados_embrapa
-from app.scraper_import_export import fetch_dados_import_export
+import hashlib
+import time
+from typing import List, Optional, Literal
+from fastapi import APIRouter, Depends, Request, HTTPException, status, Body, Query
+from fastapi.responses import HTMLResponse, StreamingResponse, Response
+from sqlalchemy.orm import Session
+from app.ingestao import atualizar_dataset, atualizar_concorrente
+from app.consultas import consultar_dataset, exportar_dataset, CursorInvalido, COLUNA_ITEM
+from app.colunar import exportar_colunar, MEDIA_TYPES, EXTENSOES
+from app.agregados import resumo_anual, resumo_entidades
+from app import hierarquia
+from app.cache_respostas import cache_respostas
+from app.senhas import pool_senhas
+from app.coalescencia import coletas
+from app import coordenacao, http_client, revalidacao
+from app.versoes import versoes
 from app.auth import router as auth_router
 from app.auth_token import get_current_user
 from app.analytics import router as analytics_router
-from app.database import engine
+from app.database import engine_leitura, get_db_leitura
+from app.config import settings, ADMIN_USERNAME, ADMIN_PASSWORD
 from app.schema import (
     ProducaoResponse,
     ProcessamentoResponse,
     ComercializacaoResponse,
     ImportacaoResponse,
     ExportacaoResponse,
-    HealthResponse)
+    AtualizarDadosRequest,
+    AtualizacaoResponse,
+    HealthResponse,
+    MetricasResponse,
+    ResumoAnualResponse,
+    ResumoEntidadesResponse,
+    HierarquiaResponse,
+    RollupResponse,
+    TipoDataset,
+    TipoHierarquico)
 
 router = APIRouter()
 
 # Rotas abertas relacionadas à autenticação
 router.include_router(auth_router)
 
+def parametros_consulta(
+    limit: int = Query(100, ge=1, le=1000, description="Quantidade máxima de registros na página"),
+    cursor: Optional[str] = Query(None, description="Valor de `proximo_cursor` da página anterior"),
+    ano_min: Optional[int] = Query(None, ge=1970, le=2100, description="Ano inicial (inclusive)"),
+    ano_max: Optional[int] = Query(None, ge=1970, le=2100, description="Ano final (inclusive)")
+):
+    """Paginação por keyset e filtro de anos comuns a todos os endpoints de dados."""
+    return {"limite": limit, "cursor": cursor, "ano_min": ano_min, "ano_max": ano_max}
+
+
+# Modelo de resposta usado na serialização de cada dataset
+RESPOSTAS = {
+    "producao": ProducaoResponse,
+    "comercializacao": ComercializacaoResponse,
+    "processamento": ProcessamentoResponse,
+    "importacao": ImportacaoResponse,
+    "exportacao": ExportacaoResponse
+}
+
+
+def etag_dataset(tipo: str, parametros) -> str:
+    """
+    ETag forte: revisão atual do dataset + assinatura dos parâmetros da requisição.
+
+    A revisão inclui a marca da última carga (`versoes.marca_carga`): com um banco novo
+    ou substituído a versão recomeça, mas ETags e chaves do cache de respostas em disco
+    não coincidem com as da base anterior.
+    """
+    assinatura = hashlib.sha256(repr(parametros).encode("utf-8")).hexdigest()[:16]
+    return f'"{tipo}-v{versoes.revisao(tipo)}-{assinatura}"'
+
+
+def etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
+
+
+def responder_dataset(tipo: str, db: Session, request: Request, **consulta):
+    """
+    Responde um endpoint de dataset a partir das tabelas locais.
+
+    - No modo `scraper` (MODO_DADOS), atualiza o dataset na Embrapa antes da consulta;
+      requisições simultâneas do mesmo dataset aguardam uma única coleta. Se a coleta
+      falhar, responde com os dados locais; com o disjuntor da Embrapa aberto ou logo
+      após uma falha, nem tenta a coleta (nenhuma reserva no banco).
+    - No modo `revalidar`, responde na hora com os dados locais e, se foram conferidos
+      há mais de `REVALIDAR_APOS_S`, atualiza o dataset em segundo plano; só aguarda
+      a Embrapa quando o dataset ainda não tem nenhuma carga.
+    - Nos dois modos, o header `Age` informa há quantos segundos os dados foram
+      conferidos com a Embrapa (ausente se nunca foram).
+    - `consulta` traz paginação e filtros, repassados a `consultar_dataset`.
+    - Toda resposta leva um ETag derivado da versão do dataset; `If-None-Match`
+      correspondente recebe 304 sem consultar o banco.
+    - A resposta serializada fica em cache por rota + parâmetros normalizados,
+      até expirar ou até a próxima ingestão do dataset.
+    - Cursor inválido vira HTTP 400; falhas de conexão e erros internos viram HTTP 503.
+    """
+    try:
+        idade = None
+        if settings.MODO_DADOS in ("scraper", "revalidar"):
+            idade = revalidacao.idade(tipo)
+            locais = idade is not None or revalidacao.tem_dados(db, tipo)
+            if settings.MODO_DADOS == "revalidar" and locais:
+                if revalidacao.obsoleto(idade):
+                    revalidacao.revalidar(tipo, atualizar_dataset)
+            elif not revalidacao.pode_coletar(tipo):
+                # Embrapa fora do ar: responde sem reservar a coleta nem esperar pelo escritor
+                if not locais:
+                    raise HTTPException(
+                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail="Embrapa indisponível e dataset sem carga local. Tente novamente."
+                    )
+                revalidacao.servir_obsoleto()
+            else:
+                data = atualizar_dataset(tipo)
+                falhou = isinstance(data, dict) and "erro" in data
+                revalidacao.registrar_coleta(tipo, falhou)
+
+                # Verifica se o retorno é um dicionário com erro (ex: site fora do ar)
+                if falhou:
+                    if not locais:
+                        raise HTTPException(
+                            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=data["erro"]
+                        )
+                    revalidacao.servir_obsoleto()
+                else:
+                    idade = 0
+
+        parametros = tuple(sorted((k, v) for k, v in consulta.items() if v not in (None, "")))
+        etag = etag_dataset(tipo, parametros)
+        headers = {"ETag": etag}
+        if idade is not None:
+            headers["Age"] = str(idade)
+        if etag_corresponde(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        chave = (tipo, etag, parametros)
+        conteudo = cache_respostas.obter(chave)
+        if conteudo is None:
+            dados = consultar_dataset(db, tipo, **consulta)
+            conteudo = RESPOSTAS[tipo].model_validate(dados).model_dump_json().encode("utf-8")
+            cache_respostas.guardar(chave, tipo, conteudo)
+
+        return Response(content=conteudo, media_type="application/json", headers=headers)
+
+    except HTTPException as he:
+        raise he
+    except CursorInvalido as ce:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ce))
+    except Exception as e:
+        # Captura todas as outras exceções e converte para 503
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+
+
 # Endpoints protegidos por JWT
 @router.get(
     "/producao",
@@ -29,48 +170,22 @@ router.include_router(auth_router)
     tags=["Scraper"],
     responses={503: {"description": "Serviço indisponível"}}
 )
-def producao(usuario: str = Depends(get_current_user)):
+def producao(
+    request: Request,
+    consulta: dict = Depends(parametros_consulta),
+    produto: Optional[str] = Query(None, description="Produto exato (ex: `Tinto`)"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa (ex: `VINHO DE MESA`)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
-    Extrai dados históricos de produção vitivinícola do Brasil via scraping no site da Embrapa.
+    Retorna dados históricos de produção vitivinícola do Brasil, coletados do site da Embrapa.
     - Retorna dados processados com base na estrutura definida no modelo `ProducaoResponse`.
+    - Lê da base local; a coleta roda fora da requisição (`python -m app.ingestao`).
+    - Paginação com `limit`/`cursor` e filtros por `ano_min`, `ano_max`, `produto` e `control`.
     - Trata falhas de conexão e erros internos com respostas HTTP 503.
     """
-    try:
-        data = fetch_dados_embrapa("producao")
-        
-        # Verifica se o retorno é um dicionário com erro (ex: site fora do ar)
-        if isinstance(data, dict) and "erro" in data:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=data["erro"]
-            )
-        
-        # Transforma os dados para corresponder ao modelo Pydantic
-        registros_mapeados = []
-        for item in data["registros"]:
-            registros_mapeados.append({
-                "id": item["id"],
-                "id_original": item.get("id_original", item["id"]),  # Fallback para 'id'
-                "control": item["control"],
-                "produto": item["produto"],
-                "ano": item["ano"],
-                "producao_toneladas": float(item["quantidade"])  # Converte para float
-            })
-        
-        return {
-            "arquivo": data["arquivo"],
-            "url_download": data["url_download"],
-            "registros": registros_mapeados
-        }
-    
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        # Captura todas as outras exceções e converte para 503
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=str(e)
-        )
+    return responder_dataset("producao", db, request, item=produto, control=control, **consulta)
     
 
 @router.get(
@@ -80,50 +195,22 @@ def producao(usuario: str = Depends(get_current_user)):
     tags=["Scraper"],
     responses={503: {"description": "Serviço indisponível"}}
 )
-def comercializacao(usuario: str = Depends(get_current_user)):
+def comercializacao(
+    request: Request,
+    consulta: dict = Depends(parametros_consulta),
+    produto: Optional[str] = Query(None, description="Produto exato"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa (ex: `VINHO DE MESA`)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Retorna dados de comercialização de uvas e derivados no Brasil, conforme publicações da Embrapa.
     - Inclui histórico de volumes por produto e ano.
     - Evita duplicidade na base de dados.
-    - Retorna amostra com até 100 registros.
+    - Retorna páginas de até `limit` registros (padrão 100); use `proximo_cursor` para avançar.
     🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    try:
-        data = fetch_dados_embrapa("comercializacao")
-        
-        # Verifica se o retorno é um dicionário com erro (ex: site fora do ar)
-        if isinstance(data, dict) and "erro" in data:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=data["erro"]
-            )
-        
-        # Transforma os dados para corresponder ao modelo Pydantic
-        registros_mapeados = []
-        for item in data["registros"]:
-            registros_mapeados.append({
-                "id": item["id"],
-                "id_original": item.get("id_original", item["id"]),  # Fallback para 'id'
-                "control": item["control"],
-                "produto": item["Produto"],
-                "ano": item["ano"],
-                "volume_comercializado": float(item["quantidade"])  # Converte para float
-            })
-        
-        return {
-            "arquivo": data["arquivo"],
-            "url_download": data["url_download"],
-            "registros": registros_mapeados
-        }
-    
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        # Captura todas as outras exceções e converte para 503
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=str(e)
-        )
+    return responder_dataset("comercializacao", db, request, item=produto, control=control, **consulta)
     
     
 @router.get(
@@ -133,48 +220,22 @@ def comercializacao(usuario: str = Depends(get_current_user)):
     tags=["Scraper"],
     responses={503: {"description": "Serviço indisponível"}}
 )
-def processamento(usuario: str = Depends(get_current_user)):
+def processamento(
+    request: Request,
+    consulta: dict = Depends(parametros_consulta),
+    cultivar: Optional[str] = Query(None, description="Cultivar exata (ex: `Cabernet Sauvignon`)"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa (ex: `VINHO DE MESA`)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Consulta os dados de processamento de uvas por cultivar no Brasil, extraídos da base da Embrapa.
     - O sistema coleta o arquivo `ProcessaViniferas.csv` e transforma em estrutura relacional.
     - Cada linha representa o volume processado por ano e variedade.
+    - Paginação com `limit`/`cursor` e filtros por `ano_min`, `ano_max`, `cultivar` e `control`.
     🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    try:
-        data = fetch_dados_embrapa("processamento")
-        
-        if isinstance(data, dict) and "erro" in data:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=data["erro"]
-            )
-        
-        # Transforma dados para o modelo esperado
-        registros_mapeados = []
-        for item in data["registros"]:
-            registros_mapeados.append({
-                "id": item["id"],
-                "id_original": item.get("id_original", item["id"]),
-                "control": item["control"],
-                "cultivar": item["cultivar"],
-                "ano": item["ano"],
-                "volume_processado_litros": float(item["quantidade"])
-            })
-        
-        return {
-            "arquivo": data["arquivo"],
-            "url_download": data["url_download"],
-            "registros": registros_mapeados
-        }
-        
-    except HTTPException as http_err:
-        raise http_err
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=str(e)
-        )
+    return responder_dataset("processamento", db, request, item=cultivar, control=control, **consulta)
 
 
 @router.get(
@@ -184,46 +245,22 @@ def processamento(usuario: str = Depends(get_current_user)):
     tags=["Scraper"],
     responses={503: {"description": "Serviço indisponível"}}
 )
-def importacao(usuario: str = Depends(get_current_user)):
+def importacao(
+    request: Request,
+    consulta: dict = Depends(parametros_consulta),
+    pais: Optional[str] = Query(None, description="País de origem exato"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Apresenta os dados de importação de vinhos por país e por ano, conforme informações da Embrapa.
     - Inclui quantidade e valor em dólares por país.
     - Realiza parsing de arquivos com colunas duplicadas por ano.
     - Persistência controlada por `pais` e `ano`.
+    - Paginação com `limit`/`cursor` e filtros por `ano_min`, `ano_max` e `pais`.
     🔒 É necessário um token JWT válido para acessar este endpoint.
     """
-    try:
-        data = fetch_dados_import_export("importacao")
-        
-        if isinstance(data, dict) and "erro" in data:
-            raise HTTPException(status_code=503, detail=data["erro"])
-        
-        registros_mapeados = []
-        for item in data["registros"]:
-            registros_mapeados.append({
-                "id": item["id"],
-                "pais": item["pais"],
-                "ano": item["ano"],
-                "quantidade": float(item["quantidade"]),
-                "valor_usd": float(item["valor_usd"])
-            })
-        
-        return {
-            "arquivo": data["arquivo"],
-            "url_download": data["url_download"],
-            "registros": registros_mapeados
-        }
-        
-    except KeyError as ke:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Campo ausente nos dados: {str(ke)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=str(e)
-        )
+    return responder_dataset("importacao", db, request, item=pais, **consulta)
 
 @router.get(
     "/exportacao",
@@ -232,49 +269,250 @@ def importacao(usuario: str = Depends(get_current_user)):
     tags=["Scraper"],
     responses={503: {"description": "Serviço indisponível"}}
 )
-def exportacao(usuario: str = Depends(get_current_user)):
+def exportacao(
+    request: Request,
+    consulta: dict = Depends(parametros_consulta),
+    pais: Optional[str] = Query(None, description="País de destino exato"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
     """
     Exibe os dados de exportação de vinhos por país, consolidados pela Embrapa ao longo dos anos.
     - O endpoint carrega o arquivo `expvinho.csv` e trata valores em `quantidade` e `USD`.
     - Cada país aparece com o respectivo volume exportado por ano.
+    - Paginação com `limit`/`cursor` e filtros por `ano_min`, `ano_max` e `pais`.
     🔒 Este endpoint só pode ser acessado por usuários autenticados com JWT.
     """
-    try:
-        data = fetch_dados_import_export("exportacao")
-        
-        if isinstance(data, dict) and "erro" in data:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=data["erro"]
-            )
-        
-        # Transforma dados para o modelo esperado
-        registros_mapeados = []
-        for item in data["registros"]:
-            registros_mapeados.append({
-                "id": item["id"],
-                "pais": item["pais"],
-                "ano": item["ano"],
-                "quantidade": float(item["quantidade"]),
-                "valor_usd": float(item["valor_usd"])
-            })
-        
-        return {
-            "arquivo": data["arquivo"],
-            "url_download": data["url_download"],
-            "registros": registros_mapeados
-        }
-        
-    except KeyError as ke:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Campo ausente nos dados: {str(ke)}"
+    return responder_dataset("exportacao", db, request, item=pais, **consulta)
+
+@router.get(
+    "/{tipo}/exportar",
+    summary="Exporta o dataset completo em NDJSON, CSV, Arrow ou Parquet",
+    tags=["Scraper"],
+    response_class=StreamingResponse,
+    responses={200: {"content": {
+        "application/x-ndjson": {},
+        "text/csv": {},
+        "application/vnd.apache.arrow.stream": {},
+        "application/vnd.apache.parquet": {}
+    }}}
+)
+def exportar(
+    request: Request,
+    tipo: TipoDataset,
+    formato: Literal["ndjson", "csv", "arrow", "parquet"] = Query("ndjson", description="Formato de saída"),
+    ano_min: Optional[int] = Query(None, ge=1970, le=2100, description="Ano inicial (inclusive)"),
+    ano_max: Optional[int] = Query(None, ge=1970, le=2100, description="Ano final (inclusive)"),
+    produto: Optional[str] = Query(None, description="Produção/comercialização: produto exato"),
+    cultivar: Optional[str] = Query(None, description="Processamento: cultivar exata"),
+    pais: Optional[str] = Query(None, description="Importação/exportação: país exato"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa"),
+    usuario: str = Depends(get_current_user)
+):
+    """
+    Exporta todas as linhas de um dataset, em uma única resposta transmitida aos poucos.
+
+    - `ndjson`: um objeto JSON por linha; `csv`: cabeçalho seguido das linhas.
+    - `arrow` (IPC stream) e `parquet`: formato colunar, carregado pelo cliente sem parsing
+      (ex: `pd.read_parquet`); o arquivo gerado fica em cache em disco até a próxima ingestão.
+    - Aceita os mesmos filtros dos endpoints de dados; a ordem é `(ano, id)`.
+    - Em todos os formatos a memória usada independe do tamanho da tabela (leitura em
+      lotes, sem prender uma conexão do banco enquanto o cliente recebe a resposta).
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    item = {"produto": produto, "cultivar": cultivar, "pais": pais}[COLUNA_ITEM[tipo]]
+    filtros = {"ano_min": ano_min, "ano_max": ano_max, "item": item, "control": control}
+
+    etag = etag_dataset(tipo, (formato, tuple(sorted((k, v) for k, v in filtros.items() if v is not None))))
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    if formato in MEDIA_TYPES:
+        return StreamingResponse(
+            exportar_colunar(tipo, formato, **filtros),
+            media_type=MEDIA_TYPES[formato],
+            headers={
+                "Content-Disposition": f'attachment; filename="{tipo}.{EXTENSOES[formato]}"',
+                "ETag": etag
+            }
         )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=str(e)
+
+    conteudo = exportar_dataset(tipo, formato, **filtros)
+    if formato == "csv":
+        return StreamingResponse(
+            conteudo,
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{tipo}.csv"', "ETag": etag}
         )
+    return StreamingResponse(conteudo, media_type="application/x-ndjson", headers={"ETag": etag})
+
+@router.get(
+    "/{tipo}/resumo/anual",
+    response_model=ResumoAnualResponse,
+    summary="Totais por ano de um dataset",
+    tags=["Resumos"]
+)
+def resumo_por_ano(
+    request: Request,
+    tipo: TipoDataset,
+    ano_min: Optional[int] = Query(None, ge=1970, le=2100, description="Ano inicial (inclusive)"),
+    ano_max: Optional[int] = Query(None, ge=1970, le=2100, description="Ano final (inclusive)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Total por ano (quantidade, valor em US$ no comércio exterior e número de registros).
+
+    - Lido da tabela `agregado_anual`, mantida na própria ingestão: o custo depende
+      apenas do número de anos retornados.
+    - Em produção, comercialização e processamento soma somente as linhas de categoria
+      (ex: `VINHO DE MESA`), que já incluem as subcategorias.
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    etag = etag_dataset(tipo, ("resumo-anual", ano_min, ano_max))
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    dados = {"tipo": tipo, "registros": resumo_anual(db, tipo, ano_min, ano_max)}
+    return Response(
+        content=ResumoAnualResponse.model_validate(dados).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.get(
+    "/{tipo}/resumo/entidades",
+    response_model=ResumoEntidadesResponse,
+    summary="Totais por produto, cultivar ou país",
+    tags=["Resumos"]
+)
+def resumo_por_entidade(
+    request: Request,
+    tipo: TipoDataset,
+    agrupar: Literal["decada", "total"] = Query("decada", description="`decada`: uma linha por década; `total`: todo o período"),
+    decada: Optional[int] = Query(None, ge=1970, le=2100, description="Década (ex: `2010`)"),
+    entidade: Optional[str] = Query(None, description="Produto, cultivar ou país exato"),
+    control: Optional[str] = Query(None, description="Código de controle da Embrapa"),
+    limit: int = Query(100, ge=1, le=1000, description="Quantidade máxima de linhas"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Total por produto/cultivar (produção, comercialização, processamento) ou por país
+    (importação, exportação), por década ou no período todo, do maior para o menor.
+
+    - Lido da tabela `agregado_entidade`, mantida na própria ingestão.
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    etag = etag_dataset(tipo, ("resumo-entidades", agrupar, decada, entidade, control, limit))
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    registros = resumo_entidades(
+        db, tipo,
+        por_decada=agrupar == "decada",
+        decada=decada,
+        entidade=entidade,
+        categoria=control,
+        limite=limit
+    )
+    return Response(
+        content=ResumoEntidadesResponse.model_validate({"tipo": tipo, "registros": registros}).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.get(
+    "/{tipo}/hierarquia",
+    response_model=HierarquiaResponse,
+    summary="Árvore de categorias e itens de um dataset",
+    tags=["Resumos"]
+)
+def arvore_hierarquia(
+    request: Request,
+    tipo: TipoHierarquico,
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Nós da hierarquia codificada na coluna `control` (ex: `VINHO DE MESA` → `vm_Tinto`).
+
+    - Montada na ingestão: cada item pertence à última categoria que o precede no arquivo.
+    - `id_pai` e `folha` indicam onde detalhar com `/{tipo}/hierarquia/{id_original}/rollup`.
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    etag = etag_dataset(tipo, ("hierarquia",))
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    dados = {"tipo": tipo, "nos": hierarquia.listar(db, tipo)}
+    return Response(
+        content=HierarquiaResponse.model_validate(dados).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.get(
+    "/{tipo}/hierarquia/{id_original}/rollup",
+    response_model=RollupResponse,
+    summary="Totais por ano de uma subárvore da hierarquia",
+    tags=["Resumos"]
+)
+def rollup_hierarquia(
+    request: Request,
+    tipo: TipoHierarquico,
+    id_original: int,
+    ano_min: Optional[int] = Query(None, ge=1970, le=2100, description="Ano inicial (inclusive)"),
+    ano_max: Optional[int] = Query(None, ge=1970, le=2100, description="Ano final (inclusive)"),
+    usuario: str = Depends(get_current_user),
+    db: Session = Depends(get_db_leitura)
+):
+    """
+    Total por ano do nó e de cada filho direto, para detalhamento (drill-down).
+
+    - Soma apenas as folhas da subárvore, lidas da tabela de fecho `fecho_hierarquia`:
+      a linha de categoria não é contada junto com as subcategorias.
+    - `informado`: valor da própria linha do nó no arquivo da Embrapa.
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    etag = etag_dataset(tipo, ("rollup", id_original, ano_min, ano_max))
+    if etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    dados = hierarquia.rollup(db, tipo, id_original, ano_min, ano_max)
+    if dados is None:
+        raise HTTPException(status_code=404, detail="Nó não encontrado na hierarquia.")
+    return Response(
+        content=RollupResponse.model_validate(dados).model_dump_json(),
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+@router.post(
+    "/atualizar-dados",
+    response_model=AtualizacaoResponse,
+    summary="Admin: atualiza as tabelas locais a partir da Embrapa",
+    tags=["Scraper"]
+)
+async def atualizar_dados(
+    data: AtualizarDadosRequest = Body(
+        ...,
+        example={"admin_username": "admin", "admin_password": "admin123", "tipos": None, "forcar": False}
+    )
+):
+    """
+    Atualiza os datasets (todos ou os informados em `tipos`) de forma concorrente.
+
+    - Páginas e CSVs são baixados em paralelo e o parsing roda em um pool de processos.
+    - Cada dataset é gravado assim que fica pronto; CSVs sem alteração são ignorados (exceto com `forcar`).
+    - **Somente o administrador** pode disparar a atualização.
+    """
+    if data.admin_username != ADMIN_USERNAME or data.admin_password != ADMIN_PASSWORD:
+        raise HTTPException(status_code=401, detail="Acesso negado ao avaliador.")
+
+    inicio = time.perf_counter()
+    resultados = await atualizar_concorrente(data.tipos, data.forcar)
+    return {"duracao_segundos": round(time.perf_counter() - inicio, 3), "resultados": resultados}
 
 # Rotas futuras de análise preditiva e estratégica
 router.include_router(analytics_router, prefix="/analytics")
@@ -314,23 +552,26 @@ def root(request: Request):
   <ul>
     <li><code>GET  /</code>                         – Página inicial em HTML</li>
     <li><code>GET  /health</code>                   – Health-check da API e do Banco</li>
+    <li><code>GET  /metricas</code>                 – Métricas internas (cache, senhas, etc.) 🔒</li>
     <li><code>GET  /producao</code>                 – Extrai dados de produção 🔒</li>
     <li><code>GET  /comercializacao</code>          – Extrai dados de comercialização 🔒</li>
     <li><code>GET  /processamento</code>            – Extrai dados de processamento 🔒</li>
     <li><code>GET  /importacao</code>               – Extrai dados de importação 🔒</li>
     <li><code>GET  /exportacao</code>               – Extrai dados de exportação 🔒</li>
+    <li><code>GET  /{tipo}/exportar</code>          – Exporta o dataset completo (NDJSON/CSV/Arrow/Parquet) 🔒</li>
+    <li><code>GET  /{tipo}/resumo/anual</code>      – Totais por ano 🔒</li>
+    <li><code>GET  /{tipo}/resumo/entidades</code>  – Totais por produto/cultivar/país 🔒</li>
+    <li><code>GET  /{tipo}/hierarquia</code>        – Árvore de categorias (control) 🔒</li>
+    <li><code>GET  /{tipo}/hierarquia/{id}/rollup</code> – Totais por ano de uma subárvore 🔒</li>
+    <li><code>GET  /analytics/producao/previsao</code> – Previsão da produção por produto 🔒</li>
+    <li><code>GET  /analytics/exportacao/tendencias</code> – Estatísticas de exportação por país 🔒</li>
+    <li><code>GET  /analytics/comercializacao/ranking-regioes</code> – Top-k de produtos/categorias no ano 🔒</li>
+    <li><code>GET  /analytics/importacao/alerta-estoque</code> – Alertas de estoque pelas importações 🔒</li>
     <li><code>POST /solicitar-acesso</code>         – Solicitar acesso ao sistema</li>
     <li><code>POST /avaliar-acesso</code>           – Admin: aprovar/rejeitar acesso</li>
     <li><code>POST /status-acesso</code>            – Verificar status da solicitação</li>
     <li><code>POST /solicitacoes-pendentes</code>   – Admin: listar solicitações pendentes</li>
-  </ul>
-
-  <h2>🚀 Endpoints Planejados (Analytics):</h2>
-  <ul>
-    <li><code>GET /analytics/producao/previsao</code>               – Previsão futura da produção de uvas</li>
-    <li><code>GET /analytics/exportacao/tendencias</code>           – Análise de tendências de exportação por país</li>
-    <li><code>GET /analytics/comercializacao/ranking-regioes</code> – Ranking de regiões por comercialização</li>
-    <li><code>GET /analytics/importacao/alerta-estoque</code>       – Recomendação de estoque para vinícolas</li>
+    <li><code>POST /atualizar-dados</code>          – Admin: atualizar a base a partir da Embrapa</li>
   </ul>
 
   <h2>📄 Documentação Interativa:</h2>
@@ -364,7 +605,7 @@ def root(request: Request):
 )
 def health():
     try:
-        conn = engine.connect()
+        conn = engine_leitura.connect()
         conn.close()
         db_status = "up"
     except Exception as e:
@@ -374,3 +615,35 @@ def health():
         "status": "OK" if db_status == "up" else "FAIL",
         "db": db_status
     }
+
+@router.get(
+    "/metricas",
+    response_model=MetricasResponse,
+    summary="Métricas internas da API",
+    tags=["Infra"]
+)
+def metricas(usuario: str = Depends(get_current_user)):
+    """
+    Contadores para monitoramento.
+
+    - `cache_respostas`: entradas, bytes, hits/misses, expiradas, descartadas (LRU), invalidadas
+      e `hits_compartilhado` (respostas lidas do diretório compartilhado entre os workers).
+    - `senhas`: pool do bcrypt — operações em andamento, concluídas, rejeitadas por fila cheia,
+      tempo de espera na fila e tempo de cálculo do hash.
+    - `coletas`: coletas na Embrapa executadas e requisições `coalescidas` (que aguardaram
+      uma coleta do mesmo dataset já em andamento em vez de iniciar outra); entre processos,
+      `reservas` obtidas, resultados `compartilhadas` de outro worker e reservas `assumidas`
+      após expirar.
+    - `revalidacao`: atualizações em segundo plano iniciadas (modo `revalidar`), as que
+      falharam e respostas servidas com dados locais após falha na Embrapa (modo `scraper`).
+    - `disjuntores`: estado do circuito de cada host externo (`fechado`, `aberto`,
+      `meio_aberto`), falhas consecutivas, aberturas, chamadas rejeitadas e sondagens.
+    🔒 É necessário um token JWT válido para acessar este endpoint.
+    """
+    return {
+        "cache_respostas": cache_respostas.metricas(),
+        "senhas": pool_senhas.metricas(),
+        "coletas": {**coletas.metricas(), **coordenacao.metricas()},
+        "revalidacao": revalidacao.metricas(),
+        "disjuntores": http_client.metricas()
+    }
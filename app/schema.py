@@ -1,8 +1,10 @@
-from typing import TypeVar, Generic, List, Optional, Literal
+from typing import TypeVar, Generic, List, Optional, Literal, Dict, Any
 from pydantic import BaseModel, HttpUrl, Field, ConfigDict
 
 T = TypeVar("T")
 
+TipoDataset = Literal["producao", "comercializacao", "processamento", "importacao", "exportacao"]
+
 class BaseModelConfig(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -11,6 +13,59 @@ class HealthResponse(BaseModelConfig):
     status: str
     db: str
 
+# —— Models de métricas ——
+class MetricasCache(BaseModelConfig):
+    entradas: int
+    bytes: int
+    hits: int
+    misses: int
+    expiradas: int
+    descartadas: int
+    invalidadas: int
+    hits_compartilhado: int
+
+class MetricasSenhas(BaseModelConfig):
+    workers: int
+    fila_max: int
+    em_andamento: int
+    concluidas: int
+    rejeitadas: int
+    falhas: int
+    espera_media_ms: float
+    espera_max_ms: float
+    hash_medio_ms: float
+    hash_max_ms: float
+
+class MetricasColetas(BaseModelConfig):
+    execucoes: int
+    coalescidas: int
+    falhas: int
+    em_andamento: int
+    aguardando: int
+    reservas: int
+    compartilhadas: int
+    assumidas: int
+
+class MetricasRevalidacao(BaseModelConfig):
+    revalidacoes: int
+    falhas: int
+    respostas_obsoletas: int
+    em_andamento: int
+
+class MetricasDisjuntor(BaseModelConfig):
+    estado: Literal["fechado", "aberto", "meio_aberto"]
+    falhas_consecutivas: int
+    aberturas: int
+    rejeitadas: int
+    sondagens: int
+
+class MetricasResponse(BaseModelConfig):
+    cache_respostas: MetricasCache
+    senhas: MetricasSenhas
+    coletas: MetricasColetas
+    revalidacao: MetricasRevalidacao
+    disjuntores: Dict[str, MetricasDisjuntor]
+
 # —— Bases com restrição de ano ——
 class BaseItem1970_2023(BaseModelConfig):
     id: int = Field(..., ge=1)
@@ -55,6 +110,7 @@ class PaginatedResponse(BaseModel, Generic[T]):
     arquivo: str
     url_download: HttpUrl
     registros: List[T]
+    proximo_cursor: Optional[str] = None
 
 # —— Alias para facilitar ——
 ProducaoResponse = PaginatedResponse[ProducaoItem]
@@ -63,6 +119,133 @@ ProcessamentoResponse = PaginatedResponse[ProcessamentoItem]
 ImportacaoResponse = PaginatedResponse[ImportacaoItem]
 ExportacaoResponse = PaginatedResponse[ExportacaoItem]
 
+# —— Models dos agregados ——
+class ResumoAnualItem(BaseModelConfig):
+    ano: int
+    quantidade: float
+    valor_usd: Optional[float] = None
+    registros: int
+
+class ResumoAnualResponse(BaseModelConfig):
+    tipo: TipoDataset
+    registros: List[ResumoAnualItem]
+
+class ResumoEntidadeItem(BaseModelConfig):
+    categoria: str
+    entidade: str
+    decada: Optional[int] = None
+    quantidade: float
+    valor_usd: Optional[float] = None
+    registros: int
+
+class ResumoEntidadesResponse(BaseModelConfig):
+    tipo: TipoDataset
+    registros: List[ResumoEntidadeItem]
+
+TipoHierarquico = Literal["producao", "comercializacao", "processamento"]
+
+class NoHierarquiaItem(BaseModelConfig):
+    id_original: int
+    control: str
+    nome: str
+    id_pai: Optional[int] = None
+    nivel: int
+    folha: bool
+
+class HierarquiaResponse(BaseModelConfig):
+    tipo: TipoHierarquico
+    nos: List[NoHierarquiaItem]
+
+class RollupAno(BaseModelConfig):
+    ano: int
+    total: float
+    informado: Optional[float] = None
+    folhas: int
+
+class RollupNo(NoHierarquiaItem):
+    anos: List[RollupAno]
+
+class RollupResponse(BaseModelConfig):
+    tipo: TipoHierarquico
+    no: RollupNo
+    filhos: List[RollupNo]
+
+# —— Models de análises ——
+class PrevisaoAno(BaseModelConfig):
+    ano: int
+    producao_toneladas: float
+
+class PrevisaoSerie(BaseModelConfig):
+    id_original: int
+    control: str
+    produto: str
+    erro_padrao: float
+    previsoes: List[PrevisaoAno]
+
+class PrevisaoProducaoResponse(BaseModelConfig):
+    ultimo_ano_observado: Optional[int] = None
+    janela_anos: int
+    series: List[PrevisaoSerie]
+
+class EstatisticaExportacaoItem(BaseModelConfig):
+    pais: str
+    ano_inicial: Optional[int] = None
+    ano_final: Optional[int] = None
+    quantidade_total: float
+    valor_total: float
+    cagr_quantidade: Optional[float] = None
+    cagr_valor: Optional[float] = None
+    media_movel_quantidade: float
+    media_movel_valor: float
+    tendencia_quantidade: float
+    tendencia_valor: float
+    volatilidade_quantidade: Optional[float] = None
+    volatilidade_valor: Optional[float] = None
+    preco_medio_litro: Optional[float] = None
+    preco_litro_ultimo_ano: Optional[float] = None
+
+class TendenciasExportacaoResponse(BaseModelConfig):
+    janela_media_anos: int
+    janela_tendencia_anos: int
+    paises: List[EstatisticaExportacaoItem]
+
+class RankingItem(BaseModelConfig):
+    posicao: int
+    id_original: int
+    control: str
+    produto: str
+    categoria: Optional[str] = None
+    volume: float
+    variacao: Optional[float] = None
+    participacao: Optional[float] = None
+
+class RankingResponse(BaseModelConfig):
+    dataset: Literal["comercializacao", "producao"]
+    ano: int
+    metrica: str
+    nivel: str
+    itens: List[RankingItem]
+
+class AlertaEstoqueItem(BaseModelConfig):
+    pais: str
+    ultimo_ano: int
+    quantidade_ultimo_ano: float
+    media_janela: Optional[float] = None
+    desvio_janela: Optional[float] = None
+    variacao: Optional[float] = None
+    escore_z: Optional[float] = None
+    alerta: Literal["alta", "queda", "normal", "sem_historico"]
+    recomendacao: str
+    anos_historico: int
+    media_historica: float
+    desvio_historico: Optional[float] = None
+
+class AlertaEstoqueResponse(BaseModelConfig):
+    produto: str
+    janela_anos: int
+    limite_z: float
+    itens: List[AlertaEstoqueItem]
+
 # —— Autenticação ——
 class Credentials(BaseModelConfig):
     username: str
@@ -74,6 +257,12 @@ class SolicitarAcessoRequest(Credentials):
 class AdminAuthRequest(BaseModelConfig):
     admin_username: str
     admin_password: str
+class AtualizarDadosRequest(AdminAuthRequest):
+    tipos: Optional[List[TipoDataset]] = None
+    forcar: bool = False
+class AtualizacaoResponse(BaseModelConfig):
+    duracao_segundos: float
+    resultados: Dict[str, Dict[str, Any]]
 class AvaliarAcessoRequest(AdminAuthRequest):
     username: str
     status_aprovacao: Literal["aprovado", "rejeitado"]
@@ -1,12 +1,26 @@
 
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 import numpy as np
 from io import StringIO
-from sqlalchemy.exc import IntegrityError
 from app.database import SessionLocal
 from app.models import Producao, Processamento, Comercializacao
+from app.agregados import aplicar_alteracoes
+from app.ranking import FONTES as RANKEAVEIS, recalcular as recalcular_ranking
+from app.hierarquia import reconstruir as reconstruir_hierarquia
+from app.persistencia import (
+    upsert_em_lote,
+    registrar_ingestao,
+    notificar_ingestao,
+    hash_ingerido,
+    matriz_numerica,
+    checksums_por_ano,
+    anos_alterados,
+    marcas_ingeridas,
+    registrar_marcas
+)
+from app.versoes import marca_carga
+from app.cache_download import baixar
 from unidecode import unidecode
 
 DOWNLOAD_BASE = "http://vitibrasil.cnpuv.embrapa.br/"
@@ -22,64 +36,83 @@ TIPOS_PALAVRAS = {
     "processamento": ["processa"]
 }
 
-def fetch_dados_embrapa(tipo: str):
+def localizar_csv(tipo: str, forcar: bool = False):
+    """Encontra, na aba do site da Embrapa, o nome e a URL do CSV do dataset."""
+    url = f"{DOWNLOAD_BASE}index.php?opcao={ABAS[tipo]}"
+    pagina, _ = baixar(url, forcar)
+    soup = BeautifulSoup(pagina, "html.parser")
+    links = soup.find_all("a", href=True)
+
+    matches = []
+    for link in links:
+        texto = unidecode(link.text.lower())
+        href = unidecode(link["href"].lower())
+        if ".csv" in href:
+            for palavra in TIPOS_PALAVRAS[tipo]:
+                if palavra in texto or palavra in href:
+                    matches.append(link)
+
+    if not matches:
+        raise ValueError(f"Nenhum arquivo .csv compatível encontrado para {tipo}")
+
+    arquivo = matches[0]
+    return arquivo.text.strip(), DOWNLOAD_BASE + arquivo["href"]
+
+def transformar_csv(conteudo: bytes, tipo: str, marcas: dict = None):
+    """
+    Converte o CSV (uma coluna por ano) em formato longo: uma linha por item e ano.
+
+    Só as colunas de ano cujo checksum difere de `marcas` (`{ano: checksum}` da última
+    carga) são transformadas; sem `marcas`, todas. Retorna o DataFrame longo e o
+    checksum dos anos transformados.
+    """
+    df = pd.read_csv(StringIO(conteudo.decode("utf-8-sig")), sep=";")
+    df.columns = [col.strip() for col in df.columns]
+
+    if tipo in ["producao", "comercializacao"]:
+        id_vars = ["id", "control"]
+        possiveis_colunas_produto = ["produto", "Produto"]
+
+        for col in possiveis_colunas_produto:
+            if col in df.columns:
+                id_vars.append(col)
+                break
+        else:
+            raise ValueError("Nenhuma coluna de produto encontrada no arquivo.")
+
+    else:
+        id_vars = ["id", "control", "cultivar"]
+
+    colunas_ano = {int(coluna): coluna for coluna in df.columns if coluna not in id_vars}
+    matriz = matriz_numerica(df[list(colunas_ano.values())])
+    checksums = checksums_por_ano(df[id_vars], {ano: matriz[:, j] for j, ano in enumerate(colunas_ano)})
+    alterados = anos_alterados(checksums, marcas)
+
+    df = pd.melt(
+        df, id_vars=id_vars, value_vars=[colunas_ano[ano] for ano in alterados],
+        var_name="ano", value_name="quantidade"
+    )
+    df["quantidade"] = pd.to_numeric(df["quantidade"], errors="coerce")
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.dropna(subset=["quantidade"])
+    df["ano"] = df["ano"].astype(int)
+    return df, {ano: checksums[ano] for ano in alterados}
+
+def fetch_dados_embrapa(tipo: str, forcar: bool = False):
     try:
         if tipo not in ABAS:
             return {"erro": f"Tipo '{tipo}' inválido. Opções disponíveis: {list(ABAS.keys())}"}
 
-        url = f"{DOWNLOAD_BASE}index.php?opcao={ABAS[tipo]}"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
-        links = soup.find_all("a", href=True)
-
-        matches = []
-        for link in links:
-            texto = unidecode(link.text.lower())
-            href = unidecode(link["href"].lower())
-            if ".csv" in href:
-                for palavra in TIPOS_PALAVRAS[tipo]:
-                    if palavra in texto or palavra in href:
-                        matches.append(link)
-
-        if not matches:
-            return {"erro": f"Nenhum arquivo .csv compatível encontrado para {tipo}"}
-
-        arquivo = matches[0]
-        url_download = DOWNLOAD_BASE + arquivo["href"]
-        file_response = requests.get(url_download)
-        df = pd.read_csv(StringIO(file_response.content.decode("utf-8-sig")), sep=";")
-        df.columns = [col.strip() for col in df.columns]
-
-        if tipo in ["producao", "comercializacao"]:
-            id_vars = ["id", "control"]
-            possiveis_colunas_produto = ["produto", "Produto"]
-
-            for col in possiveis_colunas_produto:
-                if col in df.columns:
-                    id_vars.append(col)
-                    break
-            else:
-                return {"erro": "Nenhuma coluna de produto encontrada no arquivo."}
-
-            df = pd.melt(df, id_vars=id_vars, var_name="ano", value_name="quantidade")
-            df["quantidade"] = pd.to_numeric(df["quantidade"], errors="coerce")
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.dropna(subset=["quantidade"])
-            df["ano"] = df["ano"].astype(int)
-            salvar_generico(df, tipo)
-
-        elif tipo == "processamento":
-            df = pd.melt(
-                df,
-                id_vars=["id", "control", "cultivar"],
-                var_name="ano",
-                value_name="quantidade"
-            )
-            df["quantidade"] = pd.to_numeric(df["quantidade"], errors="coerce")
-            df = df.replace([np.inf, -np.inf], np.nan)
-            df = df.dropna(subset=["quantidade"])
-            df["ano"] = df["ano"].astype(int)
-            salvar_generico(df, tipo)
+        arquivo, url_download = localizar_csv(tipo, forcar)
+        conteudo, sha256 = baixar(url_download, forcar)
+        origem = {"arquivo": arquivo, "url_download": url_download, "sha256": sha256}
+
+        # CSV idêntico ao da última carga: nada a transformar ou gravar
+        if not forcar and sha256 == hash_ingerido(tipo):
+            return {**origem, "registros": [], "persistencia": {"inalterado": True}}
+
+        df, marcas = transformar_csv(conteudo, tipo, None if forcar else marcas_ingeridas(tipo))
+        persistencia = salvar_generico(df, tipo, origem=origem, marcas=marcas)
 
         registros = df.head(100).to_dict(orient="records")
         def clean_json(data):
@@ -90,63 +123,54 @@ def fetch_dados_embrapa(tipo: str):
             return data
 
         return {
-            "arquivo": arquivo.text.strip(),
+            "arquivo": arquivo,
             "url_download": url_download,
-            "registros": clean_json(registros)
+            "registros": clean_json(registros),
+            "persistencia": persistencia
         }
 
     except Exception as e:
         return {"erro": str(e)}
 
-def salvar_generico(df: pd.DataFrame, tipo: str):
+# Modelo, coluna descritiva e coluna de valor de cada tipo persistido
+MODELOS_GENERICOS = {
+    "producao": (Producao, "produto", "producao_toneladas"),
+    "comercializacao": (Comercializacao, "produto", "volume_comercializado"),
+    "processamento": (Processamento, "cultivar", "volume_processado_litros")
+}
+
+def salvar_generico(df: pd.DataFrame, tipo: str, atualizar: bool = True, origem: dict = None, marcas: dict = None):
+    modelo, coluna_item, coluna_valor = MODELOS_GENERICOS[tipo]
+    origem_item = next((c for c in [coluna_item, coluna_item.capitalize()] if c in df.columns), None)
+
+    registros = pd.DataFrame({
+        "id_original": df["id"].astype(int),
+        "control": df["control"].astype(str),
+        coluna_item: df[origem_item].astype(str) if origem_item else "",
+        "ano": df["ano"].astype(int),
+        coluna_valor: df["quantidade"].astype(float)
+    })
+
     session = SessionLocal()
-    for _, row in df.iterrows():
-        try:
-            ano = int(row.get("ano", 0))
-            id_original = int(row.get("id", 0))
-            control = str(row.get("control", ""))
-
-            if tipo == "producao":
-                exists = session.query(Producao).filter_by(id_original=id_original, ano=ano).first()
-                if not exists:
-                    registro = Producao(
-                        id_original=id_original,
-                        control=control,
-                        produto=str(row.get("produto", row.get("Produto", ""))),
-                        ano=ano,
-                        producao_toneladas=float(row.get("quantidade", 0.0))
-                    )
-                    session.add(registro)
-
-            elif tipo == "comercializacao":
-                exists = session.query(Comercializacao).filter_by(id_original=id_original, ano=ano).first()
-                if not exists:
-                    registro = Comercializacao(
-                        id_original=id_original,
-                        control=control,
-                        produto=str(row.get("produto", row.get("Produto", ""))),
-                        ano=ano,
-                        volume_comercializado=float(row.get("quantidade", 0.0))
-                    )
-                    session.add(registro)
-
-            elif tipo == "processamento":
-                exists = session.query(Processamento).filter_by(id_original=id_original, ano=ano).first()
-                if not exists:
-                    registro = Processamento(
-                        id_original=id_original,
-                        control=control,
-                        cultivar=str(row.get("cultivar", "")),
-                        ano=ano,
-                        volume_processado_litros=float(row.get("quantidade", 0.0))
-                    )
-                    session.add(registro)
-
-        except Exception:
-            continue
     try:
+        resumo = upsert_em_lote(
+            session, modelo, registros, ["id_original", "ano"], atualizar,
+            ao_gravar=lambda s, alteracoes: aplicar_alteracoes(s, tipo, alteracoes)
+        )
+        if resumo["inseridos"] or resumo["atualizados"]:
+            reconstruir_hierarquia(session, tipo)
+            if tipo in RANKEAVEIS:
+                recalcular_ranking(session, tipo)
+        meta = registrar_ingestao(session, tipo, resumo, origem)
+        versao, marca = meta.versao, marca_carga(meta)
+        registrar_marcas(session, tipo, marcas)
         session.commit()
-    except IntegrityError:
+        notificar_ingestao(tipo, resumo, versao, marca)
+        if marcas is not None:
+            resumo["anos_processados"] = sorted(marcas)
+        return resumo
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
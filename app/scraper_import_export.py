@@ -1,11 +1,26 @@
 
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
+import numpy as np
 from io import StringIO
-from sqlalchemy.exc import IntegrityError
 from app.database import SessionLocal
 from app.models import Importacao, Exportacao
+from app.agregados import aplicar_alteracoes
+from app.tendencias import recalcular as recalcular_estatisticas
+from app import estoque
+from app.persistencia import (
+    upsert_em_lote,
+    registrar_ingestao,
+    notificar_ingestao,
+    hash_ingerido,
+    matriz_numerica,
+    checksums_por_ano,
+    anos_alterados,
+    marcas_ingeridas,
+    registrar_marcas
+)
+from app.versoes import marca_carga
+from app.cache_download import baixar
 from unidecode import unidecode
 
 DOWNLOAD_BASE = "http://vitibrasil.cnpuv.embrapa.br/"
@@ -18,107 +33,137 @@ ABAS_ESPECIAIS = {
     "exportacao": "opt_06"
 }
 
-def fetch_dados_import_export(tipo: str):
-    try:
-        if tipo not in ABAS_ESPECIAIS:
-            return {"erro": f"Tipo '{tipo}' inválido. Use 'importacao' ou 'exportacao'."}
+def localizar_csv(tipo: str, forcar: bool = False):
+    """Encontra, na aba do site da Embrapa, o nome e a URL do CSV do dataset."""
+    url = f"{DOWNLOAD_BASE}index.php?opcao={ABAS_ESPECIAIS[tipo]}"
+    pagina, _ = baixar(url, forcar)
+    soup = BeautifulSoup(pagina, "html.parser")
 
-        url = f"{DOWNLOAD_BASE}index.php?opcao={ABAS_ESPECIAIS[tipo]}"
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, "html.parser")
+    arquivo_desejado = ARQUIVOS_ESPECIAIS[tipo].lower()
+    links = soup.find_all("a", href=True)
+    arquivos = [link for link in links if arquivo_desejado in unidecode(link["href"].lower())]
 
-        arquivo_desejado = ARQUIVOS_ESPECIAIS[tipo].lower()
-        links = soup.find_all("a", href=True)
-        arquivos = [link for link in links if arquivo_desejado in unidecode(link["href"].lower())]
+    if not arquivos:
+        raise ValueError(f"Arquivo {arquivo_desejado} não encontrado na página.")
 
-        if not arquivos:
-            return {"erro": f"Arquivo {arquivo_desejado} não encontrado na página."}
+    return arquivos[0].text.strip(), DOWNLOAD_BASE + arquivos[0]["href"]
 
-        url_download = DOWNLOAD_BASE + arquivos[0]["href"]
-        file_response = requests.get(url_download)
+def transformar_csv(conteudo: bytes, tipo: str, marcas: dict = None):
+    """
+    Lê o CSV de colunas duplicadas por ano e devolve o formato longo por país e ano.
 
-        # Lê o CSV com codificação correta
-        df = pd.read_csv(StringIO(file_response.content.decode("utf-8-sig")), sep="\t")
-        
-        # Renomeia colunas para alinhar com o modelo Pydantic
-        df.rename(columns={"Id": "id", "País": "pais"}, inplace=True)
-        df.columns = [col.lower() for col in df.columns]  # Garante minúsculas
-        df["id"] = df["id"].astype(int)
+    Só os pares (quantidade, valor) de anos cujo checksum difere de `marcas` são
+    transformados; sem `marcas`, todos. Retorna também o checksum dos anos transformados.
+    """
+    # Lê o CSV com codificação correta
+    df = pd.read_csv(StringIO(conteudo.decode("utf-8-sig")), sep="\t")
+    
+    # Renomeia colunas para alinhar com o modelo Pydantic
+    df.rename(columns={"Id": "id", "País": "pais"}, inplace=True)
+    df.columns = [col.lower() for col in df.columns]  # Garante minúsculas
+
+    # Valida colunas críticas
+    if "id" not in df.columns:
+        raise ValueError("Coluna 'id' não encontrada no CSV")
+    df["id"] = df["id"].astype(int)
+
+    # Posições das colunas (quantidade, valor) de cada ano, a partir da terceira
+    pares = {
+        int(df.columns[i]): [i, i + 1]
+        for i in range(2, 2 + 2 * ((len(df.columns) - 2) // 2), 2)
+    }
+    matriz = matriz_numerica(df.iloc[:, 2:2 + 2 * len(pares)])
+    checksums = checksums_por_ano(df.iloc[:, :2], {ano: matriz[:, [i - 2 for i in posicoes]] for ano, posicoes in pares.items()})
+    alterados = anos_alterados(checksums, marcas)
+
+    df = df.iloc[:, [0, 1] + [i for ano in alterados for i in pares[ano]]]
+    return transformar_tabela_ano_duplo(df), {ano: checksums[ano] for ano in alterados}
+
+def fetch_dados_import_export(tipo: str, forcar: bool = False):
+    try:
+        if tipo not in ABAS_ESPECIAIS:
+            return {"erro": f"Tipo '{tipo}' inválido. Use 'importacao' ou 'exportacao'."}
+
+        arquivo, url_download = localizar_csv(tipo, forcar)
+        conteudo, sha256 = baixar(url_download, forcar)
+        origem = {"arquivo": arquivo, "url_download": url_download, "sha256": sha256}
 
-        # Valida colunas críticas
-        if "id" not in df.columns:
-            return {"erro": "Coluna 'id' não encontrada no CSV"}
+        # CSV idêntico ao da última carga: nada a transformar ou gravar
+        if not forcar and sha256 == hash_ingerido(tipo):
+            return {**origem, "registros": [], "persistencia": {"inalterado": True}}
 
-        registros = processar_tabela_ano_duplo(df, tipo)
+        df_long, marcas = transformar_csv(conteudo, tipo, None if forcar else marcas_ingeridas(tipo))
+        persistencia = salvar_import_export(df_long, tipo, origem=origem, marcas=marcas)
         
         return {
-            "arquivo": arquivos[0].text.strip(),
+            "arquivo": arquivo,
             "url_download": url_download,
-            "registros": registros[:100]
+            "registros": df_long.head(100).to_dict(orient="records"),
+            "persistencia": persistencia
         }
 
     except Exception as e:
         return {"erro": str(e)}
     
 
-def processar_tabela_ano_duplo(df: pd.DataFrame, tipo: str):
-    try:
-        df_long = pd.DataFrame()
-        colunas = df.columns
-
-        for i in range(2, len(colunas), 2):
-            ano = colunas[i]
-            temp = pd.DataFrame({
-                "id": df[colunas[0]],
-                "pais": df[colunas[1]],
-                "ano": int(ano),
-                "quantidade": pd.to_numeric(df[colunas[i]], errors="coerce"),
-                "valor_usd": pd.to_numeric(df[colunas[i + 1]], errors="coerce")
-            })
-            df_long = pd.concat([df_long, temp], ignore_index=True)
-
-        df_long = df_long.dropna(subset=["quantidade", "valor_usd"])
-        df_long = df_long.replace([float("inf"), float("-inf")], pd.NA)
-        df_long = df_long.dropna()
-        salvar_import_export(df_long, tipo)
-        return df_long.to_dict(orient="records")
-    except Exception as e:
-        return [{"erro": str(e)}]
+def transformar_tabela_ano_duplo(df: pd.DataFrame) -> pd.DataFrame:
+    colunas = df.columns
+    # Pares (quantidade, valor) por ano a partir da terceira coluna
+    n_anos = (len(colunas) - 2) // 2
+    anos = np.array([int(ano) for ano in colunas[2:2 + 2 * n_anos:2]])
+
+    quantidades = df.iloc[:, 2:2 + 2 * n_anos:2].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    valores = df.iloc[:, 3:3 + 2 * n_anos:2].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    # Empilha os blocos ano a ano (ordem "F"), mantendo a ordem original das linhas
+    n_linhas = len(df)
+    df_long = pd.DataFrame({
+        "id": np.tile(df[colunas[0]].to_numpy(), n_anos),
+        "pais": np.tile(df[colunas[1]].to_numpy(), n_anos),
+        "ano": np.repeat(anos, n_linhas),
+        "quantidade": quantidades.ravel(order="F"),
+        "valor_usd": valores.ravel(order="F")
+    })
+    df_long = df_long[np.isfinite(df_long["quantidade"]) & np.isfinite(df_long["valor_usd"])]
+    return df_long.dropna().reset_index(drop=True)
+
+# Modelo persistido por tipo
+MODELOS_IMPORT_EXPORT = {
+    "importacao": Importacao,
+    "exportacao": Exportacao
+}
+
+def salvar_import_export(df: pd.DataFrame, tipo: str, atualizar: bool = True, origem: dict = None, marcas: dict = None):
+    registros = pd.DataFrame({
+        "pais": df["pais"].astype(str).str.strip(),
+        "ano": df["ano"].astype(int),
+        "quantidade": df["quantidade"].astype(float),
+        "valor_usd": df["valor_usd"].astype(float)
+    })
+
+    def ao_gravar(s, alteracoes):
+        aplicar_alteracoes(s, tipo, alteracoes)
+        if tipo in estoque.PRODUTOS:
+            estoque.aplicar_alteracoes(s, tipo, alteracoes)
 
-def salvar_import_export(df: pd.DataFrame, tipo: str):
     session = SessionLocal()
-    for _, row in df.iterrows():
-        try:
-            pais = str(row.get("pais", "")).strip()
-            ano = int(row.get("ano", 0))
-
-            if tipo == "importacao":
-                exists = session.query(Importacao).filter_by(pais=pais, ano=ano).first()
-                if not exists:
-                    registro = Importacao(
-                        pais=pais,
-                        ano=ano,
-                        quantidade=float(row.get("quantidade", 0.0)),
-                        valor_usd=float(row.get("valor_usd", 0.0))
-                    )
-                    session.add(registro)
-
-            elif tipo == "exportacao":
-                exists = session.query(Exportacao).filter_by(pais=pais, ano=ano).first()
-                if not exists:
-                    registro = Exportacao(
-                        pais=pais,
-                        ano=ano,
-                        quantidade=float(row.get("quantidade", 0.0)),
-                        valor_usd=float(row.get("valor_usd", 0.0))
-                    )
-                    session.add(registro)
-
-        except Exception:
-            continue
     try:
+        resumo = upsert_em_lote(
+            session, MODELOS_IMPORT_EXPORT[tipo], registros, ["pais", "ano"], atualizar,
+            ao_gravar=ao_gravar
+        )
+        if tipo == "exportacao" and (resumo["inseridos"] or resumo["atualizados"]):
+            recalcular_estatisticas(session)
+        meta = registrar_ingestao(session, tipo, resumo, origem)
+        versao, marca = meta.versao, marca_carga(meta)
+        registrar_marcas(session, tipo, marcas)
         session.commit()
-    except IntegrityError:
+        notificar_ingestao(tipo, resumo, versao, marca)
+        if marcas is not None:
+            resumo["anos_processados"] = sorted(marcas)
+        return resumo
+    except Exception:
         session.rollback()
+        raise
     finally:
         session.close()
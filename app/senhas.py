@@ -0,0 +1,112 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from app.config import settings
+
+
+class FilaSaturada(Exception):
+    """Há mais operações de senha aguardando do que o limite configurado."""
+    pass
+
+
+def _gerar_hash(senha: bytes, rounds: int):
+    inicio = time.time()
+    hashed = bcrypt.hashpw(senha, bcrypt.gensalt(rounds=rounds, prefix=b"2a"))
+    return inicio, time.time(), hashed
+
+
+def _verificar(senha: bytes, hashed: bytes):
+    inicio = time.time()
+    valido = bcrypt.checkpw(senha, hashed)
+    return inicio, time.time(), valido
+
+
+class PoolSenhas:
+    """
+    Pool de processos dedicado ao bcrypt, separado do threadpool das rotas.
+
+    - No máximo `workers` operações executam ao mesmo tempo e `fila_max` aguardam;
+      acima disso a chamada falha na hora com `FilaSaturada`.
+    - Mede o tempo de espera na fila e o tempo de cálculo do hash.
+    """
+
+    def __init__(self, workers: int, fila_max: int):
+        self.workers = workers
+        self.fila_max = fila_max
+        self._pool = None
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self._contadores = {"concluidas": 0, "rejeitadas": 0, "falhas": 0}
+        self._espera = [0.0, 0.0]  # total, máximo (s)
+        self._hash = [0.0, 0.0]
+
+    def _obter_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def _descartar_pool(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _executar(self, funcao, *args):
+        with self._lock:
+            if self._em_andamento >= self.workers + self.fila_max:
+                self._contadores["rejeitadas"] += 1
+                raise FilaSaturada("Muitas operações de autenticação em andamento.")
+            self._em_andamento += 1
+
+        pool = self._obter_pool()
+        enviado = time.time()
+        try:
+            inicio, fim, resultado = await asyncio.get_running_loop().run_in_executor(pool, funcao, *args)
+        except BrokenProcessPool:
+            self._descartar_pool(pool)
+            with self._lock:
+                self._contadores["falhas"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._em_andamento -= 1
+
+        with self._lock:
+            self._contadores["concluidas"] += 1
+            for acumulado, valor in ((self._espera, inicio - enviado), (self._hash, fim - inicio)):
+                valor = max(valor, 0.0)
+                acumulado[0] += valor
+                acumulado[1] = max(acumulado[1], valor)
+        return resultado
+
+    async def gerar_hash(self, senha: str) -> str:
+        hashed = await self._executar(_gerar_hash, senha.encode("utf-8"), 12)
+        return hashed.decode("utf-8")
+
+    async def verificar(self, senha: str, hashed: str) -> bool:
+        return await self._executar(_verificar, senha.encode("utf-8"), hashed.encode("utf-8"))
+
+    def metricas(self) -> dict:
+        with self._lock:
+            concluidas = self._contadores["concluidas"] or 1
+            return {
+                "workers": self.workers,
+                "fila_max": self.fila_max,
+                "em_andamento": self._em_andamento,
+                **self._contadores,
+                "espera_media_ms": round(self._espera[0] / concluidas * 1000, 2),
+                "espera_max_ms": round(self._espera[1] * 1000, 2),
+                "hash_medio_ms": round(self._hash[0] / concluidas * 1000, 2),
+                "hash_max_ms": round(self._hash[1] * 1000, 2)
+            }
+
+
+pool_senhas = PoolSenhas(workers=settings.SENHAS_WORKERS, fila_max=settings.SENHAS_FILA_MAX)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from app.models import Exportacao, EstatisticaExportacao
+
+# Anos usados na média móvel e na tendência/volatilidade recentes
+JANELA_MEDIA = 5
+JANELA_TENDENCIA = 10
+
+# Colunas de `estatistica_exportacao` aceitas na ordenação
+ESTATISTICAS = [
+    c.name for c in EstatisticaExportacao.__table__.c
+    if c.name not in ("pais", "ano_inicial", "ano_final")
+]
+
+
+def _por_linha(numerador, denominador):
+    """Divisão elemento a elemento que devolve NaN onde o denominador não é positivo."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominador > 0, numerador / np.where(denominador > 0, denominador, 1), np.nan)
+
+
+def _cagr(matriz: np.ndarray):
+    """Crescimento anual composto entre o primeiro e o último ano positivos de cada linha."""
+    positivo = matriz > 0
+    linhas = np.arange(matriz.shape[0])
+    primeiro = positivo.argmax(axis=1)
+    ultimo = matriz.shape[1] - 1 - positivo[:, ::-1].argmax(axis=1)
+    periodos = (ultimo - primeiro).astype(float)
+    razao = _por_linha(matriz[linhas, ultimo], matriz[linhas, primeiro])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cagr = np.where(periodos > 0, razao ** (1 / np.where(periodos > 0, periodos, 1)) - 1, np.nan)
+    return cagr, primeiro, ultimo, positivo.any(axis=1)
+
+
+def _inclinacao(matriz: np.ndarray, anos: np.ndarray):
+    """Inclinação da reta de mínimos quadrados de cada linha (unidades por ano)."""
+    centrados = anos - anos.mean()
+    return (matriz - matriz.mean(axis=1, keepdims=True)) @ centrados / (centrados ** 2).sum()
+
+
+def _volatilidade(matriz: np.ndarray):
+    """Desvio padrão da variação percentual ano a ano (ignora anos sem base)."""
+    variacao = _por_linha(matriz[:, 1:], matriz[:, :-1]) - 1
+    validos = ~np.isnan(variacao)
+    contagem = validos.sum(axis=1)
+    soma = np.where(validos, variacao, 0).sum(axis=1)
+    media = _por_linha(soma, contagem)
+    desvios = np.where(validos, variacao - media[:, None], 0) ** 2
+    return np.sqrt(_por_linha(desvios.sum(axis=1), contagem))
+
+
+def calcular(linhas: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estatísticas de todos os países em uma única passada vetorizada.
+
+    `linhas` traz `pais`, `ano`, `quantidade` (litros) e `valor_usd`; o resultado
+    tem uma linha por país com as colunas de `estatistica_exportacao`.
+    """
+    quantidade = linhas.pivot_table(index="pais", columns="ano", values="quantidade", aggfunc="sum").fillna(0.0)
+    valor = (
+        linhas.pivot_table(index="pais", columns="ano", values="valor_usd", aggfunc="sum")
+        .reindex(index=quantidade.index, columns=quantidade.columns)
+        .fillna(0.0)
+    )
+    anos = quantidade.columns.to_numpy(dtype=float)
+    q = quantidade.to_numpy(dtype=float)
+    v = valor.to_numpy(dtype=float)
+    recente = slice(-JANELA_TENDENCIA, None)
+
+    cagr_quantidade, primeiro, ultimo, exportou = _cagr(q)
+    cagr_valor, _, _, _ = _cagr(v)
+    return pd.DataFrame({
+        "pais": quantidade.index,
+        "ano_inicial": np.where(exportou, anos[primeiro], np.nan),
+        "ano_final": np.where(exportou, anos[ultimo], np.nan),
+        "quantidade_total": q.sum(axis=1),
+        "valor_total": v.sum(axis=1),
+        "cagr_quantidade": cagr_quantidade,
+        "cagr_valor": cagr_valor,
+        "media_movel_quantidade": q[:, -JANELA_MEDIA:].mean(axis=1),
+        "media_movel_valor": v[:, -JANELA_MEDIA:].mean(axis=1),
+        "tendencia_quantidade": _inclinacao(q[:, recente], anos[recente]),
+        "tendencia_valor": _inclinacao(v[:, recente], anos[recente]),
+        "volatilidade_quantidade": _volatilidade(q[:, -JANELA_TENDENCIA - 1:]),
+        "volatilidade_valor": _volatilidade(v[:, -JANELA_TENDENCIA - 1:]),
+        "preco_medio_litro": _por_linha(v.sum(axis=1), q.sum(axis=1)),
+        "preco_litro_ultimo_ano": _por_linha(v[:, -1], q[:, -1])
+    })
+
+
+def recalcular(session: Session):
+    """Recalcula `estatistica_exportacao` a partir de `exportacao`, na transação de `session`."""
+    linhas = pd.DataFrame(
+        session.execute(select(
+            Exportacao.pais, Exportacao.ano, Exportacao.quantidade, Exportacao.valor_usd
+        )).all(),
+        columns=["pais", "ano", "quantidade", "valor_usd"]
+    )
+    session.execute(delete(EstatisticaExportacao))
+    if linhas.empty:
+        return
+    estatisticas = calcular(linhas)
+    registros = estatisticas.astype(object).where(estatisticas.notna(), None).to_dict(orient="records")
+    for registro in registros:
+        for campo in ("ano_inicial", "ano_final"):
+            if registro[campo] is not None:
+                registro[campo] = int(registro[campo])
+    session.execute(insert(EstatisticaExportacao.__table__), registros)
+
+
+def consultar(
+    db: Session,
+    pais: str = None,
+    ordenar_por: str = "valor_total",
+    decrescente: bool = True,
+    limite: int = 50
+):
+    """
+    Lê `estatistica_exportacao`.
+
+    - Com `pais`: busca pela chave exata e, se não houver, por parte do nome.
+    - Sem `pais`: todos os países ordenados por `ordenar_por` (valores nulos por último).
+    """
+    e = EstatisticaExportacao
+    if pais:
+        encontrado = db.get(e, pais)
+        if encontrado:
+            return [encontrado]
+        consulta = select(e).where(func.lower(e.pais).contains(pais.lower()))
+    else:
+        consulta = select(e)
+    coluna = e.__table__.c[ordenar_por]
+    ordem = coluna.desc() if decrescente else coluna.asc()
+    return db.execute(consulta.order_by(ordem.nulls_last(), e.pais).limit(limite)).scalars().all()
@@ -1,7 +1,15 @@
 from datetime import datetime, timedelta, timezone  # Importe timezone
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from jose import jwt, JWTError
 from app.config import settings
 
+# Payloads já verificados: sha256(token) -> (exp, payload)
+_tokens_verificados = OrderedDict()
+_tokens_lock = threading.Lock()
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     
@@ -21,4 +29,30 @@ def verify_token(token: str):
         )
         return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+
+def verify_token_cached(token: str):
+    """
+    Igual a `verify_token`, mas reaproveita payloads já verificados.
+
+    - A chave é o sha256 do token; a entrada sai do cache ao atingir o `exp` do token
+      ou por LRU quando excede `settings.CACHE_TOKENS_MAX`.
+    - Tokens inválidos não são armazenados.
+    """
+    chave = hashlib.sha256(token.encode("utf-8")).digest()
+    agora = time.time()
+    with _tokens_lock:
+        entrada = _tokens_verificados.get(chave)
+        if entrada is not None:
+            if entrada[0] > agora:
+                _tokens_verificados.move_to_end(chave)
+                return entrada[1]
+            del _tokens_verificados[chave]
+
+    payload = verify_token(token)
+    if payload and "exp" in payload:
+        with _tokens_lock:
+            _tokens_verificados[chave] = (payload["exp"], payload)
+            while len(_tokens_verificados) > settings.CACHE_TOKENS_MAX:
+                _tokens_verificados.popitem(last=False)
+    return payload
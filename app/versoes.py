@@ -0,0 +1,70 @@
+import hashlib
+import threading
+import time
+from sqlalchemy import select
+from app.config import settings
+from app.database import SessionLeitura
+from app.models import MetadadosDataset
+
+
+def marca_carga(meta) -> str:
+    """
+    Identificador da última carga gravada: sha256 do CSV e instante da gravação.
+
+    A `versao` recomeça em um banco novo ou substituído; a marca distingue cargas com
+    o mesmo número de versão em bancos diferentes (ex: caches em disco de outra base).
+    """
+    if meta is None:
+        return "0"
+    instante = meta.atualizado_em.strftime("%Y%m%d%H%M%S%f") if meta.atualizado_em else ""
+    return hashlib.sha256(f"{meta.sha256 or ''}|{instante}".encode("utf-8")).hexdigest()[:10]
+
+
+class RegistroVersoes:
+    """
+    Versão atual de cada dataset, mantida em memória.
+
+    - A ingestão deste processo publica a nova versão imediatamente (`registrar`).
+    - A tabela `metadados_dataset` é relida no máximo a cada `ttl` segundos, para
+      enxergar ingestões feitas por outros processos (CLI, outros workers).
+    - `revisao` junta a versão à marca da última carga (`marca_carga`), para chaves que
+      sobrevivem a uma troca do banco (ETags, caches em disco).
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._versoes = {}  # tipo -> (versao, marca da carga)
+        self._lido_em = None
+        self._lock = threading.Lock()
+
+    def _recarregar(self):
+        # O banco é a referência: substitui inclusive versões maiores (banco trocado)
+        session = SessionLeitura()
+        try:
+            metas = session.execute(select(MetadadosDataset)).scalars().all()
+            self._versoes = {meta.tipo: (meta.versao or 0, marca_carga(meta)) for meta in metas}
+        finally:
+            session.close()
+        self._lido_em = time.monotonic()
+
+    def _atual(self, tipo: str):
+        with self._lock:
+            if self._lido_em is None or time.monotonic() - self._lido_em > self.ttl:
+                self._recarregar()
+            return self._versoes.get(tipo, (0, "0"))
+
+    def obter(self, tipo: str) -> int:
+        return self._atual(tipo)[0]
+
+    def revisao(self, tipo: str) -> str:
+        """Versão e marca da carga, ex: `"7.3f2a9c01de"`."""
+        versao, marca = self._atual(tipo)
+        return f"{versao}.{marca}"
+
+    def registrar(self, tipo: str, versao: int, marca: str):
+        with self._lock:
+            if (versao or 0) >= self._versoes.get(tipo, (0, "0"))[0]:
+                self._versoes[tipo] = (versao or 0, marca)
+
+
+versoes = RegistroVersoes(ttl=settings.VERSOES_TTL)
@@ -1,11 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolEsgotado
 from app.routes import router
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
+from app.database import criar_esquema
+from app.agregados import preparar_agregados
 from app.models import Producao
 
-# Criação das tabelas
-Base.metadata.create_all(bind=engine)
+# Criação das tabelas e índices
+criar_esquema()
+preparar_agregados()
 
 app = FastAPI(
     title="Tech Challenge 01 - API Embrapa",
@@ -25,3 +29,13 @@ app.add_middleware(
 )
 
 app.include_router(router)
+
+
+@app.exception_handler(PoolEsgotado)
+async def pool_esgotado(request: Request, exc: PoolEsgotado):
+    # Nenhuma conexão livre no pool dentro de SQLITE_POOL_TIMEOUT_S: sobrecarga temporária
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Banco de dados ocupado. Tente novamente."},
+        headers={"Retry-After": "1"}
+    )
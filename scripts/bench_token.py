@@ -0,0 +1,51 @@
+"""
+Benchmark da verificação de tokens JWT: `verify_token` (jwt.decode a cada requisição)
+contra `verify_token_cached` (payload já verificado reaproveitado).
+
+    python scripts/bench_token.py --verificacoes 200000 --tokens 50 --min-ganho 5
+
+Com `--min-ganho`, termina com código 1 se o cache não for ao menos N vezes mais rápido.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import utils  # noqa: E402
+
+
+def medir(funcao, tokens: list, verificacoes: int) -> float:
+    """Tempo médio (µs) por verificação, percorrendo os tokens em rodízio."""
+    inicio = time.perf_counter()
+    for i in range(verificacoes):
+        if funcao(tokens[i % len(tokens)]) is None:
+            raise RuntimeError("token recusado durante o benchmark")
+    return (time.perf_counter() - inicio) / verificacoes * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--verificacoes", type=int, default=200_000, help="verificações por cenário")
+    parser.add_argument("--tokens", type=int, default=50, help="tokens distintos (usuários ativos)")
+    parser.add_argument("--min-ganho", type=float, default=None, help="ganho mínimo exigido (x)")
+    args = parser.parse_args()
+
+    tokens = [utils.create_access_token({"sub": f"usuario{i}"}) for i in range(args.tokens)]
+    # Sem o decode, o jwt.decode domina o tempo e bastam menos iterações para uma média estável
+    sem_cache = medir(utils.verify_token, tokens, max(1, args.verificacoes // 10))
+    utils._tokens_verificados.clear()
+    com_cache = medir(utils.verify_token_cached, tokens, args.verificacoes)
+    ganho = sem_cache / com_cache
+
+    print(f"jwt.decode por requisição: {sem_cache:8.1f} µs")
+    print(f"payload em cache:          {com_cache:8.1f} µs")
+    print(f"ganho:                     {ganho:8.1f} x")
+    if args.min_ganho is not None and ganho < args.min_ganho:
+        print(f"ganho abaixo do mínimo exigido ({args.min_ganho} x)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
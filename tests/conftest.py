@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+
+# Banco e caches em um diretório temporário, definidos antes de importar `app`
+# (as engines e os diretórios de cache são lidos na importação)
+_DIRETORIO = tempfile.mkdtemp(prefix="techchallenge1-testes-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DIRETORIO, 'dados_embrapa.db')}")
+os.environ.setdefault("CACHE_RESPOSTAS_DIR", os.path.join(_DIRETORIO, "respostas"))
+os.environ.setdefault("CACHE_DOWNLOAD_DIR", os.path.join(_DIRETORIO, "downloads"))
+os.environ.setdefault("CACHE_COLUNAR_DIR", os.path.join(_DIRETORIO, "colunar"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def banco():
+    """Banco de testes vazio a cada teste."""
+    from app.database import Base, engine, criar_esquema
+    import app.models  # noqa: F401
+    import app.models_usuario  # noqa: F401
+    Base.metadata.drop_all(bind=engine)
+    criar_esquema()
+    yield
+
+
+@pytest.fixture
+def csv_producao():
+    """CSV no formato da Embrapa para produção: `[(id, control, produto, [valor por ano])]`."""
+    def montar(linhas, anos) -> bytes:
+        texto = ";".join(["id", "control", "produto", *map(str, anos)]) + "\n"
+        for id_, control, produto, valores in linhas:
+            texto += ";".join([str(id_), control, produto, *map(str, valores)]) + "\n"
+        return texto.encode("utf-8")
+    return montar
+
+
+@pytest.fixture
+def csv_importacao():
+    """CSV de importação/exportação: `[(id, país, [(quantidade, valor) por ano])]`."""
+    def montar(linhas, anos) -> bytes:
+        texto = "\t".join(["Id", "País", *[str(a) for a in anos for _ in (0, 1)]]) + "\n"
+        for id_, pais, pares in linhas:
+            texto += "\t".join([str(id_), pais, *[str(v) for par in pares for v in par]]) + "\n"
+        return texto.encode("utf-8")
+    return montar
+
+
+@pytest.fixture
+def coletar(monkeypatch):
+    """Executa a coleta real de um dataset servindo `conteudo` como o CSV da Embrapa."""
+    from app import scraper, scraper_import_export
+
+    def executar(tipo, conteudo, forcar=False):
+        especial = tipo in scraper_import_export.ABAS_ESPECIAIS
+        modulo = scraper_import_export if especial else scraper
+        monkeypatch.setattr(modulo, "localizar_csv", lambda t, f=False: (f"{t}.csv", f"http://teste/{t}.csv"))
+        monkeypatch.setattr(modulo, "baixar", lambda url, f=False: (conteudo, hashlib.sha256(conteudo).hexdigest()))
+        coleta = scraper_import_export.fetch_dados_import_export if especial else scraper.fetch_dados_embrapa
+        resultado = coleta(tipo, forcar)
+        assert "erro" not in resultado, resultado
+        return resultado["persistencia"]
+    return executar
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import select
+from app import agregados
+from app.database import SessionLocal, SessionLeitura
+from app.models import AgregadoAnual, AgregadoEntidade
+
+ANOS = list(range(2005, 2013))
+PRODUCAO = [
+    (1, "VINHO DE MESA", "VINHO DE MESA", [100 + 10 * i for i in range(8)]),
+    (2, "vm_Tinto", "Tinto", [60 + 5 * i for i in range(8)]),
+    (3, "vm_Branco", "Branco", [40 + 5 * i for i in range(8)]),
+    (4, "SUCO", "SUCO", [7.5 * i for i in range(8)]),
+    (5, "su_Integral", "Integral", [7.5 * i for i in range(8)]),
+]
+IMPORTACAO = [
+    (1, "Alemanha", [(5 + i, 50.5 + i) for i in range(8)]),
+    (2, "Chile", [(100 * i, 900 + 3 * i) for i in range(8)]),
+    (3, "Portugal", [(17, 170)] * 8),
+]
+
+
+def _tabela(modelo, tipo):
+    session = SessionLeitura()
+    try:
+        linhas = session.execute(select(modelo).where(modelo.tipo == tipo)).scalars().all()
+        colunas = [c.name for c in modelo.__table__.c]
+        return sorted(tuple(getattr(linha, c) for c in colunas) for linha in linhas)
+    finally:
+        session.close()
+
+
+def _agregados(tipo):
+    return {modelo.__tablename__: _tabela(modelo, tipo) for modelo in (AgregadoAnual, AgregadoEntidade)}
+
+
+def _reconstruir(tipo):
+    session = SessionLocal()
+    try:
+        agregados.reconstruir(session, tipo)
+        session.commit()
+    finally:
+        session.close()
+
+
+def _comparar(incremental, reconstruido):
+    assert incremental.keys() == reconstruido.keys()
+    for tabela in incremental:
+        assert len(incremental[tabela]) == len(reconstruido[tabela]), tabela
+        for a, b in zip(incremental[tabela], reconstruido[tabela]):
+            assert a == pytest.approx(b, rel=1e-12), tabela
+
+
+def _alterar_producao():
+    linhas = [list(linha) for linha in PRODUCAO]
+    linhas[1][3] = linhas[1][3][:3] + [99] + linhas[1][3][4:]  # valor revisado
+    linhas[2][1] = "BRANCO"  # mudança de control (sai de VINHO DE MESA)
+    linhas.append((6, "vm_Rosado", "Rosado", [3] * 8))  # item novo
+    return linhas
+
+
+@pytest.mark.parametrize("anos_extra", [0, 1])
+def test_producao_incremental_igual_a_reconstrucao(banco, coletar, csv_producao, anos_extra):
+    coletar("producao", csv_producao(PRODUCAO, ANOS))
+    linhas, anos = _alterar_producao(), ANOS
+    if anos_extra:
+        anos = ANOS + [2013]
+        linhas = [(i, c, p, list(v) + [v[-1] + 1]) for i, c, p, v in linhas]
+    coletar("producao", csv_producao(linhas, anos))
+
+    incremental = _agregados("producao")
+    _reconstruir("producao")
+    _comparar(incremental, _agregados("producao"))
+
+
+def test_importacao_incremental_igual_a_reconstrucao(banco, coletar, csv_importacao):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    linhas = [list(linha) for linha in IMPORTACAO]
+    linhas[0][2] = [(q * 1.1, v) for q, v in linhas[0][2]]  # todos os anos revisados
+    linhas[1][2] = linhas[1][2][:-1] + [(0, 0)]  # último ano zerado
+    linhas.append((4, "Uruguai", [(1, 10)] * 8))  # país novo
+    coletar("importacao", csv_importacao(linhas, ANOS))
+
+    incremental = _agregados("importacao")
+    _reconstruir("importacao")
+    _comparar(incremental, _agregados("importacao"))
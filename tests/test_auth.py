@@ -0,0 +1,73 @@
+import asyncio
+import httpx
+from app.utils import create_access_token
+from main import app
+
+# Requisições simultâneas de cada rota (abaixo do limite de fila do pool de senhas)
+N = 8
+LIMITE_S = 30
+
+
+async def _requisitar(metodo, requisicoes):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        return await asyncio.wait_for(
+            asyncio.gather(*[cliente.request(metodo, url, **kwargs) for url, kwargs in requisicoes]),
+            LIMITE_S
+        )
+
+
+def _enviar(requisicoes):
+    return _requisitar("POST", requisicoes)
+
+
+def _consultar(requisicoes):
+    return _requisitar("GET", requisicoes)
+
+
+def _solicitar(username):
+    return "/solicitar-acesso", {"json": {"username": username, "password": "senha"}}
+
+
+def _status(username, senha="senha"):
+    return "/status-acesso", {"data": {"username": username, "password": senha}}
+
+
+def test_rotas_de_acesso_concorrentes():
+    respostas = asyncio.run(_enviar([_solicitar(f"concorrente{i}") for i in range(N)]))
+    assert [r.status_code for r in respostas] == [200] * N
+
+    # Consultas de status e novas solicitações ao mesmo tempo, todas aguardando o bcrypt
+    respostas = asyncio.run(_enviar(
+        [_status(f"concorrente{i}") for i in range(N)]
+        + [_solicitar(f"novo{i}") for i in range(N)]
+    ))
+    assert [r.status_code for r in respostas] == [200] * (2 * N)
+    assert {r.json()["status"] for r in respostas[:N]} == {"pendente"}
+
+
+def test_fluxo_de_aprovacao():
+    solicitacao, repetida = asyncio.run(_enviar([_solicitar("aprovado"), _solicitar("aprovado")]))
+    assert sorted([solicitacao.status_code, repetida.status_code]) == [200, 400]
+
+    asyncio.run(_enviar([("/avaliar-acesso", {"json": {
+        "admin_username": "admin",
+        "admin_password": "admin123",
+        "username": "aprovado",
+        "status_aprovacao": "aprovado"
+    }})]))
+    aprovado, senha_errada = asyncio.run(_enviar([_status("aprovado"), _status("aprovado", "outra")]))
+    assert aprovado.status_code == 200
+    assert aprovado.json()["status"] == "aprovado" and aprovado.json()["access_token"]
+    assert senha_errada.status_code == 401
+
+
+def test_metricas_exige_token():
+    token = create_access_token({"sub": "monitor"})
+    sem_token, com_token = asyncio.run(_consultar([
+        ("/metricas", {}),
+        ("/metricas", {"headers": {"Authorization": f"Bearer {token}"}})
+    ]))
+    assert sem_token.status_code == 401
+    assert com_token.status_code == 200
+    assert {"cache_respostas", "senhas", "coletas"} <= com_token.json().keys()
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+import pytest
+from app import cache_download
+
+URL = "http://embrapa.teste/Producao.csv"
+
+
+class Resposta:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+@pytest.fixture
+def origem(monkeypatch, tmp_path):
+    """Origem falsa: devolve 304 quando o ETag enviado confere com `etag`."""
+    monkeypatch.setattr(cache_download.settings, "CACHE_DOWNLOAD_DIR", str(tmp_path))
+    estado = {"conteudo": b"v1", "etag": '"v1"', "requisicoes": []}
+
+    def get(url, headers=None):
+        estado["requisicoes"].append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == estado["etag"]:
+            return Resposta(304)
+        return Resposta(200, estado["conteudo"], {"ETag": estado["etag"]})
+
+    monkeypatch.setattr(cache_download.http_client, "get", get)
+    return estado
+
+
+def test_gravacoes_simultaneas_do_mesmo_arquivo(tmp_path):
+    caminho = str(tmp_path / "corpo.bin")
+    conteudos = [bytes([i]) * 100_000 for i in range(8)]
+    barreira = threading.Barrier(len(conteudos))
+    erros = []
+
+    def gravar(conteudo):
+        barreira.wait()
+        try:
+            for _ in range(20):
+                cache_download._gravar_atomico(caminho, conteudo)
+        except Exception as exc:
+            erros.append(exc)
+
+    threads = [threading.Thread(target=gravar, args=(c,)) for c in conteudos]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    with open(caminho, "rb") as f:
+        assert f.read() in conteudos
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_304_devolve_copia_salva(origem):
+    assert cache_download.baixar(URL) == (b"v1", hashlib.sha256(b"v1").hexdigest())
+    assert cache_download.baixar(URL) == (b"v1", hashlib.sha256(b"v1").hexdigest())
+    assert [r.get("If-None-Match") for r in origem["requisicoes"]] == [None, '"v1"']
+
+
+def test_304_com_corpo_divergente_baixa_de_novo(origem):
+    cache_download.baixar(URL)
+    # Corpo de outra gravação concorrente, que não confere com o sha256 dos metadados
+    _, caminho_corpo = cache_download._caminhos(URL)
+    with open(caminho_corpo, "wb") as f:
+        f.write(b"outro")
+
+    assert cache_download.baixar(URL) == (b"v1", hashlib.sha256(b"v1").hexdigest())
+    assert [r.get("If-None-Match") for r in origem["requisicoes"]] == [None, '"v1"', None]
+    with open(caminho_corpo, "rb") as f:
+        assert f.read() == b"v1"
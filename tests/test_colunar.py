@@ -0,0 +1,84 @@
+import asyncio
+import glob
+import io
+import os
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from app import colunar
+from app.database import engine_leitura
+from app.utils import create_access_token
+from main import app
+
+ANOS = [2019, 2020, 2021, 2022]
+IMPORTACAO = [(i, f"País {i}", [(i * 10 + a, i * 100 + a) for a in range(len(ANOS))]) for i in range(1, 8)]
+
+
+def _ler(formato, conteudo):
+    if formato == "parquet":
+        return pq.read_table(io.BytesIO(conteudo))
+    return pa.ipc.open_stream(conteudo).read_all()
+
+
+@pytest.fixture
+def diretorio(tmp_path, monkeypatch):
+    monkeypatch.setattr(colunar.settings, "CACHE_COLUNAR_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize("formato", ["arrow", "parquet"])
+def test_exportar_em_lotes_e_reaproveitar_o_arquivo(banco, coletar, csv_importacao, diretorio, formato):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+
+    partes = []
+    for parte in colunar.exportar_colunar("importacao", formato, tamanho_lote=5, ano_min=2020):
+        assert engine_leitura.pool.checkedout() == 0
+        partes.append(parte)
+    tabela = _ler(formato, b"".join(partes))
+    assert tabela.num_rows == len(IMPORTACAO) * 3
+    assert tabela.column("ano").to_pylist() == sorted(tabela.column("ano").to_pylist())
+    if formato == "arrow":
+        assert len(partes) > 2  # enviado lote a lote
+
+    arquivos = glob.glob(os.path.join(diretorio, "*"))
+    assert len(arquivos) == 1 and not arquivos[0].endswith(".tmp")
+    assert b"".join(colunar.exportar_colunar("importacao", formato, ano_min=2020)) == b"".join(partes)
+
+
+def test_cache_limitado_em_bytes(banco, coletar, csv_importacao, diretorio, monkeypatch):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    primeiro = b"".join(colunar.exportar_colunar("importacao", "arrow", ano_min=2019))
+    monkeypatch.setattr(colunar.settings, "CACHE_COLUNAR_MAX_BYTES", len(primeiro) + 1)
+
+    for ano in (2020, 2021, 2022):
+        b"".join(colunar.exportar_colunar("importacao", "arrow", ano_min=ano))
+    tamanhos = [os.path.getsize(c) for c in glob.glob(os.path.join(diretorio, "*"))]
+    assert sum(tamanhos) <= len(primeiro) + 1
+    # Descarte pelo uso mais antigo: o arquivo mais recente continua no cache
+    assert os.path.exists(colunar._caminho("importacao", "arrow", {"ano_min": 2022}))
+
+
+def test_envio_interrompido_nao_entra_no_cache(banco, coletar, csv_importacao, diretorio):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    envio = colunar.exportar_colunar("importacao", "arrow", tamanho_lote=5)
+    next(envio)
+    envio.close()
+    assert glob.glob(os.path.join(diretorio, "*")) == []
+
+
+def test_rota_exportar_parquet(banco, coletar, csv_importacao, diretorio):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    token = create_access_token({"sub": "teste"})
+
+    async def baixar():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+            return await cliente.get(
+                "/importacao/exportar?formato=parquet", headers={"Authorization": f"Bearer {token}"}
+            )
+
+    resposta = asyncio.run(baixar())
+    assert resposta.status_code == 200
+    assert resposta.headers["content-type"] == colunar.MEDIA_TYPES["parquet"]
+    assert _ler("parquet", resposta.content).num_rows == len(IMPORTACAO) * len(ANOS)
@@ -0,0 +1,112 @@
+import asyncio
+import httpx
+import pytest
+import requests
+from app import coordenacao, http_client, revalidacao
+from app.config import settings
+from app.consultas import DOWNLOAD_BASE
+from app.disjuntor import Disjuntor
+from app.utils import create_access_token
+from main import app
+
+URL = f"{DOWNLOAD_BASE}download/Producao.csv"
+PRODUCAO = [(1, "VINHO DE MESA", "VINHO DE MESA", [100, 110])]
+
+
+@pytest.fixture(autouse=True)
+def estado_limpo(monkeypatch):
+    """Disjuntores e esperas de coleta novos a cada teste."""
+    monkeypatch.setattr(http_client, "_disjuntores", {})
+    monkeypatch.setattr(revalidacao, "_falhou_em", {})
+
+
+def _abrir_circuito():
+    circuito = http_client.disjuntor("vitibrasil.cnpuv.embrapa.br")
+    for _ in range(circuito.limite_falhas):
+        circuito.registrar_falha()
+    return circuito
+
+
+def test_recusando_nao_altera_o_estado():
+    circuito = Disjuntor(falhas=2, espera=60)
+    circuito.registrar_falha()
+    assert not circuito.recusando()
+    circuito.registrar_falha()
+    assert circuito.recusando()
+    assert circuito.recusando()
+    assert circuito.metricas()["rejeitadas"] == 0
+
+    circuito.espera = 0
+    assert not circuito.recusando()  # liberaria a sondagem
+    circuito.liberar()
+    assert circuito.recusando()  # sondagem em andamento
+
+
+@pytest.mark.parametrize("erro, falhas", [
+    (requests.ConnectionError("recusada"), 1),
+    (KeyboardInterrupt(), 0),
+])
+def test_so_erros_de_rede_contam_como_falha(monkeypatch, erro, falhas):
+    class Sessao:
+        def get(self, url, **kwargs):
+            raise erro
+
+    monkeypatch.setattr(http_client, "get_session", lambda: Sessao())
+    with pytest.raises(type(erro)):
+        http_client.get(URL)
+    assert http_client.disjuntor("vitibrasil.cnpuv.embrapa.br").metricas()["falhas_consecutivas"] == falhas
+
+
+def test_interrupcao_libera_a_sondagem(monkeypatch):
+    circuito = _abrir_circuito()
+    circuito.espera = 0
+
+    class Sessao:
+        def get(self, url, **kwargs):
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(http_client, "get_session", lambda: Sessao())
+    with pytest.raises(KeyboardInterrupt):
+        http_client.get(URL)
+    assert not circuito.recusando()
+
+
+async def _consultar(url, token):
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        return await cliente.get(url, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_circuito_aberto_responde_sem_reservar_coleta(banco, coletar, csv_producao, monkeypatch):
+    coletar("producao", csv_producao(PRODUCAO, [2021, 2022]))
+    monkeypatch.setattr(settings, "MODO_DADOS", "scraper")
+    _abrir_circuito()
+
+    def reservar(tipo):
+        raise AssertionError("reserva de coleta com o circuito aberto")
+
+    monkeypatch.setattr(coordenacao, "_reservar", reservar)
+    obsoletas = revalidacao.metricas()["respostas_obsoletas"]
+    resposta = asyncio.run(_consultar("/producao?ano_min=2022", create_access_token({"sub": "teste"})))
+
+    assert resposta.status_code == 200
+    assert [r["ano"] for r in resposta.json()["registros"]] == [2022]
+    assert revalidacao.metricas()["respostas_obsoletas"] == obsoletas + 1
+    assert not revalidacao.revalidar("producao", lambda tipo: pytest.fail("coleta iniciada"))
+
+
+def test_falha_na_coleta_espera_antes_de_tentar_de_novo(banco, coletar, csv_producao, monkeypatch):
+    coletar("producao", csv_producao(PRODUCAO, [2021, 2022]))
+    monkeypatch.setattr(settings, "MODO_DADOS", "scraper")
+    coletas = []
+
+    def atualizar(tipo):
+        coletas.append(tipo)
+        return {"erro": "Embrapa fora do ar"}
+
+    monkeypatch.setattr("app.routes.atualizar_dataset", atualizar)
+    token = create_access_token({"sub": "teste"})
+    respostas = [asyncio.run(_consultar(f"/producao?limit={n}", token)) for n in (1, 2)]
+
+    assert [r.status_code for r in respostas] == [200, 200]
+    assert coletas == ["producao"]
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import select, text
+from app import estoque
+from app.database import SessionLocal, SessionLeitura, engine_leitura
+from app.models import EstatisticaImportacao
+
+ANOS = list(range(2005, 2013))
+IMPORTACAO = [
+    (1, "Alemanha", [(5 + i, 50.5 + i) for i in range(8)]),
+    (2, "Chile", [(1000 + 37 * i * i, 900 + 3 * i) for i in range(8)]),
+    (3, "Portugal", [(17, 170)] * 8),
+    (4, "Argentina", [(200, 10), (210, 11), (190, 9), (205, 10), (195, 10), (200, 10), (198, 10), (900, 40)]),
+]
+PRODUTO = estoque.PRODUTOS["importacao"]
+
+
+def _estatisticas():
+    session = SessionLeitura()
+    try:
+        linhas = session.execute(select(EstatisticaImportacao)).scalars().all()
+        colunas = [c.name for c in EstatisticaImportacao.__table__.c]
+        return sorted(tuple(getattr(linha, c) for c in colunas) for linha in linhas)
+    finally:
+        session.close()
+
+
+def _reconstruir():
+    session = SessionLocal()
+    try:
+        estoque.reconstruir(session, "importacao")
+        session.commit()
+    finally:
+        session.close()
+
+
+def _alterar(linhas):
+    linhas = [list(linha) for linha in linhas]
+    linhas[0][2] = linhas[0][2][:2] + [(40, 400)] + linhas[0][2][3:]  # ano antigo, fora da janela
+    linhas[1][2] = linhas[1][2][:5] + [(3000, 950)] + linhas[1][2][6:]  # ano dentro da janela
+    linhas.append((5, "Uruguai", [(1, 10)] * 7 + [(4, 40)]))  # país novo
+    return linhas
+
+
+@pytest.mark.parametrize("anos_extra", [0, 1])
+def test_estatisticas_incrementais_iguais_a_reconstrucao(banco, coletar, csv_importacao, anos_extra):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    linhas, anos = _alterar(IMPORTACAO), ANOS
+    if anos_extra:
+        # Ano novo: o último ano muda e a janela de referência desliza um ano
+        anos = ANOS + [2013]
+        linhas = [(i, pais, pares + [(pares[-1][0] * 3, pares[-1][1])]) for i, pais, pares in linhas]
+    coletar("importacao", csv_importacao(linhas, anos))
+
+    incremental = _estatisticas()
+    _reconstruir()
+    reconstruido = _estatisticas()
+    assert len(incremental) == len(reconstruido) == len(linhas)
+    for a, b in zip(incremental, reconstruido):
+        assert a == pytest.approx(b, rel=1e-9, abs=1e-6, nan_ok=True)
+
+
+def test_consultar_ordena_pelo_maior_desvio(banco, coletar, csv_importacao):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    session = SessionLeitura()
+    try:
+        todos = estoque.consultar(session, PRODUTO, somente_alertas=False)
+        alertas = estoque.consultar(session, PRODUTO, limite_z=2.0)
+    finally:
+        session.close()
+
+    escores = [item["escore_z"] for item in todos]
+    assert escores[-1] is None  # Portugal: sem variação na janela
+    desvios = [abs(z) for z in escores[:-1]]
+    assert desvios == sorted(desvios, reverse=True)
+    assert {item["pais"] for item in alertas} == {
+        item["pais"] for item in todos if item["escore_z"] is not None and abs(item["escore_z"]) >= 2.0
+    }
+    assert "Argentina" in {item["pais"] for item in alertas}
+
+
+@pytest.mark.parametrize("somente_alertas", [True, False])
+def test_plano_dos_alertas_usa_o_indice_de_desvio(banco, somente_alertas):
+    consulta = estoque.consulta_alertas(PRODUTO, somente_alertas=somente_alertas)
+    compilada = consulta.compile(engine_leitura, compile_kwargs={"literal_binds": True})
+    with engine_leitura.connect() as conn:
+        plano = [linha[-1] for linha in conn.execute(text(f"EXPLAIN QUERY PLAN {compilada}"))]
+
+    assert plano == [
+        "SEARCH estatistica_importacao USING INDEX ix_estatistica_importacao_abs_escore "
+        + ("(produto=? AND <expr>>?)" if somente_alertas else "(produto=?)")
+    ]
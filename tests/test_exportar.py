@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from app.consultas import exportar_dataset
+from app.database import engine_leitura
+from app.models import Importacao
+
+ANOS = [2019, 2020, 2021, 2022]
+IMPORTACAO = [(i, f"País {i}", [(i * 10 + a, i * 100 + a) for a in range(len(ANOS))]) for i in range(1, 8)]
+
+
+def _esperado(**filtros):
+    consulta = select(Importacao.__table__).order_by(Importacao.ano, Importacao.id)
+    if "ano_min" in filtros:
+        consulta = consulta.where(Importacao.ano >= filtros["ano_min"])
+    with engine_leitura.connect() as conn:
+        return [dict(linha) for linha in conn.execute(consulta).mappings()]
+
+
+def test_exportar_em_lotes_sem_prender_conexao(banco, coletar, csv_importacao):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    esperado = _esperado()
+    assert len(esperado) == len(IMPORTACAO) * len(ANOS)
+
+    partes = []
+    # Tamanho de lote que divide o total exatamente: o último lote vem vazio
+    for parte in exportar_dataset("importacao", "ndjson", tamanho_lote=7):
+        assert engine_leitura.pool.checkedout() == 0
+        partes.append(parte)
+    assert len(partes) == len(esperado) // 7
+    linhas = [json.loads(linha) for linha in b"".join(partes).decode("utf-8").splitlines()]
+    assert linhas == esperado
+
+
+def test_exportar_csv_com_filtro(banco, coletar, csv_importacao):
+    coletar("importacao", csv_importacao(IMPORTACAO, ANOS))
+    esperado = _esperado(ano_min=2021)
+
+    conteudo = b"".join(exportar_dataset("importacao", "csv", tamanho_lote=5, ano_min=2021)).decode("utf-8")
+    linhas = list(csv.DictReader(io.StringIO(conteudo)))
+    assert [(int(linha["ano"]), int(linha["id"])) for linha in linhas] == [(e["ano"], e["id"]) for e in esperado]
+
+
+def test_exportar_dataset_vazio(banco):
+    assert b"".join(exportar_dataset("importacao", "ndjson")) == b""
+    assert b"".join(exportar_dataset("importacao", "csv")).decode("utf-8").splitlines()[0].startswith("id,")
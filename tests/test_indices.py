@@ -0,0 +1,78 @@
+import itertools
+import pytest
+from sqlalchemy import create_engine, text
+from app.consultas import DATASETS, COLUNA_ITEM, montar_consulta, codificar_cursor
+from app.database import criar_esquema
+
+# Valores de cada filtro aceito pelos endpoints de dados
+FILTROS = {
+    "ano_min": 2000,
+    "ano_max": 2020,
+    "item": "Tinto",
+    "control": "VINHO DE MESA",
+    "cursor": codificar_cursor(2010, 500)
+}
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('indices') / 'esquema.db'}")
+    criar_esquema(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _combinacoes(tipo):
+    nomes = [n for n in FILTROS if n != "control" or "control" in DATASETS[tipo][0].__table__.c]
+    for tamanho in range(len(nomes) + 1):
+        for escolhidos in itertools.combinations(nomes, tamanho):
+            yield {nome: FILTROS[nome] for nome in escolhidos}
+
+
+def _plano(engine, consulta):
+    sql = str(consulta.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [linha[3] for linha in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.mark.parametrize("tipo", list(DATASETS))
+def test_consultas_dos_endpoints_usam_indices(engine, tipo):
+    tabela = DATASETS[tipo][0].__tablename__
+    for filtros in _combinacoes(tipo):
+        plano = _plano(engine, montar_consulta(tipo, limite=101, **filtros))
+        contexto = f"{tipo} {sorted(filtros)}: {plano}"
+
+        acessos = [p for p in plano if p.startswith((f"SCAN {tabela}", f"SEARCH {tabela}"))]
+        assert len(acessos) == 1, contexto
+        acesso = acessos[0]
+        assert "USING INDEX" in acesso or "USING COVERING INDEX" in acesso, contexto
+        assert not any("TEMP B-TREE" in p for p in plano), contexto
+
+        if "item" in filtros or "control" in filtros:
+            # Filtro por item/control: busca em um dos índices compostos, não na tabela inteira
+            assert acesso.startswith(f"SEARCH {tabela}"), contexto
+            assert "sqlite_autoindex" not in acesso, contexto
+
+
+@pytest.mark.parametrize("tipo", ["importacao", "exportacao"])
+def test_filtro_por_pais_usa_indice_de_cobertura(engine, tipo):
+    plano = _plano(engine, montar_consulta(tipo, limite=101, item="Alemanha", ano_min=2000))
+    assert plano == [
+        f"SEARCH {tipo} USING COVERING INDEX ix_{tipo}_pais_ano_id_valores (pais=? AND ano>?)"
+    ]
+    assert COLUNA_ITEM[tipo] == "pais"
+
+
+def test_remove_so_os_indices_substituidos(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    criar_esquema(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_importacao_pais_ano_valores ON importacao (pais, ano, quantidade, valor_usd)"))
+        conn.execute(text("CREATE INDEX ix_importacao_operador ON importacao (valor_usd)"))
+
+    criar_esquema(bind=engine)
+    with engine.connect() as conn:
+        indices = {nome for (nome,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    engine.dispose()
+    assert "ix_importacao_pais_ano_valores" not in indices
+    assert {"ix_importacao_operador", "ix_importacao_pais_ano_id_valores"} <= indices
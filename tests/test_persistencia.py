@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from app import scraper
+from app.database import SessionLeitura
+from app.models import Producao, Importacao, MarcaDagua, NoHierarquia
+from app.persistencia import checksums_por_ano, anos_alterados
+
+ANOS = [2020, 2021, 2022]
+PRODUCAO = [
+    (1, "VINHO DE MESA", "VINHO DE MESA", [100, 110, 120]),
+    (2, "vm_Tinto", "Tinto", [60, 70, 80]),
+    (3, "vm_Branco", "Branco", [40, 40, 40]),
+    (4, "SUCO", "SUCO", [10, 20, 30]),
+]
+IMPORTACAO = [
+    (1, "Alemanha", [(5, 50), (6, 60), (7, 70)]),
+    (2, "Chile", [(100, 900), (110, 950), (120, 1000)]),
+]
+
+
+@pytest.fixture
+def producao(coletar, csv_producao):
+    """Coleta de produção a partir de `(linhas, anos)`; devolve o resumo da persistência."""
+    def executar(linhas=PRODUCAO, anos=ANOS, forcar=False, conteudo=None):
+        return coletar("producao", conteudo or csv_producao(linhas, anos), forcar)
+    return executar
+
+
+@pytest.fixture
+def importacao(coletar, csv_importacao):
+    def executar(linhas=IMPORTACAO, anos=ANOS, forcar=False):
+        return coletar("importacao", csv_importacao(linhas, anos), forcar)
+    return executar
+
+
+def _linhas(modelo, *colunas):
+    session = SessionLeitura()
+    try:
+        return {tuple(linha) for linha in session.execute(select(*[getattr(modelo, c) for c in colunas]))}
+    finally:
+        session.close()
+
+
+def _tabela_producao():
+    return _linhas(Producao, "id_original", "control", "produto", "ano", "producao_toneladas")
+
+
+def _esperado_producao(linhas=PRODUCAO, anos=ANOS):
+    return {
+        (id_, control, produto, ano, float(valor))
+        for id_, control, produto, valores in linhas
+        for ano, valor in zip(anos, valores)
+    }
+
+
+def test_checksums_por_ano():
+    chaves = pd.DataFrame({"id": [1, 2]})
+    base = checksums_por_ano(chaves, {2020: np.array([1.0, 2.0]), 2021: np.array([3.0, 4.0])})
+    revisado = checksums_por_ano(chaves, {2020: np.array([1.0, 2.0]), 2021: np.array([3.0, 5.0])})
+    outras_chaves = checksums_por_ano(pd.DataFrame({"id": [1, 3]}), {2020: np.array([1.0, 2.0])})
+
+    assert base[2020] == revisado[2020] and base[2021] != revisado[2021]
+    assert outras_chaves[2020] != base[2020]
+    assert anos_alterados(revisado, base) == [2021]
+    assert anos_alterados(revisado, None) == [2020, 2021]
+
+
+def test_primeira_carga_insere_tudo(banco, producao):
+    resumo = producao()
+    assert resumo == {
+        "inseridos": len(PRODUCAO) * len(ANOS), "atualizados": 0, "ignorados": 0, "anos_processados": ANOS
+    }
+    assert _tabela_producao() == _esperado_producao()
+    assert {ano for (ano,) in _linhas(MarcaDagua, "ano")} == set(ANOS)
+
+
+def test_mesmo_csv_fica_inalterado(banco, producao):
+    producao()
+    assert producao() == {"inalterado": True}
+
+
+def test_forcar_reprocessa_todos_os_anos(banco, producao):
+    producao()
+    resumo = producao(forcar=True)
+    assert resumo == {
+        "inseridos": 0, "atualizados": 0, "ignorados": len(PRODUCAO) * len(ANOS), "anos_processados": ANOS
+    }
+    assert _tabela_producao() == _esperado_producao()
+
+
+def test_hash_diferente_com_mesmos_valores_nao_processa_anos(banco, producao, csv_producao):
+    producao()
+    # Mesmo conteúdo com fim de linha diferente: o sha256 muda, os valores não
+    conteudo = csv_producao(PRODUCAO, ANOS).replace(b"\n", b"\r\n")
+    resumo = producao(conteudo=conteudo)
+    assert resumo == {"inseridos": 0, "atualizados": 0, "ignorados": 0, "anos_processados": []}
+    assert _tabela_producao() == _esperado_producao()
+
+
+def test_valor_revisado_em_um_ano(banco, producao):
+    producao()
+    revisado = [list(linha) for linha in PRODUCAO]
+    revisado[1][3] = [60, 75, 80]
+    resumo = producao(revisado)
+    assert resumo["anos_processados"] == [2021]
+    assert (resumo["inseridos"], resumo["atualizados"]) == (0, 1)
+    assert _tabela_producao() == _esperado_producao(revisado)
+
+
+def test_nova_coluna_de_ano(banco, producao):
+    producao()
+    anos = ANOS + [2023]
+    linhas = [(i, c, p, valores + [valores[-1] + 1]) for i, c, p, valores in PRODUCAO]
+    resumo = producao(linhas, anos)
+    assert resumo["anos_processados"] == [2023]
+    assert (resumo["inseridos"], resumo["atualizados"]) == (len(PRODUCAO), 0)
+    assert _tabela_producao() == _esperado_producao(linhas, anos)
+
+
+def test_linha_removida_do_csv_permanece_na_base(banco, producao):
+    producao()
+    # As chaves entram no checksum de todos os anos: todos são reprocessados, mas a
+    # ingestão não apaga dados já gravados (o item removido continua disponível)
+    resumo = producao(PRODUCAO[:-1])
+    assert resumo["anos_processados"] == ANOS
+    assert (resumo["inseridos"], resumo["atualizados"]) == (0, 0)
+    assert _tabela_producao() == _esperado_producao()
+
+
+def test_mudanca_de_control(banco, producao):
+    producao()
+    # Branco passa a ser uma categoria própria, fora de VINHO DE MESA
+    alterado = [list(linha) for linha in PRODUCAO]
+    alterado[2][1] = "BRANCO"
+    resumo = producao(alterado)
+    assert resumo["anos_processados"] == ANOS
+    assert (resumo["inseridos"], resumo["atualizados"]) == (0, len(ANOS))
+    assert _tabela_producao() == _esperado_producao(alterado)
+
+    nos = {n: (control, pai) for n, control, pai in _linhas(NoHierarquia, "id_original", "control", "id_pai")}
+    assert nos[3] == ("BRANCO", None)
+    assert nos[2] == ("vm_Tinto", 1)
+
+
+def test_gravacao_sem_atualizar_mantem_valores(banco, producao, csv_producao):
+    producao()
+    revisado = [list(linha) for linha in PRODUCAO]
+    revisado[0][3] = [1, 2, 3]
+    df, _ = scraper.transformar_csv(csv_producao(revisado, ANOS), "producao")
+    resumo = scraper.salvar_generico(df, "producao", atualizar=False)
+    assert resumo == {"inseridos": 0, "atualizados": 0, "ignorados": len(PRODUCAO) * len(ANOS)}
+    assert _tabela_producao() == _esperado_producao()
+
+
+def test_importacao_carga_e_revisao(banco, importacao):
+    resumo = importacao()
+    assert (resumo["inseridos"], resumo["anos_processados"]) == (len(IMPORTACAO) * len(ANOS), ANOS)
+    esperado = {
+        (pais, ano, float(q), float(v))
+        for _, pais, pares in IMPORTACAO for ano, (q, v) in zip(ANOS, pares)
+    }
+    assert _linhas(Importacao, "pais", "ano", "quantidade", "valor_usd") == esperado
+
+    # Só o valor em US$ de 2022 do Chile muda
+    revisado = [IMPORTACAO[0], (2, "Chile", [(100, 900), (110, 950), (120, 1100)])]
+    resumo = importacao(revisado)
+    assert resumo["anos_processados"] == [2022]
+    assert (resumo["inseridos"], resumo["atualizados"]) == (0, 1)
+    assert ("Chile", 2022, 120.0, 1100.0) in _linhas(Importacao, "pais", "ano", "quantidade", "valor_usd")
+    assert importacao(revisado) == {"inalterado": True}
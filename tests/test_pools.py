@@ -0,0 +1,32 @@
+import time
+from app import coordenacao
+from app.config import settings
+from app.database import engine, engine_reservas
+from app.ingestao import atualizar_dataset
+
+
+def test_escritor_usa_o_timeout_curto():
+    assert engine.pool.timeout() == settings.SQLITE_POOL_TIMEOUT_S
+    assert engine_reservas.pool.timeout() == settings.SQLITE_POOL_TIMEOUT_S
+
+
+def test_reserva_de_coleta_nao_espera_pelo_escritor(banco):
+    # Escritor ocupado (ex: ingestão de outro dataset) sem transação aberta no arquivo
+    with engine.connect():
+        inicio = time.monotonic()
+        resultado = coordenacao.coordenar("producao", False, lambda: {"inalterado": True})
+        assert time.monotonic() - inicio < 1
+    assert resultado == {"inalterado": True}
+
+
+def test_escritor_ocupado_vira_erro_da_coleta(banco, monkeypatch):
+    monkeypatch.setattr(engine.pool, "_timeout", 0.1)
+
+    def coletar(tipo, forcar):
+        with engine.connect():
+            pass
+
+    monkeypatch.setattr("app.ingestao.fetch_dados_embrapa", coletar)
+    with engine.connect():
+        resultado = atualizar_dataset("producao")
+    assert resultado["erro"].startswith("Banco de dados ocupado")
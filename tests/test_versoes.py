@@ -0,0 +1,32 @@
+import time
+from app.database import Base, engine, criar_esquema
+from app.routes import etag_dataset
+from app.versoes import RegistroVersoes, versoes
+
+ANOS = [2021, 2022]
+PRODUCAO = [(1, "VINHO DE MESA", "VINHO DE MESA", [100, 110])]
+
+
+def test_revisao_publicada_igual_a_relida_do_banco(banco, coletar, csv_producao, monkeypatch):
+    # Registro que só conhece o que a ingestão deste processo publicou
+    publicado = RegistroVersoes(ttl=3600)
+    publicado._lido_em = time.monotonic()
+    monkeypatch.setattr("app.persistencia.versoes", publicado)
+
+    coletar("producao", csv_producao(PRODUCAO, ANOS))
+    assert publicado.obter("producao") == 1
+    assert publicado.revisao("producao") == RegistroVersoes(ttl=0).revisao("producao")
+
+
+def test_banco_substituido_muda_o_etag(banco, coletar, csv_producao, monkeypatch):
+    monkeypatch.setattr(versoes, "ttl", 0)
+    coletar("producao", csv_producao(PRODUCAO, ANOS))
+    anterior = etag_dataset("producao", ())
+
+    # Outra base, com a mesma contagem de versões: a versão coincide, a carga não
+    Base.metadata.drop_all(bind=engine)
+    criar_esquema()
+    coletar("producao", csv_producao([(1, "VINHO DE MESA", "VINHO DE MESA", [7, 8])], ANOS))
+
+    assert versoes.obter("producao") == 1
+    assert etag_dataset("producao", ()) != anterior